@@ -0,0 +1,175 @@
+"""Time-bucketed series for the Analytics page (``/api/analytics/timeseries/``).
+
+Each metric is one query: its rows in the range, truncated to days, weeks or
+months in ``TIME_ZONE``, with conditional aggregates for the breakdown.
+
+Series are cached per (metric, bucket, range, team) along with a generation
+token for every bucket they cover. Saves and deletes replace the tokens of the
+day, week and month they touch (``invalidate()``, wired up in ``api.signals``),
+so a cached series recomputes only its stale buckets, in one query over their
+span. Writes that bypass the signals show up after ``ANALYTICS_CACHE_TTL``.
+"""
+import secrets
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, DateTimeField, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .days import local_day, on_days
+from .models import AccountOpening, Attendance, Lead, Task
+from .serializers import money
+
+TRUNCS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, bucket):
+    if bucket == 'day':
+        return start + timedelta(days=1)
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def bucket_starts(start, end, bucket):
+    """Start days of the buckets overlapping ``start``..``end``."""
+    current = bucket_start(start, bucket)
+    while current <= end:
+        yield current
+        current = next_bucket(current, bucket)
+
+
+class Metric:
+    """``model`` rows bucketed by ``field``; ``aggregates`` hold ``value`` and the breakdown.
+
+    ``team`` filters on the ``user_type`` of the user in ``team_field``.
+    """
+
+    def __init__(self, model, field, team_field, aggregates, condition=None):
+        self.model = model
+        self.field = field
+        self.team_field = team_field
+        self.aggregates = aggregates
+        self.condition = condition
+        self.is_date = not isinstance(model._meta.get_field(field), DateTimeField)
+
+    def queryset(self, start, end, team=None):
+        qs = self.model._default_manager.all()
+        if self.condition is not None:
+            qs = qs.filter(self.condition)
+        if self.is_date:
+            qs = qs.filter(**{f'{self.field}__range': (start, end)})
+        else:
+            qs = on_days(qs, self.field, start, end)
+        if team:
+            qs = qs.filter(**{f'{self.team_field}__user_type': team})
+        return qs
+
+    def compute(self, start, end, bucket, team=None):
+        """``{bucket start: {aggregate: value}}`` for the buckets with rows."""
+        trunc = TRUNCS[bucket]
+        if self.is_date:
+            period = trunc(self.field)
+        else:
+            period = trunc(self.field, output_field=DateField(), tzinfo=timezone.get_default_timezone())
+        rows = self.queryset(start, end, team).annotate(period=period).order_by() \
+            .values('period').annotate(**self.aggregates)
+        return {row.pop('period'): self.jsonable(row) for row in rows}
+
+    def empty(self):
+        return self.jsonable(dict.fromkeys(self.aggregates, 0))
+
+    @staticmethod
+    def jsonable(row):
+        return {
+            name: money(value) if isinstance(value, Decimal) else value
+            for name, value in row.items()
+        }
+
+
+def _counts(field, choices):
+    return {value: Count('id', filter=Q(**{field: value})) for value, _label in choices}
+
+
+METRICS = {
+    'leads_created': Metric(
+        Lead, 'created_at', 'assigned_to',
+        {'value': Count('id'), **_counts('status', Lead.STATUS_CHOICES)},
+    ),
+    # Task has no completion timestamp; a completed task's last update stands in for it
+    'tasks_completed': Metric(
+        Task, 'updated_at', 'assigned_to',
+        {
+            'value': Count('id'),
+            **_counts('priority', Task.PRIORITY_CHOICES),
+            'after_deadline': Count('id', filter=Q(deadline__lt=F('updated_at'))),
+        },
+        condition=Q(status='completed'),
+    ),
+    'attendance_present': Metric(
+        Attendance, 'date', 'user',
+        {'value': Count('id', filter=Q(status__in=('present', 'late'))), **_counts('status', Attendance.STATUS_CHOICES)},
+    ),
+    'deposits': Metric(
+        AccountOpening, 'created_at', 'created_by',
+        {'value': Sum('deposit_amount', default=Decimal('0')), 'account_openings': Count('id')},
+    ),
+}
+
+# model -> metric whose buckets its saves and deletes invalidate
+MODEL_METRICS = {metric.model: name for name, metric in METRICS.items()}
+
+
+def _token_key(name, bucket, start):
+    return f'analytics:token:{name}:{bucket}:{start.isoformat()}'
+
+
+def _tokens(name, bucket, starts):
+    keys = {_token_key(name, bucket, start): start for start in starts}
+    tokens = cache.get_many(keys)
+    missing = [key for key in keys if key not in tokens]
+    if missing:
+        for key in missing:
+            # add() so that a concurrent invalidate() wins
+            cache.add(key, secrets.token_hex(8), timeout=None)
+        tokens.update(cache.get_many(missing))
+    return {keys[key]: token for key, token in tokens.items()}
+
+
+def invalidate(name, *values):
+    """Mark the day, week and month buckets of ``name`` holding ``values`` of its field stale."""
+    metric = METRICS[name]
+    field = metric.model._meta.get_field(metric.field)
+    days = {local_day(value, field) for value in values if value is not None}
+    cache.set_many({
+        _token_key(name, bucket, bucket_start(day, bucket)): secrets.token_hex(8)
+        for day in days for bucket in TRUNCS
+    }, timeout=None)
+
+
+def series(name, bucket, start, end, team=None):
+    """One row per bucket of ``start``..``end`` (inclusive): its start day, ``value`` and breakdown."""
+    metric = METRICS[name]
+    starts = list(bucket_starts(start, end, bucket))
+    key = f"analytics:series:{name}:{bucket}:{start.isoformat()}:{end.isoformat()}:{team or ''}"
+    # read the tokens before querying: a write landing meanwhile leaves its bucket stale
+    tokens = _tokens(name, bucket, starts)
+    cached = cache.get(key) or {}
+    stale = [day for day in starts if day not in cached or tokens.get(day) is None or cached[day][0] != tokens[day]]
+    if stale:
+        computed = metric.compute(max(start, stale[0]), min(end, next_bucket(stale[-1], bucket) - timedelta(days=1)), bucket, team)
+        for day in stale:
+            cached[day] = (tokens.get(day), computed.get(day) or metric.empty())
+        cache.set(key, cached, settings.ANALYTICS_CACHE_TTL)
+    return [{'bucket': day.isoformat(), **cached[day][1]} for day in starts]
@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import batch, push
+from .authentication import CachedJWTAuthentication
+from .meta_leads import MetaLeadImporter, graph_url, meta_config
+from .metrics import LEADS_IMPORTED
+from .models import Attendance, FollowUp
+from .replicas import ause_replica
+from .renderers import ORJSONRenderer
+from .serializers import AttendanceSerializer, FollowUpSerializer, LeadSerializer, UserSerializer
+from .sparse_fields import SparseFieldsMixin
+from .views import IsAdminUser, visible_leads
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - httpx is in requirements.txt
+    httpx = None
+
+# One semaphore per event loop; asyncio primitives can't be shared between loops.
+_db_slots = weakref.WeakKeyDictionary()
+
+
+class DatabaseBusy(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Database busy, try again shortly.'
+    default_code = 'database_busy'
+    wait = 1
+
+
+@asynccontextmanager
+async def db_slot():
+    """Hold one of ``ASYNC_DB_CONCURRENCY`` database slots of this process.
+
+    Requests queue for a slot for at most ``ASYNC_DB_TIMEOUT`` seconds and are
+    then turned away with a 503, so a burst of clients can't pile up unbounded
+    work in front of PostgreSQL.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _db_slots.get(loop)
+    if semaphore is None:
+        semaphore = _db_slots[loop] = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    try:
+        await asyncio.wait_for(semaphore.acquire(), settings.ASYNC_DB_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise DatabaseBusy()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+class AsyncAPIView(View):
+    """The parts of DRF's ``APIView`` the async endpoints need.
+
+    DRF 3.14 has no async views, so this runs ``authentication_classes``
+    (``aauthenticate`` where there is one, e.g. ``CachedJWTAuthentication``,
+    the others such as the session in a worker thread), checks
+    ``permission_classes``, parses bodies with ``DEFAULT_PARSER_CLASSES``,
+    turns API exceptions into DRF's error bodies and renders ``Response`` data
+    with ``ORJSONRenderer``. The browsable API isn't offered. Handlers run
+    while holding a ``db_slot()`` unless ``holds_db_slot`` is False, and safe
+    requests read from a replica when ``replica_reads`` is set.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = [IsAuthenticated]
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    holds_db_slot = True
+    replica_reads = False
+    renderer = ORJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # as APIView: SessionAuthentication enforces CSRF itself, token authentication needs none
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = self.request = Request(request, parsers=[parser() for parser in self.parser_classes], authenticators=())
+        try:
+            if self.holds_db_slot:
+                async with db_slot():
+                    response = await self.handle(request, *args, **kwargs)
+            else:
+                response = await self.handle(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response)
+
+    async def handle(self, request, *args, **kwargs):
+        await self.authenticate(request)
+        self.check_permissions(request)
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None:
+            raise exceptions.MethodNotAllowed(request.method)
+        if self.replica_reads and request.method in SAFE_METHODS:
+            await ause_replica()
+        return await handler(request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        return Response()
+
+    async def authenticate(self, request):
+        # requests of a batch (see api.batch) arrive authenticated, as DRF's Request accepts
+        forced_user = getattr(request._request, '_force_auth_user', None)
+        if forced_user is not None:
+            request.user, request.auth = forced_user, getattr(request._request, '_force_auth_token', None)
+            return
+        for authenticator in self.get_authenticators():
+            if hasattr(authenticator, 'aauthenticate'):
+                result = await authenticator.aauthenticate(request)
+            else:
+                result = await sync_to_async(authenticator.authenticate)(request)
+            if result is not None:
+                request.user, request.auth = result
+                return
+        request.user, request.auth = AnonymousUser(), None
+
+    def get_authenticators(self):
+        return [auth() for auth in self.authentication_classes]
+
+    def check_permissions(self, request):
+        for permission in (cls() for cls in self.permission_classes):
+            if permission.has_permission(request, self):
+                continue
+            if not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticators = self.get_authenticators()
+            exc.auth_header = authenticators[0].authenticate_header(self.request) if authenticators else None
+        response = api_settings.EXCEPTION_HANDLER(exc, {'view': self, 'args': self.args, 'kwargs': self.kwargs, 'request': self.request})
+        if response is None:
+            raise exc
+        if getattr(exc, 'auth_header', None):
+            response['WWW-Authenticate'] = exc.auth_header
+        return response
+
+    def finalize_response(self, request, response):
+        if not isinstance(response, Response):
+            return response
+        # A plain HttpResponse: Django would render a DRF Response in a worker thread.
+        content = self.renderer.render(response.data, self.renderer.media_type, {'request': request, 'response': response, 'view': self})
+        final = HttpResponse(content, status=response.status_code, content_type=self.renderer.media_type)
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                final[header] = value
+        final['Allow'] = ', '.join(m.upper() for m in self.http_method_names if hasattr(self, m))
+        patch_vary_headers(final, ('Accept',))
+        return final
+
+
+class AsyncMeView(AsyncAPIView):
+    """``GET /api/users/me/``."""
+
+    async def get(self, request):
+        return Response(UserSerializer(request.user, context={'request': request}).data)
+
+
+class AsyncAttendanceTodayView(AsyncAPIView):
+    """``GET /api/attendance/today/``."""
+
+    async def get(self, request):
+        try:
+            attendance = await Attendance.objects.select_related('user').aget(user=request.user, date=timezone.now().date())
+        except Attendance.DoesNotExist:
+            return Response({
+                'message': 'No attendance record for today'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(AttendanceSerializer(attendance, context={'request': request}).data, status=status.HTTP_200_OK)
+
+
+class AsyncLeadsListView(SparseFieldsMixin, AsyncAPIView):
+    """``GET /api/leads/``."""
+    replica_reads = True
+
+    async def get(self, request):
+        try:
+            # admins/staff see everything, sales users see leads assigned to them
+            qs = visible_leads(request.user).order_by('-created_at')
+            return await self.alist_response(qs, LeadSerializer)
+        except exceptions.ValidationError:
+            raise
+        except Exception as e:
+            logging.exception('Error listing leads')
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncFollowUpListView(SparseFieldsMixin, AsyncAPIView):
+    """``GET /api/followups/``."""
+    replica_reads = True
+
+    async def get(self, request):
+        try:
+            qs = FollowUp.objects.all().order_by('-scheduled_date')
+            return await self.alist_response(qs, FollowUpSerializer)
+        except exceptions.ValidationError:
+            raise
+        except Exception as e:
+            logging.exception('Error listing followups')
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncEventStreamView(AsyncAPIView):
+    """``GET /api/events/``: the caller's push events as Server-Sent Events (see api.push).
+
+    ``EventSource`` can't send headers, so the access token may also come as
+    ``?token=``; it ends up in access logs, which short-lived tokens make
+    acceptable.
+    """
+    holds_db_slot = False
+    authenticator = CachedJWTAuthentication()
+
+    async def authenticate(self, request):
+        token = request.query_params.get('token')
+        if token and self.authenticator.get_header(request) is None:
+            validated_token = self.authenticator.get_validated_token(token)
+            request.user, request.auth = await self.authenticator.aget_user(validated_token), validated_token
+            return
+        await super().authenticate(request)
+
+    async def get(self, request):
+        # the stream outlives the request; don't keep a connection the user lookup opened
+        await sync_to_async(connections.close_all)()
+        response = StreamingHttpResponse(push.stream(request.user.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # nginx would buffer the events otherwise
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class AsyncBatchView(AsyncAPIView):
+    """``POST /api/batch/`` with the batched async endpoints running on the event loop (see api.batch).
+
+    The entries take database slots of their own, so the batch holds none.
+    """
+    holds_db_slot = False
+
+    async def post(self, request):
+        entries = batch.parse(request.data)
+        return batch.response(await batch.aexecute(request, entries))
+
+
+class AsyncFetchMetaLeadsView(AsyncAPIView):
+    """``POST /api/fetch_meta_leads/`` with the Graph API calls made concurrently.
+
+    Up to ``META_FETCH_CONCURRENCY`` requests are in flight at once, made with
+    httpx on the event loop (or ``requests`` in worker threads without it). A
+    database slot is only held while the fetched leads are deduped and inserted.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    holds_db_slot = False
+
+    async def post(self, request):
+        config = meta_config()
+        if config is None:
+            return Response({'error': 'Facebook credentials (access token and page id(s)) must be configured in settings'}, status=status.HTTP_400_BAD_REQUEST)
+        access_token, page_list, api_version = config
+
+        in_flight = asyncio.Semaphore(settings.META_FETCH_CONCURRENCY)
+        if httpx is not None:
+            client = httpx.AsyncClient(timeout=20)
+            fetch = client.get
+        else:
+            client = None
+            fetch = sync_to_async(requests.get, thread_sensitive=False)
+
+        async def get_json(node, edge):
+            async with in_flight:
+                resp = await fetch(graph_url(api_version, node, edge, access_token), timeout=20)
+            resp.raise_for_status()
+            return resp.json().get('data', [])
+
+        async def fetch_page(page_id):
+            form_ids = [form['id'] for form in await get_json(page_id, 'leadgen_forms') if form.get('id')]
+            results = await asyncio.gather(*(get_json(form_id, 'leads') for form_id in form_ids), return_exceptions=True)
+            return list(zip(form_ids, results))
+
+        try:
+            pages = await asyncio.gather(*(fetch_page(page_id) for page_id in page_list), return_exceptions=True)
+        finally:
+            if client is not None:
+                await client.aclose()
+
+        async with db_slot():
+            created, skipped, errors = await sync_to_async(self.import_pages)(page_list, pages)
+
+        LEADS_IMPORTED.labels(source='meta', result='created').inc(created)
+        LEADS_IMPORTED.labels(source='meta', result='skipped').inc(skipped)
+        LEADS_IMPORTED.labels(source='meta', result='error').inc(len(errors))
+        return Response({
+            'success': True,
+            'created': created,
+            'skipped': skipped,
+            'errors': errors
+        }, status=status.HTTP_200_OK)
+
+    def import_pages(self, page_list, pages):
+        created = 0
+        skipped = 0
+        errors = []
+        # prepare sales pool for optional assignment of fetched leads
+        importer = MetaLeadImporter()
+        for page_id, forms in zip(page_list, pages):
+            if isinstance(forms, Exception):
+                errors.append(f"page {page_id}: {forms}")
+                continue
+            for form_id, leads in forms:
+                # like the sync view, a failed form ends that page's import
+                if isinstance(leads, Exception):
+                    errors.append(f"page {page_id}: {leads}")
+                    break
+                form_created, form_skipped, form_errors = importer.import_batch(leads, form_id)
+                created += form_created
+                skipped += form_skipped
+                errors.extend(form_errors)
+        return created, skipped, errors
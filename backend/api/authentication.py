@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+
+class UserCache:
+    """Bounded, per-process LRU of user rows with a TTL.
+
+    Entries are snapshots of the concrete field values rather than model
+    instances, so every lookup hands out a fresh ``User`` that a view can
+    mutate without leaking state into other requests. Keys are normalised to
+    ``str`` because token claims and primary keys disagree on the type.
+    """
+
+    def __init__(self, max_size=1024, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._field_names = [f.attname for f in User._meta.concrete_fields]
+
+    def get(self, user_id):
+        if self.ttl <= 0:
+            return None
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, db, values = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        return User.from_db(db, self._field_names, values)
+
+    def set(self, user_id, user):
+        if self.ttl <= 0:
+            return
+        values = tuple(getattr(user, name) for name in self._field_names)
+        entry = (time.monotonic() + self.ttl, user._state.db, values)
+        user_id = str(user_id)
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'USER_CACHE_MAX_SIZE', 1024),
+    ttl=getattr(settings, 'USER_CACHE_TTL', 30),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves the token's user from ``user_cache``.
+
+    The cache is per process: saves and deletes on ``User`` invalidate the
+    local entry (see ``api.signals``), other workers pick up the change once
+    ``USER_CACHE_TTL`` expires.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            # Fall back to the uncached checks so password-change revocation
+            # keeps its exact upstream semantics.
+            return super().get_user(validated_token)
+        return user
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views: token checks inline, the user via the async ORM."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            return await sync_to_async(super().get_user)(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            user_cache.set(user_id, user)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
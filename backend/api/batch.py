@@ -0,0 +1,223 @@
+"""``POST /api/batch/``: several API calls in one round trip.
+
+The body is ``{"requests": [{"method": "GET", "path": "/api/tasks/"}, ...]}``,
+with a JSON ``"body"`` for writes. Every entry is dispatched in-process to
+the view ``api/urls.py`` routes its path to, as the user who authenticated
+the batch: the views check their own permissions, but the token is decoded
+and the middleware stack run once for the whole batch. The answer is
+``{"responses": [{"status": 200, "body": ...}, ...]}`` in request order, each
+body rendered by its view exactly as it would be on its own.
+
+Consecutive reads (GET/HEAD) run in parallel, ``BATCH_CONCURRENCY`` at a
+time, each on a database connection of its own. A write runs alone, after
+the entries before it, and the reads after it see its result (from the
+primary, like a client holding the replica pin cookie). The entries are not
+one transaction: a failed one neither stops nor undoes the others. Streamed
+and non-JSON responses (exports, the event stream) can't be batched.
+"""
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from io import BytesIO
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from . import replicas
+from .metrics import REQUEST_LATENCY, REQUESTS
+
+logger = logging.getLogger(__name__)
+
+PREFIX = '/api/'
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE')
+# routes whose responses never end or that would nest batches
+UNBATCHABLE = ('batch', 'events')
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BATCH_CONCURRENCY', 4), thread_name_prefix='batch')
+
+
+def parse(data):
+    """The validated entries of a batch body; raises ``ValidationError`` for the whole batch."""
+    entries = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValidationError({'requests': 'A non-empty list of {"method", "path", "body"} objects is required.'})
+    if len(entries) > settings.BATCH_MAX_REQUESTS:
+        raise ValidationError({'requests': f'At most {settings.BATCH_MAX_REQUESTS} requests per batch.'})
+    parsed = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValidationError({'requests': f'Entry {index} is not an object.'})
+        method = str(entry.get('method') or 'GET').upper()
+        path = entry.get('path')
+        if method not in METHODS:
+            raise ValidationError({'requests': f"Entry {index}: method must be one of {', '.join(METHODS)}."})
+        if not isinstance(path, str) or not path.startswith(PREFIX):
+            raise ValidationError({'requests': f'Entry {index}: path must start with {PREFIX}.'})
+        parsed.append((method, path, entry.get('body')))
+    return parsed
+
+
+def groups(entries):
+    """``[(index, entry), ...]`` runs that can execute together: consecutive reads, or one write."""
+    runs = []
+    for index, entry in enumerate(entries):
+        if entry[0] in SAFE_METHODS and runs and runs[-1][0][1][0] in SAFE_METHODS:
+            runs[-1].append((index, entry))
+        else:
+            runs.append([(index, entry)])
+    return runs
+
+
+def _error(status, detail):
+    return status, json.dumps({'detail': detail}).encode()
+
+
+def _build_request(outer, method, path_info, query, body):
+    """A request for one entry, carrying the batch's user and headers but not its credentials."""
+    content = b'' if body is None else json.dumps(body).encode()
+    environ = {
+        key: value for key, value in outer.META.items()
+        if key.startswith('HTTP_') or key in ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT', 'SERVER_PROTOCOL')
+    }
+    environ.pop('HTTP_AUTHORIZATION', None)
+    environ.update({
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path_info,
+        'QUERY_STRING': query,
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': BytesIO(content),
+        'wsgi.url_scheme': outer.scheme,
+    })
+    request = WSGIRequest(environ)
+    request.user = outer.user
+    # DRF's Request authenticates these as given instead of running the
+    # authentication classes; AsyncAPIView honours them too
+    request._force_auth_user = outer.user
+    request._force_auth_token = outer.auth
+    return request
+
+
+def _prepare(outer, entry):
+    """``(request, match)`` for an entry, or the ``(status, body)`` answering it straight away."""
+    method, path, body = entry
+    parts = urlsplit(path)
+    # as WSGI servers pass it, and resolved within api/urls.py only
+    path_info = unquote_to_bytes(parts.path).decode('iso-8859-1')
+    try:
+        match = resolve(path_info[len(PREFIX) - 1:], urlconf='api.urls')
+    except Resolver404:
+        return None, _error(404, 'Not found.')
+    if match.url_name in UNBATCHABLE:
+        return None, _error(400, f'{PREFIX}{match.route} can\'t be batched.')
+    # labelled like the direct call in the request metrics
+    match.route = PREFIX[1:] + match.route
+    request = _build_request(outer, method, path_info, parts.query, body)
+    request.resolver_match = match
+    return request, match
+
+
+def _finish(request, match, response, start):
+    """The ``(status, body)`` of a response, counted in the request metrics like a direct call."""
+    REQUEST_LATENCY.labels(method=request.method, route=match.route).observe(time.perf_counter() - start)
+    REQUESTS.labels(method=request.method, route=match.route, status=response.status_code).inc()
+    if response.streaming:
+        return _error(400, f'/{match.route} streams its response and can\'t be batched.')
+    if not response.content:
+        return response.status_code, b'null'
+    if response.get('Content-Type', '').split(';')[0].strip() != 'application/json':
+        return _error(400, f'/{match.route} doesn\'t answer with JSON and can\'t be batched.')
+    return response.status_code, response.content
+
+
+def _dispatch(request, match):
+    if iscoroutinefunction(match.func):
+        response = async_to_sync(match.func)(request, *match.args, **match.kwargs)
+    else:
+        response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def _run_prepared(request, match, start, worker_thread=False):
+    if worker_thread:
+        close_old_connections()
+    try:
+        with replicas.sub_request():
+            return _finish(request, match, _dispatch(request, match), start)
+    except Exception:
+        logger.exception('Error in batched %s %s', request.method, request.get_full_path())
+        return _error(500, 'Internal server error.')
+    finally:
+        if worker_thread:
+            close_old_connections()
+
+
+def _run(outer, entry, worker_thread=False):
+    start = time.perf_counter()
+    request, match = _prepare(outer, entry)
+    if request is None:
+        return match
+    return _run_prepared(request, match, start, worker_thread)
+
+
+def execute(outer, entries):
+    """Run the entries for the authenticated DRF request ``outer``; return their ``(status, body)``."""
+    results = [None] * len(entries)
+    for run in groups(entries):
+        if len(run) == 1:
+            index, entry = run[0]
+            results[index] = _run(outer, entry)
+            continue
+        futures = [(index, _executor.submit(copy_context().run, _run, outer, entry, True)) for index, entry in run]
+        for index, future in futures:
+            results[index] = future.result()
+    return results
+
+
+async def _arun(outer, entry, slots):
+    start = time.perf_counter()
+    request, match = _prepare(outer, entry)
+    if request is None:
+        return match
+    async with slots:
+        if not iscoroutinefunction(match.func):
+            # sync views get a thread (and a database connection) of their own
+            return await sync_to_async(_run_prepared, thread_sensitive=False)(request, match, start, True)
+        try:
+            with replicas.sub_request():
+                response = await match.func(request, *match.args, **match.kwargs)
+            return _finish(request, match, response, start)
+        except Exception:
+            logger.exception('Error in batched %s %s', request.method, request.get_full_path())
+            return _error(500, 'Internal server error.')
+
+
+async def aexecute(outer, entries):
+    """``execute()`` for async views; async endpoints run on the event loop."""
+    slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    results = [None] * len(entries)
+    for run in groups(entries):
+        outcomes = await asyncio.gather(*(_arun(outer, entry, slots) for _index, entry in run))
+        for (index, _entry), outcome in zip(run, outcomes):
+            results[index] = outcome
+    return results
+
+
+def response(results):
+    """The batch's answer, built from the bodies the views rendered rather than re-encoding them."""
+    items = b','.join(b'{"status":%d,"body":%s}' % (status, body) for status, body in results)
+    return HttpResponse(b'{"responses":[' + items + b']}', content_type='application/json')
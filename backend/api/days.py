@@ -0,0 +1,36 @@
+"""Calendar days in ``TIME_ZONE``, which the rollups, analytics and reports count by.
+
+Always the default time zone rather than the active one, so what is stored or
+cached for a day does not depend on the request that wrote it.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def local_midnight(day):
+    """The aware datetime at which ``day`` begins."""
+    return datetime.combine(day, time.min, timezone.get_default_timezone())
+
+
+def local_day(value, field):
+    """The day on which ``value``, a value of the date or datetime ``field``, falls."""
+    # imports may leave the raw value (e.g. Meta's created_time string) on the instance
+    value = field.to_python(value)
+    if not isinstance(value, datetime):
+        return value
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.get_default_timezone())
+    return timezone.localdate(value, timezone.get_default_timezone())
+
+
+def on_days(queryset, field, start, end):
+    """``queryset`` rows whose datetime ``field`` falls on days ``start``..``end`` (inclusive, None = open).
+
+    Filters on datetime bounds rather than ``__date``, so the indexes on ``field`` apply.
+    """
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': local_midnight(start)})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': local_midnight(end + timedelta(days=1))})
+    return queryset
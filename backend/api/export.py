@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework.utils.encoders import JSONEncoder
+
+from .renderers import orjson
+from .sparse_fields import get_row_serializer, readable_fields
+
+EXPORT_CHUNK_SIZE = 2000
+
+_encoder = JSONEncoder()
+_END = object()
+
+
+if orjson is not None:
+    def _dumps(value):
+        return orjson.dumps(value, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def _dumps(value):
+        return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return _dumps(value).decode()
+    return value
+
+
+def _rows(queryset, serializer_class, fields):
+    """Yield serialized rows from a server-side cursor, ``chunk_size`` at a time."""
+    row_serializer = get_row_serializer(serializer_class, fields)
+    if row_serializer is None:
+        for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield serializer_class(obj).data
+        return
+    to_dict = row_serializer.converter()
+    for row in queryset.values_list(*row_serializer.paths).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield to_dict(row)
+
+
+def stream_ndjson(queryset, serializer_class, fields=None):
+    batch = []
+    for data in _rows(queryset, serializer_class, fields):
+        batch.append(_dumps(data))
+        if len(batch) >= EXPORT_CHUNK_SIZE:
+            yield b'\n'.join(batch) + b'\n'
+            batch = []
+    if batch:
+        yield b'\n'.join(batch) + b'\n'
+
+
+def stream_csv(queryset, serializer_class, fields=None):
+    columns = fields or readable_fields(serializer_class)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+    for data in _rows(queryset, serializer_class, fields):
+        writer.writerow([_csv_cell(data.get(name)) for name in columns])
+        rows += 1
+        if rows % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def serves_async(request):
+    """Whether ``request`` came in over ASGI, where a streamed body should be an async iterator."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def async_chunks(chunks):
+    """Yield the chunks of the sync iterable ``chunks``, producing each in a thread.
+
+    Under ASGI Django reads a sync streaming body into a list before sending
+    any of it. This keeps the stream chunked. The chunks are produced on the
+    request's sync thread, so a server-side cursor stays on its connection.
+    """
+    chunks = iter(chunks)
+    produce = sync_to_async(next)
+    try:
+        while (chunk := await produce(chunks, _END)) is not _END:
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
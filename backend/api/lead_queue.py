@@ -0,0 +1,118 @@
+"""Pull-mode lead assignment: reps claim the oldest unassigned leads.
+
+With ``LEAD_ASSIGNMENT = 'pull'`` imports leave new leads unassigned, and
+``claim()`` hands them out. The claiming transaction locks the oldest queued
+rows with ``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent claimers never
+wait on each other's rows or get the same lead.
+
+A claim is a lease until ``claim_expires_at``. ``LeadSetStatusView`` clears it
+when the rep moves the lead on. Every claim first puts leads still ``new``
+after their lease back in the queue (``release_expired()`` does only that).
+Claimed leads leave the queue index, so the claim query only ever reads
+unassigned rows however many leases are outstanding.
+
+Claims are bulk updates; the rollups and analytics buckets the reassignment
+touches are adjusted, and the reps' push events sent, once the claim commits,
+as the save signals would.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from . import analytics, push, rollups
+from .models import Lead
+
+logger = logging.getLogger(__name__)
+
+
+def pull_mode():
+    return settings.LEAD_ASSIGNMENT == 'pull'
+
+
+def queued():
+    """Leads waiting to be claimed (the rows of ``api_lead_queue_idx``)."""
+    return Lead.objects.filter(status='new', assigned_to__isnull=True)
+
+
+def _reassign(leads, user_id, using):
+    """After commit, move the rollup counts of ``leads`` (as stored) to ``user_id``, invalidate their analytics and tell both reps."""
+    changes = defaultdict(dict)
+    previous = defaultdict(list)
+    for lead in leads:
+        previous[lead.assigned_to_id].append(lead.pk)
+        before = rollups.deltas(lead)
+        lead.assigned_to_id = user_id
+        for key, fields in rollups.difference(before, rollups.deltas(lead)).items():
+            for name, amount in fields.items():
+                changes[key][name] = changes[key].get(name, 0) + amount
+    days = [lead.created_at for lead in leads]
+
+    def apply():
+        # one commit for all the rows
+        try:
+            with transaction.atomic(using=using):
+                rollups.apply(changes, using)
+        except Exception:
+            # the claim itself went through; rebuild_rollups restores the counts
+            logger.exception('Could not move the rollup counts of %d reassigned leads', len(leads))
+
+    # outside the claim's row locks, so claimers don't queue up on the rollup rows;
+    # robust, since the claim has committed whatever happens here
+    transaction.on_commit(apply, using=using, robust=True)
+    transaction.on_commit(lambda: analytics.invalidate('leads_created', *days), using=using, robust=True)
+    for previous_user, ids in previous.items():
+        push.publish(previous_user, 'lead.unassigned', ids, using)
+    push.publish(user_id, 'lead.assigned', [lead.pk for lead in leads], using)
+
+
+def _release(now, limit, using):
+    expired = list(
+        Lead.objects.using(using).filter(claim_expires_at__lt=now)
+        .select_for_update(skip_locked=True).order_by('claim_expires_at')[:limit]
+    )
+    if not expired:
+        return 0
+    returned = [lead for lead in expired if lead.status == 'new']
+    # leads moved on some other way keep their rep; the lease just ends
+    Lead.objects.using(using).filter(pk__in=[lead.pk for lead in expired]).update(claim_expires_at=None)
+    if returned:
+        Lead.objects.using(using).filter(pk__in=[lead.pk for lead in returned]).update(assigned_to=None, updated_at=now)
+        _reassign(returned, None, using)
+    return len(returned)
+
+
+def release_expired(limit=500, using=DEFAULT_DB_ALIAS):
+    """Put up to ``limit`` leads whose lease ran out while still new back in the queue; return how many."""
+    with transaction.atomic(using=using), push.batch():
+        return _release(timezone.now(), limit, using)
+
+
+def claim(user, n=1, source=None, using=DEFAULT_DB_ALIAS):
+    """Assign up to ``n`` of the oldest queued leads to ``user``; return them and the lease end."""
+    now = timezone.now()
+    expires = now + timedelta(seconds=settings.LEAD_CLAIM_LEASE_SECONDS)
+    # the events of the release and the claim go out in one statement
+    with transaction.atomic(using=using), push.batch():
+        # released rows are back in the queue for the select below, in the same transaction
+        _release(now, 500, using)
+        qs = queued().using(using)
+        if source:
+            qs = qs.filter(source=source)
+        # rows another claimer holds are skipped, not waited for; one it claimed
+        # meanwhile fails the WHERE PostgreSQL re-checks after locking
+        leads = list(qs.select_for_update(skip_locked=True).order_by('created_at', 'id')[:n])
+        if not leads:
+            return [], expires
+        Lead.objects.using(using).filter(pk__in=[lead.pk for lead in leads]).update(
+            assigned_to=user, claim_expires_at=expires, updated_at=now,
+        )
+        _reassign(leads, user.pk, using)
+    for lead in leads:
+        lead.assigned_to = user
+        lead.claim_expires_at = expires
+        lead.updated_at = now
+    return leads, expires
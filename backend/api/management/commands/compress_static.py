@@ -0,0 +1,51 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.html', '.js', '.mjs', '.css', '.json', '.map', '.svg', '.txt', '.xml', '.webmanifest')
+
+
+class Command(BaseCommand):
+    help = (
+        'Write .gz (and .br, if the brotli package is installed) next to every compressible '
+        'file in STATIC_ROOT. Run after `npm run build`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-size', type=int, default=512, help='Skip files smaller than this many bytes.')
+
+    def handle(self, *args, **options):
+        if brotli is None and options['verbosity']:
+            self.stdout.write(self.style.WARNING('brotli not installed; writing gzip variants only'))
+
+        written = saved = 0
+        for dirpath, _dirnames, filenames in os.walk(settings.STATIC_ROOT):
+            for filename in filenames:
+                if not filename.endswith(COMPRESSIBLE):
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as fh:
+                    body = fh.read()
+                if len(body) < options['min_size']:
+                    continue
+
+                variants = [('.gz', gzip.compress(body, compresslevel=9, mtime=0))]
+                if brotli is not None:
+                    variants.append(('.br', brotli.compress(body, quality=11)))
+                for suffix, data in variants:
+                    if len(data) >= len(body):
+                        continue
+                    with open(path + suffix, 'wb') as fh:
+                        fh.write(data)
+                    written += 1
+                    saved += len(body) - len(data)
+
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} compressed files ({saved / 1024:.0f} KiB smaller in total)'))
@@ -0,0 +1,64 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from api.meta_leads import MetaLeadImporter, meta_config
+from api.meta_webhook import consume
+from api.models import MetaLeadNotification
+
+# how often the pool of sales reps to assign to is reloaded
+IMPORTER_REFRESH_SECONDS = 300
+
+
+class Command(BaseCommand):
+    help = (
+        'Fetch and import the leads queued by the Meta leadgen webhook. Runs until interrupted '
+        '(or with --once until the queue is empty); run as many as the Graph API rate allows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=200, help='Leads leased and fetched per pass.')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once no queued lead is due.')
+        parser.add_argument('--keep-days', type=int, default=7,
+                            help='Days processed notifications are kept to drop redeliveries of their leads.')
+
+    def handle(self, *args, **options):
+        config = meta_config()
+        if config is None:
+            raise CommandError('Facebook credentials (access token and page id(s)) must be configured in settings')
+        access_token, _page_list, api_version = config
+
+        importer = None
+        loaded_at = 0
+        totals = [0, 0, 0, 0]
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - loaded_at > IMPORTER_REFRESH_SECONDS:
+                    # pick up reps added or deactivated since, continuing the round-robin
+                    rr_index = importer.rr_index if importer else 0
+                    importer = MetaLeadImporter()
+                    importer.rr_index = rr_index
+                    loaded_at = time.monotonic()
+                    MetaLeadNotification.objects.filter(
+                        processed_at__lt=timezone.now() - timedelta(days=options['keep_days']),
+                    ).delete()
+
+                counts = consume(importer, access_token, api_version, options['batch'])
+                totals = [total + count for total, count in zip(totals, counts)]
+                if options['verbosity'] > 1 and counts[0]:
+                    self.stdout.write('leased {} leads: {} created, {} skipped, {} fetches failed'.format(*counts))
+                if counts[0] < options['batch']:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(
+                'Leased {} queued Meta leads: {} created, {} skipped, {} fetches failed'.format(*totals)
+            ))
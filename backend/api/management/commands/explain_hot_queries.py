@@ -0,0 +1,113 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from api.lead_queue import queued
+from api.models import AccountOpening, Attendance, FollowUp, Lead, Task, User
+from api.views import visible_leads
+
+# Lists without ?page= are unbounded; the paginated form is what the planner
+# sees for the default page.
+PAGE = 50
+
+
+def hot_queries(rep, admin, staff):
+    """``(name, queryset)`` for the filters and orderings the views run."""
+    today = timezone.now().date()
+    return [
+        ('leads of a sales rep (LeadsListView)', visible_leads(rep).order_by('-created_at')),
+        ('leads page for admins (LeadsListView)', visible_leads(admin).order_by('-created_at')[:PAGE]),
+        ('leads by status', Lead.objects.filter(status='contacted').order_by('-created_at')[:PAGE]),
+        ('lead dedupe by external_id (MetaLeadImporter)', Lead.objects.filter(external_id='probe')[:1]),
+        ('lead dedupe by email (MetaLeadImporter)', Lead.objects.filter(email__iexact='probe@example.com')[:1]),
+        ('lead dedupe by phone (MetaLeadImporter)', Lead.objects.filter(phone='+910000000000')[:1]),
+        # without FOR UPDATE SKIP LOCKED, which needs a transaction; the plan is the same
+        ('claim queue (ClaimNextLeadsView)', queued().order_by('created_at', 'id')[:5]),
+        ('claim queue of a source', queued().filter(source='csv').order_by('created_at', 'id')[:5]),
+        ('follow-ups page (FollowUpListView)', FollowUp.objects.all().order_by('-scheduled_date')[:PAGE]),
+        ('account openings page (AccountOpeningListCreateView)', AccountOpening.objects.select_related(
+            'lead', 'created_by',
+        ).order_by('-created_at', '-id')[:PAGE]),
+        ('follow-ups due today', FollowUp.objects.filter(scheduled_date=today)),
+        ('attendance today (AttendanceViewSet.today)', Attendance.objects.filter(user=rep, date=today)),
+        ('own attendance (AttendanceViewSet.my_records)', Attendance.objects.filter(user=rep).order_by('-date')),
+        ('attendance page for admins (AttendanceViewSet.list)', Attendance.objects.all()[:PAGE]),
+        ('checked-in users (AttendanceViewSet.active_users)', Attendance.objects.filter(
+            date=today, time_in__isnull=False, time_out__isnull=True,
+        ).select_related('user')),
+        ('tasks of a staff user (StaffTaskViewSet)', Task.objects.filter(assigned_to=staff)),
+        ('open tasks of a staff user', Task.objects.filter(Q(assigned_to=staff) & ~Q(status='completed'))),
+    ]
+
+
+def table_scans(plan):
+    """``(node type, table, index)`` of every table or index read in an EXPLAIN (FORMAT JSON) plan."""
+    scans = []
+    if 'Relation Name' in plan or 'Index Name' in plan:
+        scans.append((plan['Node Type'], plan.get('Relation Name'), plan.get('Index Name')))
+    for child in plan.get('Plans', []):
+        scans.extend(table_scans(child))
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the hot queries of the API views against the current (seeded) PostgreSQL '
+        'database and fail if any of them scans a large table sequentially.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=10000,
+                            help='Ignore sequential scans of tables estimated to hold fewer rows.')
+        parser.add_argument('--analyze', action='store_true', help='Run ANALYZE on the tables first.')
+        parser.add_argument('--timing', action='store_true', help='Execute the queries (EXPLAIN ANALYZE) and report their run time.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('explain_hot_queries needs PostgreSQL plans; point DB_* at a seeded database.')
+
+        tables = [model._meta.db_table for model in (Lead, FollowUp, AccountOpening, Attendance, Task, User)]
+        with connection.cursor() as cursor:
+            if options['analyze']:
+                for table in tables:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+            cursor.execute('SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)', [tables])
+            estimated_rows = dict(cursor.fetchall())
+
+        users = {
+            user_type: User.objects.filter(user_type=user_type).order_by('id').first()
+            for user_type in ('sales', 'admin', 'staff')
+        }
+        missing = [user_type for user_type, user in users.items() if user is None]
+        if missing:
+            raise CommandError(f"No {', '.join(missing)} users; seed the database first (manage.py seed_scale).")
+
+        failures = []
+        for name, queryset in hot_queries(users['sales'], users['admin'], users['staff']):
+            result = json.loads(queryset.explain(format='json', analyze=options['timing']))[0]
+            plan = result['Plan']
+            scans = table_scans(plan)
+            large = [
+                table for node, table, _index in scans
+                if node == 'Seq Scan' and estimated_rows.get(table, 0) >= options['min_rows']
+            ]
+            summary = ', '.join(
+                ' '.join(filter(None, (node, table and f'on {table}', index and f'using {index}')))
+                for node, table, index in scans
+            )
+            if options['timing']:
+                summary += f" in {result['Execution Time']:.1f}ms"
+            if large:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'SEQ SCAN  {name}: {summary}'))
+            elif options['verbosity']:
+                self.stdout.write(f"ok        {name}: {summary} (cost {plan['Total Cost']:.0f})")
+            if options['verbosity'] > 1:
+                self.stdout.write(queryset.explain())
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries fall back to a sequential scan')
+        self.stdout.write(self.style.SUCCESS('All hot queries use indexes'))
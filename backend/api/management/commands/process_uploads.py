@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.models import StoredFile
+from api.uploads import process_stored_file
+
+
+class Command(BaseCommand):
+    help = 'Thumbnail stored uploads that the background worker has not processed yet.'
+
+    def handle(self, *args, **options):
+        pending = list(StoredFile.objects.filter(processed_at__isnull=True).values_list('pk', flat=True))
+        for pk in pending:
+            process_stored_file(pk)
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(f'Processed {len(pending)} stored files'))
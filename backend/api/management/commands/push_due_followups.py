@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import push
+from api.models import FollowUp
+
+
+class Command(BaseCommand):
+    help = (
+        "Push a followup.due event for each follow-up scheduled for today to the rep of its lead. "
+        'Run it from cron right after midnight; follow-ups saved for a day that has begun are pushed when saved.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', dest='day', type=date.fromisoformat, default=None,
+                            help='Day to announce (YYYY-MM-DD, default: today).')
+
+    def handle(self, *args, **options):
+        if push.backend() != 'postgres':
+            raise CommandError("The 'local' push backend only reaches the streams of its own process; use PostgreSQL.")
+        day = options['day'] or timezone.localdate()
+        due = FollowUp.objects.filter(scheduled_date=day).values_list('id', 'lead__assigned_to', 'created_by')
+        count = 0
+        with push.batch():
+            for followup_id, assignee, created_by in due.iterator():
+                # the rep working the lead, else whoever scheduled it
+                push.publish(assignee or created_by, 'followup.due', [followup_id])
+                count += 1
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(f'Pushed {count} follow-ups due on {day}'))
@@ -0,0 +1,31 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily sales rollups from leads, account openings and follow-ups, '
+        'e.g. after bulk imports or raw SQL that bypassed the model signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=date.fromisoformat, default=None,
+                            help='First day to rebuild (YYYY-MM-DD, default: all history).')
+        parser.add_argument('--to', dest='end', type=date.fromisoformat, default=None,
+                            help='Last day to rebuild (YYYY-MM-DD, default: all history).')
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError('--from must not be after --to')
+        started = time.perf_counter()
+        count = rollups.rebuild(start, end)
+        if options['verbosity']:
+            span = f"{start or 'the beginning'} to {end or 'today'}"
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {count:,} rollup rows for {span} in {time.perf_counter() - started:.1f}s'
+            ))
@@ -0,0 +1,410 @@
+import io
+import json
+import random
+import re
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api import rollups
+from api.models import AccountOpening, Attendance, FollowUp, Lead, LeadStatusEvent, PaymentProof, Task, User
+
+CITIES = (
+    'Chennai', 'Bengaluru', 'Mumbai', 'Delhi', 'Hyderabad', 'Pune', 'Kolkata', 'Coimbatore',
+    'Madurai', 'Ahmedabad', 'Jaipur', 'Kochi', 'Lucknow', 'Trichy', 'Salem', 'Vizag',
+)
+FIRST_NAMES = (
+    'Arun', 'Priya', 'Karthik', 'Divya', 'Rahul', 'Sneha', 'Vijay', 'Anitha', 'Suresh', 'Lakshmi',
+    'Ravi', 'Meena', 'Ajay', 'Kavya', 'Naveen', 'Deepa', 'Manoj', 'Revathi', 'Sanjay', 'Pooja',
+)
+LAST_NAMES = (
+    'Kumar', 'Sharma', 'Reddy', 'Iyer', 'Nair', 'Patel', 'Singh', 'Rao', 'Menon', 'Das',
+    'Pillai', 'Gupta', 'Joshi', 'Krishnan', 'Mehta', 'Bose',
+)
+EMAIL_DOMAINS = ('gmail.com', 'yahoo.com', 'outlook.com', 'rediffmail.com', 'hotmail.com')
+TASK_WORDS = ('Call back', 'Prepare', 'Review', 'Update', 'Verify', 'Send', 'Follow up on', 'Close')
+TASK_OBJECTS = ('KYC documents', 'deposit receipt', 'weekly report', 'lead list', 'trading account', 'demo session')
+
+LEAD_STATUSES = (('new', 50), ('contacted', 30), ('not_interested', 12), ('converted', 8))
+LEAD_SOURCES = (('facebook', 55), ('csv', 30), ('website', 10), ('referral', 5))
+ATTENDANCE_STATUSES = (('present', 85), ('late', 7), ('absent', 5), ('permission', 3))
+TASK_STATUSES = (('pending', 35), ('in_progress', 25), ('completed', 40))
+TASK_PRIORITIES = (('low', 30), ('medium', 50), ('high', 20))
+
+SEED_PASSWORD = 'seed-password'
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    cum_weights = list(accumulate(weights))
+    return lambda: rng.choices(values, cum_weights=cum_weights)[0]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let generated ``created_at``/``updated_at`` values through ``bulk_create``."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+NEEDS_ESCAPE = re.compile(r'[\\\t\n\r]')
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_value(value):
+    """Format one value for COPY ... FROM STDIN in text format."""
+    if value is None:
+        return '\\N'
+    cls = value.__class__
+    if cls is int or cls is Decimal:
+        return str(value)
+    if cls is bool:
+        return 't' if value else 'f'
+    if cls is str:
+        return value.translate(COPY_ESCAPES) if NEEDS_ESCAPE.search(value) else value
+    if cls is dict or cls is list:
+        return json.dumps(value).translate(COPY_ESCAPES)
+    return value.isoformat()
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic, production-shaped dataset for load tests: users, leads with '
+        'skewed assignment and Meta-style raw_data, tasks, multi-year attendance, follow-ups, '
+        'account openings and payment proofs. Uses COPY on PostgreSQL and bulk_create elsewhere.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--leads', type=int, default=100000)
+        parser.add_argument('--tasks', type=int, default=20000)
+        parser.add_argument('--attendance-days', type=int, default=730,
+                            help='Working days of attendance per non-student user, ending at --end-date.')
+        parser.add_argument('--followups', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help='Last day of generated activity (YYYY-MM-DD, default today). '
+                                 'The same seed and end date always produce the same rows.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--method', choices=('auto', 'copy', 'bulk'), default='auto',
+                            help='auto = COPY on PostgreSQL, bulk_create otherwise.')
+        parser.add_argument('--prefix', default='seed-', help='Username prefix of generated users.')
+
+    def handle(self, *args, **options):
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('--method=copy needs PostgreSQL')
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Users prefixed '{options['prefix']}' already exist; pass another --prefix")
+
+        self.options = options
+        self.method = method
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.tz = timezone.get_current_timezone()
+        self.end = options['end_date'] or timezone.localdate()
+        self.now = datetime.combine(self.end, dtime(19, 0), self.tz)
+        self.ids = {model: (model.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+                    for model in (User, Lead, LeadStatusEvent, Task, Attendance, FollowUp, AccountOpening, PaymentProof)}
+
+        started = time.perf_counter()
+        total = 0
+        with explicit_timestamps(User, Lead, Task, Attendance, FollowUp, AccountOpening, PaymentProof):
+            total += self.write(User, self.users())
+            total += self.write(Lead, self.leads())
+            total += self.write(LeadStatusEvent, self.status_events())
+            total += self.write(Task, self.tasks())
+            total += self.write(Attendance, self.attendance())
+            total += self.write(FollowUp, self.followups())
+            total += self.write(AccountOpening, self.account_openings())
+            total += self.write(PaymentProof, self.payment_proofs())
+        self.reset_sequences()
+        # COPY and bulk_create bypass the signals that keep the rollups current
+        rollup_rows = rollups.rebuild()
+
+        elapsed = time.perf_counter() - started
+        if self.options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Seeded {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s, {self.method}); '
+                f"{rollup_rows:,} daily rollup rows; users log in with password '{SEED_PASSWORD}'"
+            ))
+
+    def rng(self, name):
+        return random.Random(f'{self.seed}:{name}')
+
+    def moment(self, rng, days_back, skew=1.0):
+        """Return an aware datetime ``days_back`` days or less before the end date, recent-biased if ``skew`` > 1."""
+        back = days_back * rng.random() ** skew
+        moment = self.now - timedelta(days=back)
+        return moment.replace(hour=rng.randint(9, 20), minute=rng.randrange(60), second=rng.randrange(60), microsecond=0)
+
+    # -- writers ---------------------------------------------------------
+
+    def write(self, model, rows):
+        """Insert ``(columns, row)`` tuples from ``rows`` in batches and return the row count."""
+        started = time.perf_counter()
+        count = 0
+        columns = None
+        batch = []
+        with transaction.atomic():
+            for columns, row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self.flush(model, columns, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.flush(model, columns, batch)
+                count += len(batch)
+        if self.options['verbosity']:
+            elapsed = time.perf_counter() - started
+            rate = count / elapsed if elapsed else 0
+            self.stdout.write(f'  {model._meta.db_table:<20} {count:>12,} rows  {elapsed:7.1f}s  {rate:>10,.0f} rows/s')
+        return count
+
+    def flush(self, model, columns, batch):
+        if self.method == 'bulk':
+            model.objects.bulk_create([model(**dict(zip(columns, row))) for row in batch])
+            return
+        db_columns = [model._meta.get_field(name).column for name in columns]
+        buffer = io.StringIO()
+        for row in batch:
+            buffer.write('\t'.join(map(_copy_value, row)))
+            buffer.write('\n')
+        sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({", ".join(map(connection.ops.quote_name, db_columns))}) FROM STDIN'
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                buffer.seek(0)
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Lead, LeadStatusEvent, Task, Attendance, FollowUp, AccountOpening, PaymentProof],
+        )
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    # -- generators ------------------------------------------------------
+
+    def users(self):
+        rng = self.rng('users')
+        count = self.options['users']
+        password = make_password(SEED_PASSWORD, salt='seedscale')
+        admins = max(1, count // 100)
+        staff = max(1, count // 20) if count > admins else 0
+        sales = max(1, count // 4) if count > admins + staff else 0
+        roles = ['admin'] * admins + ['staff'] * staff + ['sales'] * sales
+        roles += ['student'] * (count - len(roles))
+
+        self.user_ids = {'admin': [], 'staff': [], 'sales': [], 'student': []}
+        columns = ('id', 'username', 'email', 'first_name', 'last_name', 'password', 'user_type', 'is_staff',
+                   'is_superuser', 'is_active', 'is_verified', 'date_joined', 'created_at', 'updated_at')
+        pk = self.ids[User]
+        for i, role in enumerate(roles):
+            joined = self.moment(rng, self.options['attendance_days'] + 30, skew=0.7)
+            username = f"{self.options['prefix']}{role}{i:06d}"
+            self.user_ids[role].append(pk)
+            yield columns, (
+                pk, username, f'{username}@example.com', rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                password, role, role in ('admin', 'staff'), role == 'admin', rng.random() > 0.03,
+                rng.random() > 0.2, joined, joined, joined,
+            )
+            pk += 1
+
+    def leads(self):
+        rng = self.rng('leads')
+        status = weighted(rng, LEAD_STATUSES)
+        source = weighted(rng, LEAD_SOURCES)
+        reps = list(self.user_ids['sales'])
+        rng.shuffle(reps)
+        # a few reps own most of the leads (Zipf-like)
+        rep_weights = list(accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(reps))))
+        forms = [str(900000000000000 + rng.randrange(10 ** 14)) for _ in range(20)]
+        days_back = max(self.options['attendance_days'], 30)
+
+        self.leads_meta = []  # (id, assigned_to, status, created_at, source) for dependent tables
+        seen_emails, seen_phones = [], []
+        columns = ('id', 'name', 'email', 'phone', 'city', 'source', 'status', 'assigned_to_id',
+                   'external_id', 'form_id', 'raw_data', 'created_at', 'updated_at')
+        pk = self.ids[Lead]
+        for _ in range(self.options['leads']):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            name = f'{first} {last}'
+            roll = rng.random()
+            if seen_emails and roll < 0.04:
+                # same person again, typed differently
+                email = rng.choice(seen_emails).upper()
+            else:
+                email = f'{first}.{last}{rng.randrange(10000)}@{rng.choice(EMAIL_DOMAINS)}'.lower()
+            if seen_phones and 0.04 <= roll < 0.07:
+                phone = rng.choice(seen_phones)
+            else:
+                phone = f'9{rng.randrange(10 ** 9):09d}'
+            if len(seen_emails) < 50000:
+                seen_emails.append(email)
+                seen_phones.append(phone)
+
+            lead_source = source()
+            created = self.moment(rng, days_back, skew=1.6)
+            city = rng.choice(CITIES)
+            lead_status = status()
+            assigned = rng.choices(reps, cum_weights=rep_weights)[0] if reps and rng.random() > 0.1 else None
+            external_id = form_id = raw_data = None
+            if lead_source == 'facebook':
+                external_id = f"{self.options['prefix']}{pk}"
+                form_id = rng.choice(forms)
+                raw_data = {
+                    'id': external_id,
+                    'created_time': created.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+0000'),
+                    'form_id': form_id,
+                    'field_data': [
+                        {'name': 'full_name', 'values': [name]},
+                        {'name': 'email', 'values': [email]},
+                        {'name': 'phone_number', 'values': [f'+91{phone}']},
+                        {'name': 'city', 'values': [city]},
+                    ],
+                }
+            self.leads_meta.append((pk, assigned, lead_status, created, lead_source))
+            yield columns, (
+                pk, name, email, phone, city, lead_source, lead_status, assigned,
+                external_id, form_id, raw_data, created, created + timedelta(hours=rng.randrange(72)),
+            )
+            pk += 1
+
+    def status_events(self):
+        rng = self.rng('status_events')
+        columns = ('id', 'lead_id', 'from_status', 'to_status', 'at', 'changed_by_id', 'sales_user_id', 'source')
+        pk = self.ids[LeadStatusEvent]
+        for lead_id, assigned, lead_status, created, lead_source in self.leads_meta:
+            history = [('', 'new', created, None)]
+            if lead_status != 'new':
+                # first contact within a day or two, a decision days to weeks later
+                contacted = min(created + timedelta(hours=rng.lognormvariate(2.5, 1.0)), self.now)
+                history.append(('new', 'contacted', contacted, assigned))
+                if lead_status != 'contacted':
+                    decided = min(contacted + timedelta(hours=rng.lognormvariate(4.5, 0.8)), self.now)
+                    history.append(('contacted', lead_status, decided, assigned))
+            for from_status, to_status, at, changed_by in history:
+                yield columns, (pk, lead_id, from_status, to_status, at.replace(microsecond=0), changed_by, assigned, lead_source)
+                pk += 1
+
+    def tasks(self):
+        rng = self.rng('tasks')
+        status = weighted(rng, TASK_STATUSES)
+        priority = weighted(rng, TASK_PRIORITIES)
+        assignees = self.user_ids['staff'] + self.user_ids['sales']
+        columns = ('id', 'title', 'description', 'status', 'priority', 'assigned_to_id', 'deadline',
+                   'completion_notes', 'created_at', 'updated_at')
+        pk = self.ids[Task]
+        for _ in range(self.options['tasks']):
+            created = self.moment(rng, max(self.options['attendance_days'], 30), skew=1.3)
+            task_status = status()
+            yield columns, (
+                pk, f'{rng.choice(TASK_WORDS)} {rng.choice(TASK_OBJECTS)}', '', task_status, priority(),
+                rng.choice(assignees) if assignees else None,
+                created + timedelta(days=rng.randint(1, 14)) if rng.random() < 0.8 else None,
+                'Done' if task_status == 'completed' else None,
+                created, created + timedelta(hours=rng.randrange(240)),
+            )
+            pk += 1
+
+    def attendance(self):
+        rng = self.rng('attendance')
+        status = weighted(rng, ATTENDANCE_STATUSES)
+        people = self.user_ids['admin'] + self.user_ids['staff'] + self.user_ids['sales']
+        days = []
+        day = self.end
+        while len(days) < self.options['attendance_days']:
+            if day.weekday() != 6:  # Sundays off
+                days.append(day)
+            day -= timedelta(days=1)
+
+        columns = ('id', 'user_id', 'date', 'time_in', 'time_out', 'status', 'remarks', 'created_at', 'updated_at')
+        pk = self.ids[Attendance]
+        for day in reversed(days):
+            for user_id in people:
+                day_status = status()
+                time_in = time_out = None
+                if day_status in ('present', 'late'):
+                    minutes = 9 * 60 + (rng.randint(15, 75) if day_status == 'late' else rng.randint(-20, 10))
+                    time_in = dtime(minutes // 60, minutes % 60)
+                    if day != self.end:
+                        out = 18 * 60 + rng.randint(-30, 90)
+                        time_out = dtime(out // 60, out % 60)
+                stamp = datetime.combine(day, time_in or dtime(10, 0), self.tz)
+                yield columns, (
+                    pk, user_id, day, time_in, time_out, day_status,
+                    'Medical leave' if day_status == 'permission' else None, stamp, stamp,
+                )
+                pk += 1
+
+    def followups(self):
+        rng = self.rng('followups')
+        candidates = [lead for lead in self.leads_meta if lead[2] in ('contacted', 'converted', 'new')]
+        columns = ('id', 'lead_id', 'scheduled_date', 'notes', 'created_by_id', 'created_at', 'updated_at')
+        pk = self.ids[FollowUp]
+        if not candidates:
+            return
+        for _ in range(self.options['followups']):
+            lead_id, assigned, _status, lead_created, _source = rng.choice(candidates)
+            created = lead_created + timedelta(hours=rng.randint(1, 240))
+            scheduled = (created + timedelta(days=rng.randint(0, 10))).date()
+            yield columns, (
+                pk, lead_id, scheduled, rng.choice(('Call back', 'Share brochure', 'Demo', 'Check documents')),
+                assigned, created, created,
+            )
+            pk += 1
+
+    def account_openings(self):
+        rng = self.rng('account_openings')
+        columns = ('id', 'lead_id', 'created_by_id', 'deposit_amount', 'notes', 'created_at', 'updated_at')
+        pk = self.ids[AccountOpening]
+        self.openings_meta = []
+        for lead_id, assigned, lead_status, lead_created, _source in self.leads_meta:
+            if lead_status != 'converted':
+                continue
+            created = lead_created + timedelta(days=rng.randint(1, 30))
+            amount = Decimal(round(rng.lognormvariate(9.5, 1.0), -2)).quantize(Decimal('0.01'))
+            self.openings_meta.append((lead_id, assigned, created))
+            yield columns, (pk, lead_id, assigned, amount, None, created, created)
+            pk += 1
+
+    def payment_proofs(self):
+        rng = self.rng('payment_proofs')
+        columns = ('id', 'lead_id', 'uploaded_by_id', 'file', 'notes', 'created_at', 'updated_at')
+        pk = self.ids[PaymentProof]
+        for lead_id, assigned, created in self.openings_meta:
+            if rng.random() < 0.5:
+                continue
+            # metadata only: the files themselves are not generated
+            yield columns, (pk, lead_id, assigned, f'indicator_proofs/seed/{pk}.jpg', None, created, created)
+            pk += 1
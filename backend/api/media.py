@@ -0,0 +1,149 @@
+import mimetypes
+import os
+import re
+from functools import partial
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .export import async_chunks, serves_async
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# bytes read per thread hop when streaming under ASGI
+ASYNC_CHUNK_SIZE = 64 * 1024
+
+
+class FileRange:
+    """Read-only view of ``length`` bytes of ``fh`` starting at ``start``.
+
+    Exposes the underlying ``fileno()`` with the file positioned at
+    ``start``, so a server's ``wsgi.file_wrapper`` (gunicorn) can
+    ``sendfile()`` exactly Content-Length bytes without copying them through
+    Python; other servers fall back to the bounded ``read()``.
+    """
+
+    def __init__(self, fh, start, length):
+        fh.seek(start)
+        self._fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self._fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._fh.fileno()
+
+    def close(self):
+        self._fh.close()
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` (inclusive) for a single byte range, ``None`` to
+    ignore the header, or ``False`` if the range cannot be satisfied."""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # malformed or multi-range: serve the whole file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _not_modified(request, etag, stat):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        tags = {t.strip().removeprefix('W/') for t in if_none_match.split(',')}
+        return etag in tags or '*' in tags
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    return bool(if_modified_since) and not was_modified_since(if_modified_since, stat.st_mtime)
+
+
+def _range_applies(request, etag, stat):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return not was_modified_since(if_range, stat.st_mtime)
+
+
+def media_response(request, name):
+    """Serve ``MEDIA_ROOT/name`` with Range, conditional GET and proxy offload.
+
+    With ``MEDIA_ACCEL_REDIRECT_PREFIX`` set (nginx ``internal`` location) or
+    ``MEDIA_SENDFILE_HEADER`` set (e.g. ``X-Sendfile`` for Apache/lighttpd)
+    the proxy transfers the bytes; otherwise the file is streamed here, in
+    ``ASYNC_CHUNK_SIZE`` reads under ASGI.
+    """
+    path = safe_join(settings.MEDIA_ROOT, name)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', None)
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if accel_prefix or sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        if accel_prefix:
+            response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + name
+        else:
+            response[sendfile_header] = path
+        return response
+
+    stat = os.stat(path)
+    etag = _etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, max-age=0, must-revalidate',
+    }
+    if _not_modified(request, etag, stat):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _range_applies(request, etag, stat):
+        byte_range = parse_range(range_header, stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    fh = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(fh, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(fh, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    if serves_async(request):
+        # FileResponse's own iterator would be read whole; the file is still closed with the response
+        response.streaming_content = async_chunks(iter(partial(response.file_to_stream.read, ASYNC_CHUNK_SIZE), b''))
+    for key, value in headers.items():
+        response[key] = value
+    return response
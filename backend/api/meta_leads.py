@@ -0,0 +1,150 @@
+import logging
+import os
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import lead_queue, push, status_events
+from .models import Lead, User
+
+DEFAULT_API_VERSION = '14.0'
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(*names, default=None):
+    # Prefer explicit settings, then the environment, under each of the names in turn.
+    for name in names:
+        value = getattr(settings, name, None)
+        if value:
+            return value
+    for name in names:
+        value = os.getenv(name)
+        if value:
+            return value
+    return default
+
+
+def meta_config():
+    """Return ``(access_token, page_ids, api_version)``, or None if Meta isn't configured.
+
+    Accepts the FACEBOOK_* names used by lead.py as well as the FB_* ones;
+    the page id setting may be a single id or a comma-separated list.
+    """
+    access_token = _setting('FACEBOOK_ACCESS_TOKEN', 'FB_ACCESS_TOKEN')
+    page_ids = _setting('FACEBOOK_PAGE_ID', 'FB_PAGE_IDS')
+    if not access_token or not page_ids:
+        return None
+    api_version = _setting('FB_API_VERSION', 'FACEBOOK_API_VERSION', default=DEFAULT_API_VERSION)
+    page_list = [p.strip() for p in str(page_ids).split(',') if p.strip()]
+    return access_token, page_list, api_version
+
+
+def graph_root(api_version):
+    base = getattr(settings, 'META_GRAPH_URL', 'https://graph.facebook.com').rstrip('/')
+    return f'{base}/v{api_version}'
+
+
+def graph_url(api_version, node, edge, access_token):
+    return f'{graph_root(api_version)}/{node}/{edge}?access_token={access_token}'
+
+
+def _field_value(item):
+    # support both {'name': 'email', 'values': ['a@b.com']} and {'name': 'email', 'values': [{'value':'a@b.com'}]}
+    values = item.get('values') or item.get('value') or []
+    if isinstance(values, list) and values:
+        first = values[0]
+        if isinstance(first, dict):
+            return first.get('value') or first.get('name')
+        return first
+    if isinstance(values, dict):
+        return values.get('value') or values.get('name')
+    return values
+
+
+def parse_lead_fields(field_data):
+    """Map a Meta lead's ``field_data`` onto name/email/phone/city.
+
+    Unknown fields are left out; the caller keeps the whole payload in
+    ``raw_data``.
+    """
+    info = {'name': None, 'email': None, 'phone': None, 'city': None}
+    for item in field_data or []:
+        key = item.get('name') or item.get('field') or None
+        value = _field_value(item)
+        if not key or value is None:
+            continue
+
+        k = key.lower()
+        v = str(value).strip()
+        if 'email' in k:
+            info['email'] = v
+        elif 'phone' in k or 'mobile' in k:
+            info['phone'] = v
+        elif 'name' in k:
+            info['name'] = v
+        elif 'city' in k or 'town' in k:
+            info['city'] = v
+    return info
+
+
+class MetaLeadImporter:
+    """Dedupes Meta leads against the table and creates the new ones.
+
+    New leads are assigned round-robin to the active sales users loaded when
+    the importer is created, or left for the claim queue in pull mode.
+    """
+
+    def __init__(self):
+        self.sales = [] if lead_queue.pull_mode() else list(User.objects.filter(user_type='sales', is_active=True))
+        self.rr_index = 0
+
+    def is_duplicate(self, external_id, email, phone):
+        # dedupe by external_id first, then email/phone
+        if external_id and Lead.objects.filter(external_id=external_id).exists():
+            return True
+        if email and Lead.objects.filter(email__iexact=email).exists():
+            return True
+        return bool(phone and Lead.objects.filter(phone=phone).exists())
+
+    def next_assignee(self):
+        if not self.sales:
+            return None
+        assigned = self.sales[self.rr_index % len(self.sales)]
+        self.rr_index += 1
+        return assigned
+
+    def import_lead(self, lead, form_id):
+        """Create one lead from a Graph API payload; return False if it was a duplicate."""
+        external_id = lead.get('id')
+        info = parse_lead_fields(lead.get('field_data'))
+        if self.is_duplicate(external_id, info['email'], info['phone']):
+            return False
+
+        Lead.objects.create(
+            **info,
+            source='facebook',
+            external_id=external_id,
+            form_id=form_id,
+            raw_data=lead,
+            assigned_to=self.next_assignee(),
+            created_at=lead.get('created_time') or timezone.now(),
+        )
+        return True
+
+    def import_batch(self, leads, form_id):
+        """Import one form's leads; return ``(created, skipped, errors)``."""
+        created = skipped = 0
+        errors = []
+        # one insert of status events and one push event per rep for the batch
+        with status_events.batch(), push.batch():
+            for lead in leads:
+                try:
+                    if self.import_lead(lead, form_id):
+                        created += 1
+                    else:
+                        skipped += 1
+                except Exception as e:
+                    logger.exception('Error creating lead')
+                    errors.append(str(e))
+        return created, skipped, errors
@@ -0,0 +1,176 @@
+"""Meta Lead Ads webhook: new leads pushed by Meta rather than polled.
+
+``POST /api/webhooks/meta/leadgen/`` checks the ``X-Hub-Signature-256`` HMAC
+of the body against ``META_APP_SECRET``, stores the leadgen ids it names as
+``MetaLeadNotification`` rows and answers at once, so bursts only cost Meta
+one insert per delivery. ``manage.py consume_meta_leads`` then works the
+queue: ``lease()`` takes the oldest pending rows with ``SELECT ... FOR UPDATE
+SKIP LOCKED`` (several consumers split the queue), ``fetch_leads()`` gets
+them from Graph in batch requests of ``GRAPH_BATCH_SIZE`` leads, and
+``MetaLeadImporter`` parses, dedupes and assigns them as the fetch view does.
+
+A lead is marked processed only after its import, and dedupe by
+``external_id`` makes importing it again harmless, so a consumer that dies
+mid-pass loses nothing: its lease runs out and another consumer retries.
+Leads Graph fails to return are retried with backoff.
+"""
+import hashlib
+import hmac
+import json
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .meta_leads import graph_root
+from .metrics import LEADS_IMPORTED
+from .models import MetaLeadNotification
+
+logger = logging.getLogger(__name__)
+
+# the most requests Graph accepts in one batch
+GRAPH_BATCH_SIZE = 50
+LEAD_FIELDS = 'id,created_time,field_data,form_id'
+SIGNATURE_PREFIX = 'sha256='
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'META_FETCH_CONCURRENCY', 8), thread_name_prefix='meta-webhook')
+
+
+def valid_signature(body, header):
+    """Whether ``header`` is the ``X-Hub-Signature-256`` Meta computes for ``body``."""
+    secret = settings.META_APP_SECRET
+    if not secret or not header or not header.startswith(SIGNATURE_PREFIX):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, header[len(SIGNATURE_PREFIX):])
+
+
+def leadgen_changes(payload):
+    """``(leadgen_id, form_id, page_id)`` of each leadgen change in a webhook payload."""
+    changes = []
+    if not isinstance(payload, dict) or payload.get('object') != 'page':
+        return changes
+    for entry in payload.get('entry') or []:
+        for change in entry.get('changes') or []:
+            value = change.get('value') or {}
+            if change.get('field') != 'leadgen' or not value.get('leadgen_id'):
+                continue
+            changes.append((
+                str(value['leadgen_id']),
+                str(value.get('form_id') or ''),
+                str(value.get('page_id') or entry.get('id') or ''),
+            ))
+    return changes
+
+
+def enqueue(changes):
+    """Queue the leads of ``changes``; ones queued by an earlier delivery are left alone."""
+    MetaLeadNotification.objects.bulk_create(
+        [MetaLeadNotification(leadgen_id=leadgen_id, form_id=form_id, page_id=page_id)
+         for leadgen_id, form_id, page_id in changes],
+        ignore_conflicts=True,
+    )
+
+
+def lease(limit):
+    """Take up to ``limit`` of the oldest pending notifications for ``META_WEBHOOK_LEASE_SECONDS``."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            MetaLeadNotification.objects.filter(processed_at__isnull=True, available_at__lte=now)
+            .select_for_update(skip_locked=True).order_by('available_at', 'id')[:limit]
+        )
+        for row in rows:
+            row.available_at = now + timedelta(seconds=settings.META_WEBHOOK_LEASE_SECONDS)
+            row.attempts += 1
+        MetaLeadNotification.objects.bulk_update(rows, ['available_at', 'attempts'])
+    return rows
+
+
+def _fetch_batch(leadgen_ids, access_token, api_version):
+    resp = requests.post(f'{graph_root(api_version)}/', data={
+        'access_token': access_token,
+        'include_headers': 'false',
+        'batch': json.dumps([
+            {'method': 'GET', 'relative_url': f'{leadgen_id}?fields={LEAD_FIELDS}'} for leadgen_id in leadgen_ids
+        ]),
+    }, timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def fetch_leads(leadgen_ids, access_token, api_version):
+    """Fetch leads from Graph, several batch requests at once; return ``({leadgen_id: lead}, {leadgen_id: error})``."""
+    batches = [leadgen_ids[i:i + GRAPH_BATCH_SIZE] for i in range(0, len(leadgen_ids), GRAPH_BATCH_SIZE)]
+    futures = [_executor.submit(_fetch_batch, batch, access_token, api_version) for batch in batches]
+    leads = {}
+    errors = {}
+    for batch, future in zip(batches, futures):
+        try:
+            responses = future.result()
+        except Exception as e:
+            errors.update(dict.fromkeys(batch, f'batch request: {e}'))
+            continue
+        # Graph answers null for the requests of a batch it didn't get to
+        responses = list(responses or []) + [None] * (len(batch) - len(responses or []))
+        for leadgen_id, response in zip(batch, responses):
+            if response is None:
+                errors[leadgen_id] = 'not answered in the batch'
+            elif response.get('code') != 200:
+                errors[leadgen_id] = f"HTTP {response.get('code')}: {str(response.get('body'))[:500]}"
+            else:
+                try:
+                    leads[leadgen_id] = json.loads(response['body'])
+                except (TypeError, ValueError) as e:
+                    errors[leadgen_id] = f'bad body: {e}'
+    return leads, errors
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(settings.META_WEBHOOK_RETRY_SECONDS * 2 ** (attempts - 1), 3600))
+
+
+def consume(importer, access_token, api_version, limit=200):
+    """Lease, fetch and import up to ``limit`` queued leads; return ``(leased, created, skipped, failed)``."""
+    rows = lease(limit)
+    if not rows:
+        return 0, 0, 0, 0
+    leads, errors = fetch_leads([row.leadgen_id for row in rows], access_token, api_version)
+
+    by_form = defaultdict(list)
+    for row in rows:
+        if row.leadgen_id in leads:
+            by_form[leads[row.leadgen_id].get('form_id') or row.form_id or None].append(leads[row.leadgen_id])
+    created = skipped = 0
+    import_errors = []
+    for form_id, form_leads in by_form.items():
+        form_created, form_skipped, form_errors = importer.import_batch(form_leads, form_id)
+        created += form_created
+        skipped += form_skipped
+        import_errors.extend(form_errors)
+
+    now = timezone.now()
+    for row in rows:
+        error = errors.get(row.leadgen_id)
+        if error is None:
+            # import errors are logged by the importer; another fetch wouldn't fix them
+            row.processed_at = now
+            row.error = ''
+        elif row.attempts >= settings.META_WEBHOOK_MAX_ATTEMPTS:
+            logger.error('Giving up on Meta lead %s after %s attempts: %s', row.leadgen_id, row.attempts, error)
+            row.processed_at = now
+            row.error = error
+        else:
+            row.available_at = now + retry_delay(row.attempts)
+            row.error = error
+    MetaLeadNotification.objects.bulk_update(rows, ['processed_at', 'available_at', 'error'])
+
+    LEADS_IMPORTED.labels(source='meta_webhook', result='created').inc(created)
+    LEADS_IMPORTED.labels(source='meta_webhook', result='skipped').inc(skipped)
+    LEADS_IMPORTED.labels(source='meta_webhook', result='error').inc(len(import_errors) + len(errors))
+    return len(rows), created, skipped, len(errors)
@@ -0,0 +1,209 @@
+import hmac
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, multiprocess
+except ImportError:  # pragma: no cover - prometheus_client is in requirements.txt
+    prometheus_client = None
+
+# Mirrors prometheus_client's defaults with more resolution under 100ms.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+    def set(self, value):
+        pass
+
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', 'Time spent processing a request.',
+        ['method', 'route'], buckets=LATENCY_BUCKETS,
+    )
+    REQUESTS = Counter('http_requests', 'Requests by route and status code.', ['method', 'route', 'status'])
+    DB_QUERIES = Histogram(
+        'db_query_duration_seconds', 'Time spent executing SQL statements.',
+        ['alias'], buckets=QUERY_BUCKETS,
+    )
+    DB_CONNECTIONS = Counter('db_connections_opened', 'Database connections opened.', ['alias'])
+    LEADS_IMPORTED = Counter('leads_imported', 'Leads seen by the CSV and Meta imports.', ['source', 'result'])
+    META_WEBHOOK_LEADS = Counter('meta_webhook_leads', 'Leadgen notifications received by the Meta webhook.', ['result'])
+    LOGINS = Counter('logins', 'Login attempts.', ['result'])
+    ATTENDANCE_MARKS = Counter('attendance_marks', 'Attendance check-ins and check-outs.', ['action', 'via'])
+    DB_REPLICA_LAG = Gauge(
+        'db_replica_lag_seconds', 'Replication lag seen by the last check of each replica.',
+        ['alias'], multiprocess_mode='livemax',
+    )
+    # psycopg_pool statistics, summed over live worker processes
+    POOL_GAUGES = {
+        stat: Gauge(f'db_pool_{stat}', description, ['alias'], multiprocess_mode='livesum')
+        for stat, description in (
+            ('pool_size', 'Connections currently managed by the pool.'),
+            ('pool_available', 'Idle connections in the pool.'),
+            ('requests_waiting', 'Clients waiting for a connection.'),
+            ('pool_max', 'Configured maximum pool size.'),
+        )
+    }
+    POOL_COUNTERS = {
+        stat: Counter(f'db_pool_{name}', description, ['alias'])
+        for stat, name, description in (
+            ('requests_num', 'requests', 'Connections handed out by the pool.'),
+            ('requests_queued', 'requests_queued', 'Requests that had to wait for a connection.'),
+            ('requests_wait_ms', 'requests_wait_milliseconds', 'Time spent waiting for a connection.'),
+            ('requests_errors', 'requests_errors', 'Requests that timed out or failed.'),
+            ('connections_num', 'connections_opened', 'Connections opened by the pool.'),
+            ('connections_errors', 'connection_errors', 'Failed connection attempts.'),
+            ('connections_lost', 'connections_lost', 'Broken connections found by health checks.'),
+        )
+    }
+else:  # pragma: no cover
+    REQUEST_LATENCY = REQUESTS = DB_QUERIES = DB_CONNECTIONS = _NoopMetric()
+    LEADS_IMPORTED = META_WEBHOOK_LEADS = LOGINS = ATTENDANCE_MARKS = DB_REPLICA_LAG = _NoopMetric()
+    POOL_GAUGES = POOL_COUNTERS = {}
+
+# Pool statistics are copied into the metrics at most this often per process.
+POOL_STATS_INTERVAL = 5
+_pool_stats_at = 0.0
+
+
+def _count_connection(sender, connection, **kwargs):
+    # with a pool this fires on every checkout; db_pool_connections_opened counts those
+    if getattr(connection, 'pool', None) is None:
+        DB_CONNECTIONS.labels(alias=connection.alias).inc()
+
+
+connection_created.connect(_count_connection, dispatch_uid='api.metrics.count_connection')
+
+
+_query_timers = {}
+
+
+def _query_timer(alias):
+    wrapper = _query_timers.get(alias)
+    if wrapper is None:
+        histogram = DB_QUERIES.labels(alias=alias)
+
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        _query_timers[alias] = wrapper
+    return wrapper
+
+
+def _time_queries(sender, connection, **kwargs):
+    # Installed per connection rather than around each request: under ASGI the
+    # queries run in a worker thread that has its own connection object.
+    wrapper = _query_timer(connection.alias)
+    if wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(wrapper)
+
+
+def refresh_pool_metrics(force=False):
+    """Copy psycopg_pool statistics of every pooled connection into the metrics."""
+    global _pool_stats_at
+    now = time.monotonic()
+    if not force and now - _pool_stats_at < POOL_STATS_INTERVAL:
+        return
+    _pool_stats_at = now
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is None:
+            continue
+        # pop_stats() resets the counters, so they can be added as deltas
+        stats = pool.pop_stats()
+        for stat, gauge in POOL_GAUGES.items():
+            gauge.labels(alias=alias).set(stats.get(stat, 0))
+        for stat, counter in POOL_COUNTERS.items():
+            if stats.get(stat):
+                counter.labels(alias=alias).inc(stats[stat])
+
+
+class MetricsMiddleware:
+    """Request latency/status and SQL timing for the ``/metrics`` endpoint.
+
+    Requests are labelled with the matched URL pattern (``api/leads/<int:pk>/``)
+    rather than the path, so the number of series stays bounded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if prometheus_client is None or not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(_time_queries, dispatch_uid='api.metrics.time_queries')
+        for connection in connections.all(initialized_only=True):
+            _time_queries(None, connection)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    def observe(self, request, response, start):
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        REQUEST_LATENCY.labels(method=request.method, route=route).observe(time.perf_counter() - start)
+        REQUESTS.labels(method=request.method, route=route, status=response.status_code).inc()
+        refresh_pool_metrics()
+
+
+def metrics_view(request):
+    """Prometheus text exposition, aggregated over all workers in multiprocess mode.
+
+    With ``METRICS_TOKEN`` set the scraper has to send it as a bearer token.
+    Without one the endpoint answers 404 unless ``METRICS_PUBLIC`` opts in to
+    serving it to anyone.
+    """
+    if prometheus_client is None:
+        return HttpResponse('prometheus_client is not installed\n', status=501, content_type='text/plain')
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse(status=401)
+    elif not getattr(settings, 'METRICS_PUBLIC', False):
+        return HttpResponse(status=404)
+
+    refresh_pool_metrics(force=True)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -0,0 +1,123 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import perf
+
+logger = logging.getLogger('api.perf')
+
+# How many statements to include when a request goes over budget.
+OFFENDING_SQL_LIMIT = 5
+
+
+def _wrap_connection(sender, connection, **kwargs):
+    if perf.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(perf.record_query)
+
+
+class PerformanceMiddleware:
+    """Per-request wall, DB, serializer and render timings for a sample of requests.
+
+    ``PERF_SAMPLE_RATE`` (0..1) picks the share of requests to measure; with 0
+    the middleware removes itself from the chain. Sampled requests get a
+    ``Server-Timing`` header and one JSON log line on ``api.perf``; requests
+    over ``PERF_QUERY_BUDGET`` queries or ``PERF_LATENCY_BUDGET_MS`` are
+    logged as warnings together with their slowest and most repeated SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.query_budget = getattr(settings, 'PERF_QUERY_BUDGET', 0)
+        self.latency_budget = getattr(settings, 'PERF_LATENCY_BUDGET_MS', 0)
+        connection_created.connect(_wrap_connection, dispatch_uid='api.middleware.wrap_connection')
+        for connection in connections.all(initialized_only=True):
+            _wrap_connection(None, connection)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = perf.RequestMetrics()
+        token = perf.activate(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.deactivate(token)
+
+        total = time.perf_counter() - metrics.start
+        self.report(request, response, metrics, total)
+        return response
+
+    async def __acall__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        # the ContextVar follows the request into sync_to_async threads
+        metrics = perf.RequestMetrics()
+        token = perf.activate(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.deactivate(token)
+
+        total = time.perf_counter() - metrics.start
+        self.report(request, response, metrics, total)
+        return response
+
+    def report(self, request, response, metrics, total):
+        duplicates = metrics.duplicate_queries()
+        timings = {'db': metrics.db_time, **metrics.timings, 'total': total}
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}' + (f';desc="{len(metrics.queries)} queries"' if name == 'db' else '')
+            for name, duration in timings.items()
+        )
+
+        if response.streaming:
+            size = response.get('Content-Length')
+            size = int(size) if size else None
+        else:
+            size = len(response.content)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'queries': len(metrics.queries),
+            'duplicate_queries': sum(duplicates.values()) - len(duplicates),
+            **{f'{name}_ms': round(duration * 1000, 2) for name, duration in metrics.timings.items()},
+            'bytes': size,
+        }
+
+        over_queries = self.query_budget and len(metrics.queries) > self.query_budget
+        over_latency = self.latency_budget and total * 1000 > self.latency_budget
+        if not (over_queries or over_latency):
+            logger.info(json.dumps(record))
+            return
+
+        slowest = sorted(metrics.queries, key=lambda q: q[1], reverse=True)[:OFFENDING_SQL_LIMIT]
+        record['over_budget'] = [name for name, over in (('queries', over_queries), ('latency', over_latency)) if over]
+        record['slowest_sql'] = [{'sql': sql, 'ms': round(duration * 1000, 2)} for sql, duration in slowest]
+        record['repeated_sql'] = [
+            {'sql': sql, 'count': count}
+            for sql, count in sorted(duplicates.items(), key=lambda d: d[1], reverse=True)[:OFFENDING_SQL_LIMIT]
+        ]
+        logger.warning(json.dumps(record))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.11 on 2026-10-19 15:15
+
+from django.db import migrations, models
+
+
+PREFIX_COLUMNS = ('username', 'email', 'first_name', 'last_name')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # lower(col) text_pattern_ops lets LIKE 'abc%' use the index under any
+    # collation; only PostgreSQL understands the operator class.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in PREFIX_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS api_user_{column}_lower_like '
+            f'ON api_user (lower({column}) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in PREFIX_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS api_user_{column}_lower_like')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_create_followup'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['user_type', 'is_active'], name='api_user_type_active_idx'),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.11 on 2026-10-19 16:23
+
+import django.db.models.functions.text
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL, so writes to the big tables
+    carry on while it builds; a plain CREATE INDEX elsewhere (SQLite for the
+    benchmarks).
+
+    An interrupted concurrent build leaves an INVALID index behind, which is
+    dropped before retrying.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid '
+                'WHERE pg_class.relname = %s AND NOT pg_index.indisvalid',
+                [self.index.name],
+            )
+            invalid = cursor.fetchone() is not None
+        if invalid:
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY {schema_editor.quote_name(self.index.name)}')
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0011_content_addressed_uploads'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='attendance',
+            index=models.Index(fields=['-date'], name='api_attendance_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('time_in__isnull', False), ('time_out__isnull', True)), fields=['date'], name='api_attendance_open_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='followup',
+            index=models.Index(fields=['-scheduled_date', '-created_at'], name='api_followup_scheduled_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['-created_at'], name='api_lead_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['assigned_to', '-created_at'], name='api_lead_assignee_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['status', '-created_at'], name='api_lead_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='api_lead_email_upper_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(fields=['phone'], name='api_lead_phone_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['assigned_to', 'status'], name='api_task_assignee_status_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-19 16:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('source', models.CharField(blank=True, default='', max_length=100)),
+                ('leads_new', models.IntegerField(default=0)),
+                ('leads_contacted', models.IntegerField(default=0)),
+                ('leads_not_interested', models.IntegerField(default=0)),
+                ('leads_converted', models.IntegerField(default=0)),
+                ('account_openings', models.IntegerField(default=0)),
+                ('deposits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('followups', models.IntegerField(default=0)),
+                ('sales_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sales_user', 'day'], name='api_rollup_user_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'sales_user', 'source'), name='api_rollup_day_user_source_uniq')],
+            },
+        ),
+    ]
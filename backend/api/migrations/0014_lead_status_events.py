@@ -0,0 +1,46 @@
+# Generated by Django 5.2.11 on 2026-10-19 16:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_current_statuses(apps, schema_editor):
+    # Earlier changes weren't recorded: start every existing lead in its current
+    # status, entered when it was created ('new') or last updated (anything else).
+    Lead = apps.get_model('api', 'Lead')
+    LeadStatusEvent = apps.get_model('api', 'LeadStatusEvent')
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"INSERT INTO {quote(LeadStatusEvent._meta.db_table)} (lead_id, from_status, to_status, at, sales_user_id, source) "
+        f"SELECT id, '', status, CASE WHEN status = 'new' THEN created_at ELSE updated_at END, assigned_to_id, COALESCE(source, '') "
+        f"FROM {quote(Lead._meta.db_table)}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_daily_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, default='', max_length=20)),
+                ('to_status', models.CharField(choices=[('new', 'New'), ('contacted', 'Contacted'), ('not_interested', 'Not Interested'), ('converted', 'Converted')], max_length=20)),
+                ('at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source', models.CharField(blank=True, default='', max_length=100)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('lead', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='api.lead')),
+                ('sales_user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['lead', 'at'], name='api_statusevent_lead_at_idx'), models.Index(fields=['to_status', 'at'], name='api_statusevent_status_at_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_current_statuses, migrations.RunPython.noop),
+    ]
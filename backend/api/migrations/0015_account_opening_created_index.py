@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-19 16:47
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+AddIndexConcurrently = import_module('api.migrations.0012_hot_path_indexes').AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0014_lead_status_events'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='accountopening',
+            index=models.Index(fields=['-created_at'], name='api_accountopening_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.11 on 2026-10-19 17:25
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+AddIndexConcurrently = import_module('api.migrations.0012_hot_path_indexes').AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0015_account_opening_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True), ('status', 'new')), fields=['created_at', 'id'], name='api_lead_queue_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True), ('status', 'new')), fields=['source', 'created_at', 'id'], name='api_lead_queue_source_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('claim_expires_at__isnull', False)), fields=['claim_expires_at'], name='api_lead_claim_lease_idx'),
+        ),
+    ]
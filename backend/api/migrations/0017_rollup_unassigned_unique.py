@@ -0,0 +1,40 @@
+# Generated by Django 5.2.11 on 2026-10-19 18:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+COUNTER_FIELDS = [
+    'leads_new', 'leads_contacted', 'leads_not_interested', 'leads_converted',
+    'account_openings', 'deposits', 'followups',
+]
+
+
+def merge_unassigned_duplicates(apps, schema_editor):
+    # Concurrent writes could create the unassigned row of a day and source more
+    # than once; fold each set into its oldest row so the constraint can be added.
+    DailySalesRollup = apps.get_model('api', 'DailySalesRollup')
+    if schema_editor.connection.vendor == 'postgresql':
+        # as rollups.rebuild() does, so no new duplicate lands before the constraint
+        schema_editor.execute(f'LOCK TABLE {schema_editor.quote_name(DailySalesRollup._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE')
+    unassigned = DailySalesRollup.objects.filter(sales_user__isnull=True).order_by()
+    duplicates = unassigned.values('day', 'source').annotate(
+        rows=Count('id'), keep=Min('id'), **{f'sum_{name}': Sum(name) for name in COUNTER_FIELDS},
+    ).filter(rows__gt=1)
+    for row in duplicates:
+        unassigned.filter(pk=row['keep']).update(**{name: row[f'sum_{name}'] for name in COUNTER_FIELDS})
+        unassigned.filter(day=row['day'], source=row['source']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_lead_claim_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_unassigned_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('sales_user__isnull', True)), fields=('day', 'source'), name='api_rollup_day_unassigned_uniq'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-19 18:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_rollup_unassigned_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetaLeadNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leadgen_id', models.CharField(max_length=200, unique=True)),
+                ('form_id', models.CharField(blank=True, default='', max_length=200)),
+                ('page_id', models.CharField(blank=True, default='', max_length=200)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['available_at', 'id'], name='api_metanotif_pending_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 
@@ -17,6 +18,9 @@ class User(AbstractUser):
 
     class Meta:
         app_label = 'api'
+        indexes = [
+            models.Index(fields=['user_type', 'is_active'], name='api_user_type_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.user_type})"
@@ -42,6 +46,14 @@ class Attendance(models.Model):
         app_label = 'api'
         unique_together = ('user', 'date')
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['-date'], name='api_attendance_date_idx'),
+            # active_users: checked in today and not checked out yet
+            models.Index(
+                fields=['date'], name='api_attendance_open_idx',
+                condition=models.Q(time_in__isnull=False, time_out__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.date} ({self.status})"
@@ -71,6 +83,9 @@ class Task(models.Model):
 
     class Meta:
         app_label = 'api'
+        indexes = [
+            models.Index(fields=['assigned_to', 'status'], name='api_task_assignee_status_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -91,6 +106,8 @@ class Lead(models.Model):
     source = models.CharField(max_length=100, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='leads')
+    # end of the lease of a lead claimed from the queue; cleared once it leaves 'new'
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
     external_id = models.CharField(max_length=200, blank=True, null=True, unique=True)
     form_id = models.CharField(max_length=200, blank=True, null=True)
     raw_data = models.JSONField(blank=True, null=True)
@@ -100,6 +117,27 @@ class Lead(models.Model):
     class Meta:
         app_label = 'api'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='api_lead_created_idx'),
+            models.Index(fields=['assigned_to', '-created_at'], name='api_lead_assignee_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='api_lead_status_created_idx'),
+            # import dedupe: email__iexact compares UPPER(email)
+            models.Index(Upper('email'), name='api_lead_email_upper_idx'),
+            models.Index(fields=['phone'], name='api_lead_phone_idx'),
+            # the claim queue (unassigned new leads), overall and per source, and the leases to expire
+            models.Index(
+                fields=['created_at', 'id'], name='api_lead_queue_idx',
+                condition=models.Q(status='new', assigned_to__isnull=True),
+            ),
+            models.Index(
+                fields=['source', 'created_at', 'id'], name='api_lead_queue_source_idx',
+                condition=models.Q(status='new', assigned_to__isnull=True),
+            ),
+            models.Index(
+                fields=['claim_expires_at'], name='api_lead_claim_lease_idx',
+                condition=models.Q(claim_expires_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"Lead {self.id} - {self.email or self.phone or self.name}"
@@ -116,15 +154,37 @@ class AccountOpening(models.Model):
     class Meta:
         app_label = 'api'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='api_accountopening_created_idx'),
+        ]
 
     def __str__(self):
         return f"AccountOpening {self.id} for Lead {self.lead_id} - {self.deposit_amount}"
 
 
+class StoredFile(models.Model):
+    """Content-addressed upload shared by every PaymentProof with the same bytes."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    thumbnail = models.FileField(max_length=255, blank=True, null=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'api'
+
+    def __str__(self):
+        return f"StoredFile {self.sha256[:12]} ({self.ref_count} refs)"
+
+
 class PaymentProof(models.Model):
     lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='payment_proofs')
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploaded_payment_proofs')
     file = models.FileField(upload_to='indicator_proofs/')
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.PROTECT, null=True, blank=True, related_name='payment_proofs')
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -148,6 +208,105 @@ class FollowUp(models.Model):
     class Meta:
         app_label = 'api'
         ordering = ['-scheduled_date', '-created_at']
+        indexes = [
+            models.Index(fields=['-scheduled_date', '-created_at'], name='api_followup_scheduled_idx'),
+        ]
+
+    def __str__(self):
+        return f"FollowUp {self.id} for Lead {self.lead_id} on {self.scheduled_date}"
+
+
+class DailySalesRollup(models.Model):
+    """Funnel counters per day, sales user and lead source (see api.rollups).
+
+    Leads count towards the day they were created and their assignee, under
+    their current status; account openings and follow-ups towards the day they
+    were created and the user who created them.
+    """
+    day = models.DateField()
+    sales_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    source = models.CharField(max_length=100, blank=True, default='')
+    leads_new = models.IntegerField(default=0)
+    leads_contacted = models.IntegerField(default=0)
+    leads_not_interested = models.IntegerField(default=0)
+    leads_converted = models.IntegerField(default=0)
+    account_openings = models.IntegerField(default=0)
+    deposits = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    followups = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = 'api'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'sales_user', 'source'], name='api_rollup_day_user_source_uniq'),
+            # NULLs differ in the constraint above; without this, concurrent first
+            # writes could each create the unassigned row, and updates matching
+            # several rows lock them in no fixed order and deadlock
+            models.UniqueConstraint(
+                fields=['day', 'source'], condition=models.Q(sales_user__isnull=True),
+                name='api_rollup_day_unassigned_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['sales_user', 'day'], name='api_rollup_user_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rollup {self.day} user={self.sales_user_id} source={self.source!r}"
+
+
+class LeadStatusEvent(models.Model):
+    """Append-only history of lead statuses (see api.status_events).
+
+    Each row is a lead entering ``to_status`` at ``at``; ``from_status`` is
+    empty for the status a lead was created with. ``sales_user`` and ``source``
+    are the lead's at that moment, so stays are credited to the rep who owned
+    the lead then.
+    """
+    # (lead, at) below covers lookups by lead
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='status_events', db_index=False)
+    from_status = models.CharField(max_length=20, blank=True, default='')
+    to_status = models.CharField(max_length=20, choices=Lead.STATUS_CHOICES)
+    at = models.DateTimeField(default=timezone.now)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    sales_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False)
+    source = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        app_label = 'api'
+        indexes = [
+            models.Index(fields=['lead', 'at'], name='api_statusevent_lead_at_idx'),
+            models.Index(fields=['to_status', 'at'], name='api_statusevent_status_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Lead {self.lead_id}: {self.from_status or '-'} -> {self.to_status} at {self.at}"
+
+
+class MetaLeadNotification(models.Model):
+    """A leadgen notification from the Meta webhook, waiting for its lead to be fetched (see api.meta_webhook).
+
+    Redeliveries of a lead are dropped by the unique ``leadgen_id``. A
+    consumer leases pending rows by moving ``available_at`` past the fetch;
+    failed fetches are retried from then on until ``processed_at`` is set.
+    """
+    leadgen_id = models.CharField(max_length=200, unique=True)
+    form_id = models.CharField(max_length=200, blank=True, default='')
+    page_id = models.CharField(max_length=200, blank=True, default='')
+    received_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        app_label = 'api'
+        indexes = [
+            # the pending rows, in the order consumers lease them
+            models.Index(
+                fields=['available_at', 'id'], name='api_metanotif_pending_idx',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
 
     def __str__(self):
-        return f"FollowUp {self.id} for Lead {self.lead_id} on {self.scheduled_date}"
\ No newline at end of file
+        return f"MetaLeadNotification {self.leadgen_id} ({'processed' if self.processed_at else 'pending'})"
@@ -0,0 +1,72 @@
+from django.core.paginator import InvalidPage, Paginator
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+
+
+class CountingPaginator(Paginator):
+    """``Paginator`` that counts ``count_queryset`` rather than the rows it pages.
+
+    The rows of the sparse-fields path are a ``values_list()`` that joins the
+    tables of its related columns; counting the plain queryset skips the joins.
+    """
+
+    def __init__(self, object_list, per_page, *args, count_queryset=None, **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.count_queryset = count_queryset
+
+    @cached_property
+    def count(self):
+        if self.count_queryset is not None:
+            return self.count_queryset.count()
+        return super().count
+
+
+class OptionalPageNumberPagination(PageNumberPagination):
+    """Page-number pagination that only applies when the client asks for it.
+
+    Existing callers that expect a bare list keep getting one; passing
+    ``page`` or ``page_size`` switches to the ``{count, next, previous,
+    results}`` envelope.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def wants_page(self, request):
+        params = request.query_params
+        return self.page_query_param in params or self.page_size_query_param in params
+
+    count_queryset = None
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountingPaginator(queryset, page_size, count_queryset=self.count_queryset)
+
+    def paginate_queryset(self, queryset, request, view=None, count_queryset=None):
+        """DRF's ``paginate_queryset()``; the total is ``count_queryset.count()`` if given."""
+        if not self.wants_page(request):
+            return None
+        self.count_queryset = count_queryset
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None, count_queryset=None):
+        """``paginate_queryset()`` for async views, counting and fetching with the async ORM."""
+        if not self.wants_page(request):
+            return None
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await (queryset if count_queryset is None else count_queryset).acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.request = request
+        return [item async for item in self.page.object_list]
+
+
+class AlwaysPageNumberPagination(OptionalPageNumberPagination):
+    """``OptionalPageNumberPagination`` without the bare-list fallback, for lists that never had one."""
+
+    def wants_page(self, request):
+        return True
@@ -0,0 +1,27 @@
+import io
+
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """``JSONParser`` that decodes UTF-8 bodies with orjson.
+
+    Bodies orjson rejects are re-parsed by the stdlib parser, so invalid
+    JSON produces the same ``ParseError`` messages as before. Integers wider
+    than 64 bits decode as floats, unlike the stdlib parser.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
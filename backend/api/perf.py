@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings collected for one sampled request (see ``PerformanceMiddleware``)."""
+    __slots__ = ('start', 'db_time', 'queries', 'timings')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = []
+        self.timings = {}
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.db_time += duration
+            self.queries.append((sql, duration))
+
+    def add(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+    def duplicate_queries(self):
+        """Return ``{sql: count}`` for statements that ran more than once."""
+        counts = {}
+        for sql, _duration in self.queries:
+            counts[sql] = counts.get(sql, 0) + 1
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper for every connection; only times queries of sampled requests.
+
+    It is installed on the connections themselves rather than per request, because
+    under ASGI the queries run in a worker thread with its own connection.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def current():
+    """Return the ``RequestMetrics`` of the current request, or None if it isn't sampled."""
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request's ``name`` timing.
+
+    A single ContextVar lookup when the request isn't sampled.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start)
@@ -0,0 +1,212 @@
+"""Push events to the dashboards over ``GET /api/events/`` (Server-Sent Events).
+
+``publish()`` queues an event for a user once the writer's transaction
+commits; ``api.signals`` publishes lead assignments and task changes, and
+follow-ups that are due (``manage.py push_due_followups`` announces each
+day's). Events carry only an event name and row ids, and clients refetch
+what they show. Inside ``batch()`` the events of a block are merged per user
+and event, so an import sends one message per rep rather than one per lead.
+
+Every ASGI event loop keeps a ``Hub`` of its open streams by user. With the
+``postgres`` backend, messages go out with ``NOTIFY`` and each hub holds one
+``LISTEN`` connection, so a stream receives the events of writes made by any
+process; with ``local`` they are handed straight to the hubs of the writing
+process. A stream that falls ``PUSH_QUEUE_SIZE`` events behind, or whose hub
+lost its listener for a while, gets a ``resync`` event instead of what it
+missed.
+"""
+import asyncio
+import json
+import logging
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+try:
+    import psycopg
+except ImportError:  # pragma: no cover - psycopg is in requirements.txt
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'api_push'
+# NOTIFY payloads must stay below 8000 bytes
+IDS_PER_MESSAGE = 500
+
+READY = b'retry: 3000\nevent: ready\ndata: {}\n\n'
+RESYNC = b'event: resync\ndata: {}\n\n'
+PING = b': ping\n\n'
+
+_pending = ContextVar('push_events', default=None)
+# one hub per event loop; asyncio primitives can't be shared between loops
+_hubs = weakref.WeakKeyDictionary()
+
+
+def backend():
+    return settings.PUSH_BACKEND or ('postgres' if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql' else 'local')
+
+
+def publish(user_id, event, ids, using=DEFAULT_DB_ALIAS):
+    """Send ``event`` about the rows ``ids`` to ``user_id``'s streams when the current transaction commits."""
+    if user_id is None or not ids:
+        return
+    pending = _pending.get()
+    if pending is None:
+        _send_on_commit({(user_id, event): list(ids)}, using)
+        return
+    pending.setdefault(using, {}).setdefault((user_id, event), []).extend(ids)
+
+
+@contextmanager
+def batch():
+    """Merge the events published inside the block per user and event, and send them at its end."""
+    if _pending.get() is not None:
+        # already batching further up
+        yield
+        return
+    pending = {}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        for using, events in pending.items():
+            if not connections[using].needs_rollback:
+                _send_on_commit(events, using)
+
+
+def _send_on_commit(events, using):
+    messages = [
+        json.dumps({'user': user_id, 'event': event, 'ids': ids[start:start + IDS_PER_MESSAGE]}, separators=(',', ':'))
+        for (user_id, event), ids in events.items()
+        for start in range(0, len(ids), IDS_PER_MESSAGE)
+    ]
+    # after the commit rather than a NOTIFY inside the writer's transaction,
+    # which would hold PostgreSQL's global notify lock through its commit;
+    # robust, since a lost event must not fail a write that went through
+    transaction.on_commit(lambda: _send(messages, using), using=using, robust=True)
+
+
+def _send(messages, using):
+    if backend() == 'postgres':
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, message) FROM unnest(%s::text[]) AS message', [CHANNEL, messages])
+        return
+    for hub in list(_hubs.values()):
+        hub.loop.call_soon_threadsafe(hub.dispatch, messages)
+
+
+def frame(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Stream:
+    """The frames waiting to be sent to one client."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue(settings.PUSH_QUEUE_SIZE)
+
+    def put(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # the client reads slower than its events arrive: drop the backlog and have it refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class Hub:
+    """The open streams of one event loop by user, fed by ``publish()`` in any process."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.streams = {}
+        self.listening = asyncio.Event()
+        self.listener = None
+        if backend() == 'local':
+            self.listening.set()
+
+    @classmethod
+    def current(cls):
+        loop = asyncio.get_running_loop()
+        hub = _hubs.get(loop)
+        if hub is None:
+            hub = _hubs[loop] = cls(loop)
+        return hub
+
+    def subscribe(self, user_id):
+        if self.listener is None and not self.listening.is_set():
+            self.listener = self.loop.create_task(self.listen())
+        stream = Stream()
+        self.streams.setdefault(user_id, set()).add(stream)
+        return stream
+
+    def unsubscribe(self, user_id, stream):
+        streams = self.streams.get(user_id)
+        if streams is not None:
+            streams.discard(stream)
+            if not streams:
+                del self.streams[user_id]
+
+    def dispatch(self, messages):
+        for message in messages:
+            message = json.loads(message)
+            streams = self.streams.get(message['user'])
+            if streams:
+                data = frame(message['event'], {'ids': message['ids']})
+                for stream in streams:
+                    stream.put(data)
+
+    def resync(self):
+        for streams in self.streams.values():
+            for stream in streams:
+                stream.put(RESYNC)
+
+    async def listen(self):
+        """``LISTEN`` on the default database, reconnecting (and resyncing every stream) when the connection drops."""
+        params = {
+            name: value for name, value in connections[DEFAULT_DB_ALIAS].get_connection_params().items()
+            if name not in ('cursor_factory', 'context')
+        }
+        delay = 1
+        lost = False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**params, autocommit=True) as connection:
+                    await connection.execute(f'LISTEN {CHANNEL}')
+                    self.listening.set()
+                    if lost:
+                        self.resync()
+                    delay = 1
+                    async for notify in connection.notifies():
+                        self.dispatch([notify.payload])
+            except psycopg.Error as e:
+                logger.warning('Push listener lost its connection, retrying in %ss: %s', delay, e)
+            except Exception:
+                logger.exception('Push listener failed, restarting in %ss', delay)
+            self.listening.clear()
+            lost = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+async def stream(user_id):
+    """The ``text/event-stream`` body of ``user_id``'s events, until the client goes away."""
+    hub = Hub.current()
+    subscription = hub.subscribe(user_id)
+    try:
+        # ready once events published from now on will arrive
+        await hub.listening.wait()
+        yield READY
+        while True:
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), settings.PUSH_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # keeps proxies from timing out the connection and notices dead clients
+                yield PING
+    finally:
+        hub.unsubscribe(user_id, subscription)
@@ -0,0 +1,47 @@
+from rest_framework.renderers import JSONRenderer
+
+from .perf import timer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Drop-in ``JSONRenderer`` that encodes with orjson.
+
+    Output matches DRF's renderer byte for byte: dates and times go through
+    DRF's ``JSONEncoder.default`` (``Z`` suffix for UTC, ``Decimal`` as float
+    just like the stdlib path), U+2028/U+2029 are escaped and separators are
+    compact. The known differences are the exponent form of very small or
+    very large floats (``1e-7`` vs ``1e-07``) and non-finite floats: orjson
+    writes NaN and Infinity as ``null`` where DRF raises ``ValueError`` (a
+    500). Checking every value for them would cost more than the encoding, so
+    views that can compute one should map it to None themselves. Indented
+    output, non-default ``COMPACT_JSON``/``STRICT_JSON`` settings and anything
+    orjson refuses (e.g. integers wider than 64 bits) fall back to the stdlib
+    renderer.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or not self.compact or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
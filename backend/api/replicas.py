@@ -0,0 +1,237 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import DB_REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+# Set on a response after a request wrote, so that the client's next reads see
+# its own writes on the primary while the replicas catch up.
+PIN_COOKIE = 'db_primary'
+
+# Zero when the replica has replayed everything it received (after a restart
+# the receive position can trail the replay one), otherwise the age of the last
+# replayed transaction, NULL if it hasn't replayed one since it started. A
+# database that isn't in recovery (a copy used for local testing) reports zero.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class RoutingState:
+    """Where the current request reads from, and whether it wrote."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.alias = None
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+# alias -> (checked_at, usable), per process
+_replica_health = {}
+
+
+def replica_aliases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def measure_lag(alias):
+    """Replication lag of ``alias`` in seconds (infinite if unknown); None if it can't be reached."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.warning('Replica %s is unavailable, reading from the primary', alias, exc_info=True)
+        return None
+    # behind, but by an unknown amount
+    return float('inf') if lag is None else float(lag)
+
+
+def _health_is_stale(alias):
+    checked_at, _usable = _replica_health.get(alias, (None, False))
+    return checked_at is None or time.monotonic() - checked_at >= settings.DB_REPLICA_CHECK_INTERVAL
+
+
+def check_replicas(force=False):
+    """Re-measure the lag of replicas whose last check is older than ``DB_REPLICA_CHECK_INTERVAL``."""
+    for alias in replica_aliases():
+        if not force and not _health_is_stale(alias):
+            continue
+        lag = measure_lag(alias)
+        usable = lag is not None and lag <= settings.DB_REPLICA_MAX_LAG
+        if lag is not None:
+            DB_REPLICA_LAG.labels(alias=alias).set(lag)
+            if not usable:
+                logger.warning('Replica %s is %.1fs behind, reading from the primary', alias, lag)
+        _replica_health[alias] = (time.monotonic(), usable)
+
+
+def _choose_replica():
+    usable = [alias for alias in replica_aliases() if _replica_health.get(alias, (None, False))[1]]
+    return random.choice(usable) if usable else None
+
+
+def _routable():
+    state = _state.get()
+    return state if state is not None and not state.pinned and replica_aliases() else None
+
+
+def use_replica():
+    """Send the rest of the current request's reads to a replica that isn't lagging.
+
+    A no-op outside ``ReplicaMiddleware``, for clients holding the pin cookie
+    and when every replica is behind or down.
+    """
+    state = _routable()
+    if state is not None:
+        check_replicas()
+        state.alias = _choose_replica()
+
+
+async def ause_replica():
+    """``use_replica()`` for async views; only the lag check leaves the event loop."""
+    state = _routable()
+    if state is not None:
+        if any(_health_is_stale(alias) for alias in replica_aliases()):
+            await sync_to_async(check_replicas)()
+        state.alias = _choose_replica()
+
+
+@contextmanager
+def sub_request():
+    """Routing state of its own for a request dispatched inside the current one (see api.batch).
+
+    It starts pinned if the outer request is or has already written, and its
+    writes pin the outer request's client.
+    """
+    outer = _state.get()
+    if outer is None:
+        yield
+        return
+    state = RoutingState(pinned=outer.pinned or outer.wrote)
+    token = _state.set(state)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+        if state.wrote:
+            outer.wrote = True
+
+
+def read_alias():
+    """The database the current request reads from.
+
+    For querysets evaluated after the response has left the middleware, such
+    as streamed exports.
+    """
+    state = _state.get()
+    return state.alias if state is not None and state.alias else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Reads go to the replica picked by ``use_replica()``; everything else to the primary.
+
+    Listed in ``DATABASE_ROUTERS`` when ``DB_REPLICAS`` is configured. Replicas
+    get their schema through replication, so migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+class ReplicaReadsMixin:
+    """Let a view's safe requests read from a replica.
+
+    ``replica_actions`` limits this to some viewset actions (``{'list'}``);
+    None means every GET/HEAD. Authentication and permission checks still
+    read from the primary.
+    """
+    replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and (
+            self.replica_actions is None or getattr(self, 'action', None) in self.replica_actions
+        ):
+            use_replica()
+
+
+class ReplicaMiddleware:
+    """Per-request routing state for ``ReplicaRouter``.
+
+    Clients that send the pin cookie read from the primary. Responses to
+    requests that wrote set it for ``DB_REPLICA_PIN_SECONDS``, which keeps a
+    user's follow-up reads consistent with their own writes; API clients
+    without a cookie jar always read replica-safe endpoints from a replica.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = settings.DB_REPLICA_PIN_SECONDS
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    def pin(self, request, response, state):
+        if state.wrote and self.pin_seconds > 0:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=self.pin_seconds,
+                secure=request.is_secure(), httponly=True, samesite='Lax',
+            )
+        return response
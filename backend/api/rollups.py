@@ -0,0 +1,209 @@
+"""Incremental upkeep and rebuilds of ``DailySalesRollup``.
+
+Every save or delete of a lead, account opening or follow-up turns the row
+into its contribution to the rollups (``deltas()``); ``api.signals`` applies
+the difference between the stored and the new contribution right after the
+write, inside the writer's transaction if there is one. Bulk
+``QuerySet.update()``/``delete()``, raw SQL and ``seed_scale`` bypass the
+signals; ``manage.py rebuild_rollups`` recomputes any range of days from the
+source tables.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .days import local_day, on_days
+from .models import AccountOpening, DailySalesRollup, FollowUp, Lead
+from .serializers import money
+
+STATUS_FIELDS = {value: f'leads_{value}' for value, _label in Lead.STATUS_CHOICES}
+COUNTER_FIELDS = [*STATUS_FIELDS.values(), 'account_openings', 'deposits', 'followups']
+
+
+def _lead_source(instance, lead_source):
+    return (instance.lead.source if lead_source is None else lead_source) or ''
+
+
+def deltas(instance, lead_source=None):
+    """``{(day, sales_user_id, source): {field: amount}}`` that ``instance`` adds to the rollups.
+
+    ``lead_source`` overrides the source of an opening's or follow-up's lead.
+    """
+    if isinstance(instance, Lead):
+        field = STATUS_FIELDS.get(instance.status)
+        if field is None:
+            return {}
+        day = local_day(instance.created_at, Lead._meta.get_field('created_at'))
+        return {(day, instance.assigned_to_id, instance.source or ''): {field: 1}}
+    day = local_day(instance.created_at, type(instance)._meta.get_field('created_at'))
+    key = (day, instance.created_by_id, _lead_source(instance, lead_source))
+    if isinstance(instance, AccountOpening):
+        return {key: {'account_openings': 1, 'deposits': Decimal(instance.deposit_amount or 0)}}
+    return {key: {'followups': 1}}
+
+
+def difference(before, after):
+    """``after - before``, leaving out keys and fields that cancel out."""
+    net = defaultdict(dict)
+    for sign, contributions in ((-1, before), (1, after)):
+        for key, fields in contributions.items():
+            for name, amount in fields.items():
+                net[key][name] = net[key].get(name, 0) + sign * amount
+    return {key: changed for key, fields in net.items() if (changed := {n: a for n, a in fields.items() if a})}
+
+
+def _apply_row(using, key, fields):
+    day, sales_user_id, source = key
+    rows = DailySalesRollup.objects.using(using).filter(day=day, sales_user_id=sales_user_id, source=source)
+    updates = {name: F(name) + amount for name, amount in fields.items()}
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic(using=using):
+            DailySalesRollup.objects.using(using).create(day=day, sales_user_id=sales_user_id, source=source, **fields)
+    except IntegrityError:
+        # another transaction created the row first
+        rows.update(**updates)
+
+
+def _row_order(key):
+    day, sales_user_id, source = key
+    return day, sales_user_id is not None, sales_user_id or 0, source
+
+
+def apply(changes, using=DEFAULT_DB_ALIAS):
+    """Add ``{key: {field: amount}}`` to the rollup rows, creating missing ones."""
+    # in a fixed order, so transactions applying several rows can't deadlock
+    for key in sorted(changes, key=_row_order):
+        _apply_row(using, key, changes[key])
+
+
+def fold_into_unassigned(user_id, using=DEFAULT_DB_ALIAS):
+    """Move a user's rows onto the unassigned ones of their day and source, before the user is deleted.
+
+    Deleting the user would set ``sales_user`` to NULL, turning them into
+    second unassigned rows that the unique constraint refuses.
+    """
+    rows = DailySalesRollup.objects.using(using).filter(sales_user_id=user_id)
+    changes = {}
+    for row in rows:
+        counters = {name: getattr(row, name) for name in COUNTER_FIELDS if getattr(row, name)}
+        if counters:
+            changes[row.day, None, row.source] = counters
+    apply(changes, using)
+    rows.delete()
+
+
+def move_lead_children(lead, old_source, using=DEFAULT_DB_ALIAS):
+    """Re-file a lead's openings and follow-ups after its source changed."""
+    changes = defaultdict(dict)
+    for model in (AccountOpening, FollowUp):
+        for child in model.objects.using(using).filter(lead=lead).order_by():
+            # '' rather than None, which would mean the child's own (already new) lead source
+            moved = difference(deltas(child, lead_source=old_source or ''), deltas(child, lead_source=lead.source or ''))
+            for key, fields in moved.items():
+                for name, amount in fields.items():
+                    changes[key][name] = changes[key].get(name, 0) + amount
+    apply(changes, using)
+
+
+def compute(start=None, end=None, using=DEFAULT_DB_ALIAS):
+    """Rollup counters for days ``start``..``end`` (inclusive, None = open), from the source tables."""
+    rows = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    day = TruncDate('created_at', tzinfo=timezone.get_default_timezone())
+
+    leads = on_days(Lead.objects.using(using), 'created_at', start, end)
+    for row in leads.annotate(day=day).order_by().values('day', 'assigned_to', 'source', 'status').annotate(n=Count('id')):
+        field = STATUS_FIELDS.get(row['status'])
+        if field is not None:
+            rows[row['day'], row['assigned_to'], row['source'] or ''][field] += row['n']
+
+    openings = on_days(AccountOpening.objects.using(using), 'created_at', start, end)
+    for row in openings.annotate(day=day).order_by().values('day', 'created_by', 'lead__source').annotate(
+        n=Count('id'), total=Sum('deposit_amount'),
+    ):
+        counters = rows[row['day'], row['created_by'], row['lead__source'] or '']
+        counters['account_openings'] += row['n']
+        counters['deposits'] += row['total'] or 0
+
+    followups = on_days(FollowUp.objects.using(using), 'created_at', start, end)
+    for row in followups.annotate(day=day).order_by().values('day', 'created_by', 'lead__source').annotate(n=Count('id')):
+        rows[row['day'], row['created_by'], row['lead__source'] or '']['followups'] += row['n']
+    return rows
+
+
+def rebuild(start=None, end=None, using=DEFAULT_DB_ALIAS, batch_size=5000):
+    """Replace the rollup rows of days ``start``..``end`` (None = open) and return how many were written.
+
+    On PostgreSQL the table is locked against writes (not reads) first, so
+    rows saved meanwhile are either counted here or applied after the rebuild
+    commits, never both.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(DailySalesRollup._meta.db_table)
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        rows = compute(start, end, using)
+        existing = DailySalesRollup.objects.using(using)
+        if start is not None:
+            existing = existing.filter(day__gte=start)
+        if end is not None:
+            existing = existing.filter(day__lte=end)
+        existing.delete()
+        DailySalesRollup.objects.using(using).bulk_create(
+            (DailySalesRollup(day=day, sales_user_id=sales_user_id, source=source, **counters)
+             for (day, sales_user_id, source), counters in rows.items()),
+            batch_size=batch_size,
+        )
+        if connection.vendor == 'postgresql':
+            # fresh statistics, or the planner keeps estimating an empty table
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {table}')
+    return len(rows)
+
+
+# group_by keys of summarize(); a period is at most one of day, week and month
+PERIODS = {'day': F('day'), 'week': TruncWeek('day'), 'month': TruncMonth('day')}
+GROUPS = {**PERIODS, 'sales_user': F('sales_user'), 'source': F('source')}
+
+
+def _funnel(row):
+    counters = {field: row[f'sum_{field}'] for field in COUNTER_FIELDS}
+    leads = sum(counters[field] for field in STATUS_FIELDS.values())
+    return {
+        'leads': leads,
+        **{status: counters[field] for status, field in STATUS_FIELDS.items()},
+        'conversion_rate': round(counters['leads_converted'] / leads, 4) if leads else None,
+        'account_openings': counters['account_openings'],
+        'deposits': money(counters['deposits']),
+        'followups': counters['followups'],
+    }
+
+
+def summarize(queryset, group_by=()):
+    """Funnel rows of a ``DailySalesRollup`` queryset summed per ``group_by`` (keys of ``GROUPS``), and their totals."""
+    sums = {f'sum_{field}': Sum(field, default=0) for field in COUNTER_FIELDS}
+    queryset = queryset.order_by()
+    if not group_by:
+        return [], _funnel(queryset.aggregate(**sums))
+    grouped = queryset.annotate(**{f'g_{key}': GROUPS[key] for key in group_by}) \
+        .values(*(f'g_{key}' for key in group_by)).annotate(**sums).order_by(*(f'g_{key}' for key in group_by))
+    rows = []
+    totals = dict.fromkeys(sums, 0)
+    for row in grouped:
+        for name in totals:
+            totals[name] += row[name]
+        group = {key: row[f'g_{key}'] for key in group_by}
+        for key in PERIODS.keys() & group.keys():
+            # TruncWeek/TruncMonth of a date column come back as dates or datetimes depending on the backend
+            value = group[key]
+            group[key] = (value.date() if isinstance(value, datetime) else value).isoformat()
+        rows.append({**group, **_funnel(row)})
+    return rows, _funnel(totals)
@@ -1,3 +1,5 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User, Attendance
@@ -6,6 +8,25 @@ from .models import Lead
 from .models import AccountOpening
 from .models import PaymentProof
 from .models import FollowUp
+from .models import LeadStatusEvent
+
+
+def display_name(first_name, last_name, username):
+    full = f"{first_name or ''} {last_name or ''}".strip()
+    return full if full else username
+
+
+def money(value):
+    """A Decimal amount as a string with two decimals, rounding half up."""
+    return str(Decimal(value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+
+LEAD_INFO_KEYS = ('id', 'name', 'email', 'phone', 'city', 'status')
+LEAD_INFO_PATHS = tuple(f'lead__{key}' for key in LEAD_INFO_KEYS)
+
+
+def lead_info_from_row(*values):
+    return dict(zip(LEAD_INFO_KEYS, values))
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -15,9 +36,13 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'full_name', 'user_type', 'is_verified', 'is_staff', 'is_superuser')
 
+    # column sources for api.sparse_fields.RowSerializer
+    row_fields = {
+        'full_name': (('first_name', 'last_name', 'username'), display_name),
+    }
+
     def get_full_name(self, obj):
-        full = f"{getattr(obj, 'first_name', '') or ''} {getattr(obj, 'last_name', '') or ''}".strip()
-        return full if full else obj.username
+        return display_name(getattr(obj, 'first_name', ''), getattr(obj, 'last_name', ''), obj.username)
 
 
 class AttendanceSerializer(serializers.ModelSerializer):
@@ -37,12 +62,18 @@ class TaskSerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'description', 'status', 'priority', 'assigned_to', 'assigned_to_username', 'assigned_to_name', 'deadline', 'completion_notes', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    row_fields = {
+        'assigned_to_name': (
+            ('assigned_to__first_name', 'assigned_to__last_name', 'assigned_to__username'),
+            lambda first, last, username: None if username is None else display_name(first, last, username),
+        ),
+    }
+
     def get_assigned_to_name(self, obj):
         user = obj.assigned_to
         if not user:
             return None
-        full = f"{getattr(user, 'first_name', '') or ''} {getattr(user, 'last_name', '') or ''}".strip()
-        return full if full else getattr(user, 'username', None)
+        return display_name(getattr(user, 'first_name', ''), getattr(user, 'last_name', ''), getattr(user, 'username', None))
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -93,6 +124,10 @@ class AccountOpeningSerializer(serializers.ModelSerializer):
         fields = ('id', 'lead', 'lead_info', 'created_by', 'created_by_username', 'deposit_amount', 'notes', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    row_fields = {
+        'lead_info': (LEAD_INFO_PATHS, lead_info_from_row),
+    }
+
     def get_lead_info(self, obj):
         lead = obj.lead
         return {
@@ -107,12 +142,22 @@ class AccountOpeningSerializer(serializers.ModelSerializer):
 
 class PaymentProofSerializer(serializers.ModelSerializer):
     uploaded_by_username = serializers.CharField(source='uploaded_by.username', read_only=True)
+    thumbnail = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = PaymentProof
-        fields = ('id', 'lead', 'uploaded_by', 'uploaded_by_username', 'file', 'notes', 'created_at', 'updated_at')
+        fields = ('id', 'lead', 'uploaded_by', 'uploaded_by_username', 'file', 'thumbnail', 'notes', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    def get_thumbnail(self, obj):
+        # small variant for list views; null until the upload worker has run
+        stored = obj.stored_file
+        if stored is None or not stored.thumbnail:
+            return None
+        url = stored.thumbnail.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
 
 class FollowUpSerializer(serializers.ModelSerializer):
     lead_info = serializers.SerializerMethodField(read_only=True)
@@ -123,6 +168,10 @@ class FollowUpSerializer(serializers.ModelSerializer):
         fields = ('id', 'lead', 'lead_info', 'scheduled_date', 'notes', 'created_by', 'created_by_username', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    row_fields = {
+        'lead_info': (LEAD_INFO_PATHS, lead_info_from_row),
+    }
+
     def get_lead_info(self, obj):
         lead = obj.lead
         return {
@@ -133,3 +182,41 @@ class FollowUpSerializer(serializers.ModelSerializer):
             'city': lead.city,
             'status': lead.status,
         }
+
+
+class LeadStatusEventSerializer(serializers.ModelSerializer):
+    changed_by_username = serializers.CharField(source='changed_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = LeadStatusEvent
+        fields = ('from_status', 'to_status', 'at', 'changed_by', 'changed_by_username')
+
+
+class LeadFollowUpSerializer(FollowUpSerializer):
+    # nested under their lead, which is already in the response
+    lead_info = None
+
+    class Meta(FollowUpSerializer.Meta):
+        fields = tuple(name for name in FollowUpSerializer.Meta.fields if name != 'lead_info')
+
+
+class LeadAccountOpeningSerializer(AccountOpeningSerializer):
+    lead_info = None
+
+    class Meta(AccountOpeningSerializer.Meta):
+        fields = tuple(name for name in AccountOpeningSerializer.Meta.fields if name != 'lead_info')
+
+
+class LeadDetailSerializer(LeadSerializer):
+    """A lead with its follow-ups, account openings, payment proofs and status history.
+
+    Expects the relations prefetched (see ``LeadDetailView``); the nested
+    serializers only follow ``select_related`` foreign keys.
+    """
+    followups = LeadFollowUpSerializer(many=True, read_only=True)
+    account_openings = LeadAccountOpeningSerializer(many=True, read_only=True)
+    payment_proofs = PaymentProofSerializer(many=True, read_only=True)
+    status_history = LeadStatusEventSerializer(source='status_events', many=True, read_only=True)
+
+    class Meta(LeadSerializer.Meta):
+        fields = LeadSerializer.Meta.fields + ('followups', 'account_openings', 'payment_proofs', 'status_history')
@@ -0,0 +1,158 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import analytics, push, rollups, status_events
+from .authentication import user_cache
+from .models import AccountOpening, Attendance, FollowUp, Lead, PaymentProof, Task, User
+from .uploads import release_stored_file
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def fold_user_rollups(sender, instance, using=None, **kwargs):
+    rollups.fold_into_unassigned(instance.pk, using)
+
+
+@receiver(post_delete, sender=PaymentProof)
+def release_payment_proof_file(sender, instance, **kwargs):
+    if instance.stored_file_id is not None:
+        release_stored_file(instance.stored_file_id)
+
+
+@receiver(pre_save, sender=Lead)
+@receiver(pre_save, sender=AccountOpening)
+@receiver(pre_save, sender=FollowUp)
+def remember_stored_row(sender, instance, raw=False, using=None, **kwargs):
+    # what the stored row contributes to the rollups, to be swapped for the new
+    # one in post_save, and a lead's stored status for its status history
+    instance._rollup_before = {}
+    instance._rollup_source = None
+    instance._status_before = None
+    # the lead's previous rep and the follow-up's previous day, for the push events
+    instance._assignee_before = None
+    instance._scheduled_before = None
+    if raw or instance._state.adding:
+        return
+    stored = sender._default_manager.using(using).filter(pk=instance.pk)
+    if sender is not Lead:
+        stored = stored.select_related('lead')
+    stored = stored.first()
+    if stored is not None:
+        instance._rollup_before = rollups.deltas(stored)
+        if sender is Lead:
+            instance._rollup_source = stored.source
+            instance._status_before = stored.status
+            instance._assignee_before = stored.assigned_to_id
+        elif sender is FollowUp:
+            instance._scheduled_before = stored.scheduled_date
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=AccountOpening)
+@receiver(post_save, sender=FollowUp)
+def update_rollups(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_rollup_before', {})
+    rollups.apply(rollups.difference(before, rollups.deltas(instance)), using)
+    old_source = getattr(instance, '_rollup_source', None)
+    if sender is Lead and before and (old_source or '') != (instance.source or ''):
+        rollups.move_lead_children(instance, old_source, using)
+
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=AccountOpening)
+@receiver(post_delete, sender=FollowUp)
+def remove_from_rollups(sender, instance, using=None, **kwargs):
+    rollups.apply(rollups.difference(rollups.deltas(instance), {}), using)
+
+
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=Attendance)
+def remember_stored_values(sender, instance, raw=False, using=None, **kwargs):
+    # one query for the stored values the post_save receivers compare against:
+    # the analytics bucket (a task moves to the bucket of its new updated_at, an
+    # edited attendance record may change day) and a task's previous assignee
+    field = analytics.METRICS[analytics.MODEL_METRICS[sender]].field
+    instance._analytics_before = None
+    instance._assignee_before = None
+    if raw or instance._state.adding:
+        return
+    fields = [field, 'assigned_to'] if sender is Task else [field]
+    stored = sender._default_manager.using(using).filter(pk=instance.pk).values_list(*fields).first()
+    if stored is not None:
+        instance._analytics_before = stored[0]
+        if sender is Task:
+            instance._assignee_before = stored[1]
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=AccountOpening)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=AccountOpening)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Attendance)
+def invalidate_analytics(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    name = analytics.MODEL_METRICS[sender]
+    analytics.invalidate(name, getattr(instance, analytics.METRICS[name].field), getattr(instance, '_analytics_before', None))
+
+
+@receiver(post_save, sender=Lead)
+def record_status_change(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    changed_by = getattr(instance, 'status_changed_by', None)
+    if created:
+        status_events.record(instance, '', instance.status, at=instance.created_at, changed_by=changed_by, using=using)
+    elif instance._status_before is not None and instance._status_before != instance.status:
+        status_events.record(instance, instance._status_before, instance.status, changed_by=changed_by, using=using)
+
+
+@receiver(post_save, sender=Lead)
+def push_lead_assignment(sender, instance, created, raw=False, using=None, **kwargs):
+    before = getattr(instance, '_assignee_before', None)
+    if raw or instance.assigned_to_id == before:
+        return
+    push.publish(instance.assigned_to_id, 'lead.assigned', [instance.pk], using)
+    push.publish(before, 'lead.unassigned', [instance.pk], using)
+
+
+@receiver(post_save, sender=Task)
+def push_task_change(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_assignee_before', None)
+    if created:
+        push.publish(instance.assigned_to_id, 'task.created', [instance.pk], using)
+    elif instance.assigned_to_id == before:
+        push.publish(instance.assigned_to_id, 'task.updated', [instance.pk], using)
+    else:
+        push.publish(instance.assigned_to_id, 'task.assigned', [instance.pk], using)
+        push.publish(before, 'task.unassigned', [instance.pk], using)
+
+
+@receiver(post_delete, sender=Task)
+def push_task_deletion(sender, instance, using=None, **kwargs):
+    push.publish(instance.assigned_to_id, 'task.deleted', [instance.pk], using)
+
+
+@receiver(post_save, sender=FollowUp)
+def push_due_followup(sender, instance, created, raw=False, using=None, **kwargs):
+    # follow-ups saved for a day that has begun; push_due_followups announces the others on their day
+    if raw:
+        return
+    day = FollowUp._meta.get_field('scheduled_date').to_python(instance.scheduled_date)
+    if day > timezone.localdate() or day == getattr(instance, '_scheduled_before', None):
+        return
+    # the rep working the lead, else whoever scheduled it
+    push.publish(instance.lead.assigned_to_id or instance.created_by_id, 'followup.due', [instance.pk], using)
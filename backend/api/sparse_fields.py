@@ -0,0 +1,253 @@
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .pagination import OptionalPageNumberPagination
+from .perf import timer
+
+
+# Field types whose to_representation() returns database values unchanged.
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.JSONField,
+    serializers.ReadOnlyField,
+    PrimaryKeyRelatedField,
+)
+
+# Field types that need a model instance and cannot be fed from values_list().
+UNSUPPORTED_FIELDS = (
+    serializers.FileField,
+    serializers.BaseSerializer,
+    serializers.HyperlinkedRelatedField,
+    serializers.ManyRelatedField,
+)
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def _is_plain_iso_datetime(field):
+    # DRF's DateTimeField spends most of its time re-resolving the current
+    # timezone for every value; for the default output we can do it once per
+    # response and only call astimezone()/isoformat() per row.
+    return (
+        type(field) is serializers.DateTimeField
+        and getattr(field, 'timezone', None) is None
+        and str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601
+    )
+
+
+def _iso_datetime(tz):
+    def convert(value):
+        if tz is not None and timezone.is_aware(value):
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+ISO_DATETIME = object()
+
+
+class RowSerializer:
+    """Precompiled ``values_list()`` row -> dict conversion for a ModelSerializer.
+
+    Produces the same data as ``serializer_class(qs, many=True).data`` for
+    read-only list responses, without instantiating a serializer per row.
+    ``SerializerMethodField`` entries must be described on the serializer in
+    ``row_fields = {name: (paths, fn)}``; ``fn`` receives the values of
+    ``paths`` positionally. Raises ``UnsupportedField`` when a field cannot be
+    computed from column values.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        model = serializer_class.Meta.model
+        row_fields = getattr(serializer_class, 'row_fields', {})
+        self.paths = []
+        self.plan = []
+
+        for name, field in serializer_class().fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in row_fields:
+                    raise UnsupportedField(name)
+                paths, fn = row_fields[name]
+                self.plan.append((name, tuple(self._column(p) for p in paths), fn, None))
+                continue
+            if isinstance(field, UNSUPPORTED_FIELDS) or field.source == '*':
+                raise UnsupportedField(name)
+
+            if isinstance(field, PASSTHROUGH_FIELDS):
+                convert = None
+            elif _is_plain_iso_datetime(field):
+                convert = ISO_DATETIME
+            else:
+                convert = field.to_representation
+            attrs = field.source_attrs
+            guard = None
+            if len(attrs) == 2:
+                relation = self._model_field(model, attrs[0], name)
+                if not relation.is_relation or relation.many_to_many or relation.one_to_many:
+                    raise UnsupportedField(name)
+                # DRF omits the key entirely when the relation is null.
+                guard = self._column(attrs[0])
+            elif len(attrs) != 1:
+                raise UnsupportedField(name)
+            else:
+                self._model_field(model, attrs[0], name)
+            self.plan.append((name, self._column('__'.join(attrs)), convert, guard))
+
+    @staticmethod
+    def _model_field(model, attr, name):
+        try:
+            return model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            raise UnsupportedField(name)
+
+    def _column(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+        return self.paths.index(path)
+
+    def converter(self):
+        """Return a ``row -> dict`` function bound to the current timezone."""
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        iso_datetime = _iso_datetime(tz)
+        plan = [
+            (name, index, iso_datetime if convert is ISO_DATETIME else convert, guard)
+            for name, index, convert, guard in self.plan
+        ]
+
+        def to_dict(row):
+            data = {}
+            for name, index, convert, guard in plan:
+                if guard is not None and row[guard] is None:
+                    continue
+                if index.__class__ is tuple:
+                    data[name] = convert(*[row[i] for i in index])
+                    continue
+                value = row[index]
+                data[name] = value if value is None or convert is None else convert(value)
+            return data
+
+        return to_dict
+
+    def serialize(self, queryset):
+        to_dict = self.converter()
+        return [to_dict(row) for row in queryset.values_list(*self.paths)]
+
+
+@lru_cache(maxsize=256)
+def get_row_serializer(serializer_class, fields=None):
+    """Return a cached ``RowSerializer``, or None if the serializer can't use one."""
+    try:
+        return RowSerializer(serializer_class, fields)
+    except UnsupportedField:
+        return None
+
+
+@lru_cache(maxsize=64)
+def readable_fields(serializer_class):
+    return tuple(name for name, field in serializer_class().fields.items() if not field.write_only)
+
+
+def count_kwargs(paginator, queryset):
+    # count the model rows, without the joins of values_list(); only our paginators take it
+    if isinstance(paginator, OptionalPageNumberPagination):
+        return {'count_queryset': queryset}
+    return {}
+
+
+class SparseFieldsMixin:
+    """``?fields=a,b,c`` support and fast read-only list serialization.
+
+    Works on APIViews (call ``list_response`` from ``get``) and on viewsets,
+    where it replaces ``list``. Only the requested columns are selected and
+    only the requested keys are returned; unknown names are a 400.
+    """
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self, serializer_class):
+        raw = self.request.query_params.get(self.fields_query_param)
+        if not raw:
+            return None
+        names = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+        readable = readable_fields(serializer_class)
+        unknown = [f for f in names if f not in readable]
+        if unknown:
+            raise ValidationError({'error': f"Unknown field(s): {', '.join(unknown)}"})
+        return names
+
+    def list_response(self, queryset, serializer_class):
+        fields = self.get_requested_fields(serializer_class)
+        row_serializer = get_row_serializer(serializer_class, fields)
+
+        if row_serializer is not None:
+            rows = queryset.values_list(*row_serializer.paths)
+            to_dict = row_serializer.converter()
+
+            def to_data(items):
+                with timer('serialize'):
+                    return [to_dict(row) for row in items]
+        else:
+            rows = queryset
+
+            def to_data(items):
+                serializer = serializer_class(items, many=True, context={'request': self.request})
+                if fields is not None:
+                    child_fields = serializer.child.fields
+                    for name in list(child_fields):
+                        if name not in fields:
+                            child_fields.pop(name)
+                with timer('serialize'):
+                    return serializer.data
+
+        paginator = getattr(self, 'paginator', None)
+        if paginator is not None:
+            page = paginator.paginate_queryset(rows, self.request, view=self, **count_kwargs(paginator, queryset))
+            if page is not None:
+                return paginator.get_paginated_response(to_data(page))
+        return Response(to_data(rows))
+
+    async def alist_response(self, queryset, serializer_class):
+        """``list_response()`` for async views; rows are fetched with the async ORM.
+
+        Serializers without a ``RowSerializer`` may touch relations per object,
+        so they run in a worker thread via ``sync_to_async``.
+        """
+        fields = self.get_requested_fields(serializer_class)
+        row_serializer = get_row_serializer(serializer_class, fields)
+        if row_serializer is None:
+            return await sync_to_async(self.list_response)(queryset, serializer_class)
+
+        rows = queryset.values_list(*row_serializer.paths)
+        to_dict = row_serializer.converter()
+        paginator = getattr(self, 'paginator', None)
+        if paginator is not None:
+            page = await paginator.apaginate_queryset(rows, self.request, view=self, **count_kwargs(paginator, queryset))
+            if page is not None:
+                with timer('serialize'):
+                    data = [to_dict(row) for row in page]
+                return paginator.get_paginated_response(data)
+
+        rows = [row async for row in rows]
+        with timer('serialize'):
+            return Response([to_dict(row) for row in rows])
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()), self.get_serializer_class())
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.views.static import serve
+
+# what vite.config.js names its output: assets/[name]-[hash].[ext], with 8-character hashes;
+# files copied from public/ (apple-touch-icon.png, ...) keep their names and aren't hashed
+HASHED_NAME = re.compile(r'^assets/(?:[^/]+/)*[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticFile:
+    __slots__ = ('body', 'encoded', 'etag', 'content_type', 'cache_control')
+
+    def __init__(self, body, encoded, content_type, cache_control):
+        self.body = body
+        self.encoded = encoded
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.content_type = content_type
+        self.cache_control = cache_control
+
+
+class StaticFiles:
+    """In-memory copy of the built SPA under ``STATIC_ROOT``.
+
+    Files (and the ``.br``/``.gz`` siblings written by ``manage.py
+    compress_static``) are read once; afterwards every request is a dict
+    lookup. Files in the Vite manifest, and Vite's hashed names under
+    ``assets/`` for builds without one, are served as immutable; everything
+    else (``index.html``, files from ``public/``) must be revalidated. With
+    ``autoreload`` the disk is read on every request instead, for development.
+    """
+
+    def __init__(self, root, max_file_size=10 * 2 ** 20, autoreload=False):
+        self.root = root
+        self.max_file_size = max_file_size
+        self.autoreload = autoreload
+        self._files = None
+        self._immutable = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        immutable = set()
+        manifest_path = os.path.join(self.root, '.vite', 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'rb') as fh:
+                for entry in json.load(fh).values():
+                    immutable.add(entry['file'])
+                    immutable.update(entry.get('css', []))
+                    immutable.update(entry.get('assets', []))
+
+        files = {}
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                relpath = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, '/')
+                static_file = self._read(relpath, immutable)
+                if static_file is not None:
+                    files[relpath] = static_file
+        with self._lock:
+            self._immutable = immutable
+            self._files = files
+
+    def _read(self, relpath, immutable):
+        path = os.path.join(self.root, relpath)
+        if os.path.getsize(path) > self.max_file_size:
+            return None
+        with open(path, 'rb') as fh:
+            body = fh.read()
+        encoded = {}
+        for encoding, suffix in VARIANTS:
+            if os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as fh:
+                    encoded[encoding] = fh.read()
+        content_type = mimetypes.guess_type(relpath)[0] or 'application/octet-stream'
+        hashed = relpath in immutable or HASHED_NAME.search(relpath)
+        return StaticFile(body, encoded, content_type, IMMUTABLE if hashed else REVALIDATE)
+
+    def get(self, relpath):
+        """Return the cached ``StaticFile``, None if missing, or False if too large to cache."""
+        if self.autoreload:
+            try:
+                path = safe_join(self.root, relpath)
+            except SuspiciousFileOperation:
+                return None
+            if not os.path.isfile(path):
+                return None
+            return self._read(os.path.relpath(path, self.root).replace(os.sep, '/'), self._immutable) or False
+        if self._files is None:
+            self.load()
+        static_file = self._files.get(relpath)
+        if static_file is None and '..' not in relpath.split('/') and os.path.isfile(os.path.join(self.root, relpath)):
+            # too large to keep in memory, or added after load()
+            return False
+        return static_file
+
+
+static_files = StaticFiles(settings.STATIC_ROOT, autoreload=settings.DEBUG)
+
+
+def accepts_encoding(request, encoding):
+    """Whether the request's Accept-Encoding allows ``encoding``, directly or via ``*``, with q > 0."""
+    qualities = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities.get(encoding, qualities.get('*', 0.0)) > 0
+
+
+def static_response(request, static_file):
+    """Build a response for ``static_file`` honouring Accept-Encoding and If-None-Match."""
+    encoding = next((e for e, _ in VARIANTS if e in static_file.encoded and accepts_encoding(request, e)), None)
+    etag = f'"{static_file.etag}-{encoding}"' if encoding else f'"{static_file.etag}"'
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        tags = {t.strip().removeprefix('W/') for t in if_none_match.split(',')}
+        if etag in tags or '*' in tags:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            response['Cache-Control'] = static_file.cache_control
+            response['Vary'] = 'Accept-Encoding'
+            return response
+
+    body = static_file.encoded[encoding] if encoding else static_file.body
+    response = HttpResponse(b'' if request.method == 'HEAD' else body, content_type=static_file.content_type)
+    response['Content-Length'] = len(body)
+    response['ETag'] = etag
+    response['Cache-Control'] = static_file.cache_control
+    response['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def serve_static(request, path, prefix=''):
+    """Serve a file from ``STATIC_ROOT`` out of memory (``/assets/`` and ``/static/``)."""
+    relpath = prefix + path
+    static_file = static_files.get(relpath)
+    if static_file is None:
+        raise Http404(f'"{relpath}" does not exist')
+    if static_file is False:
+        return serve(request, relpath, document_root=settings.STATIC_ROOT)
+    return static_response(request, static_file)
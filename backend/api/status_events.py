@@ -0,0 +1,156 @@
+"""Lead status history (``LeadStatusEvent``) and time-in-stage percentiles.
+
+``api.signals`` records an event whenever a lead is created or saved with a
+new status; views put the acting user in ``lead.status_changed_by``. Imports
+wrap their loop in ``batch()`` so the events go out in a few ``bulk_create``
+calls instead of one INSERT per lead. ``seed_scale`` writes a generated
+history with the leads.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .days import local_midnight
+from .models import LeadStatusEvent
+
+_pending = ContextVar('lead_status_events', default=None)
+
+# group_by keys of time_in_stage()
+GROUPS = ('sales_user', 'source')
+
+
+def record(lead, from_status, to_status, at=None, changed_by=None, using=DEFAULT_DB_ALIAS):
+    """Store that ``lead`` went from ``from_status`` to ``to_status``, or queue it inside ``batch()``."""
+    # imports may pass the raw value (e.g. Meta's created_time string)
+    at = LeadStatusEvent._meta.get_field('at').to_python(at) if at else timezone.now()
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+    event = LeadStatusEvent(
+        lead_id=lead.pk, from_status=from_status or '', to_status=to_status, at=at, changed_by=changed_by,
+        sales_user_id=lead.assigned_to_id, source=lead.source or '',
+    )
+    pending = _pending.get()
+    if pending is None:
+        event.save(using=using)
+        return
+    events, batch_size = pending
+    events.setdefault(using, []).append(event)
+    if len(events[using]) >= batch_size:
+        LeadStatusEvent.objects.using(using).bulk_create(events.pop(using))
+
+
+@contextmanager
+def batch(batch_size=500):
+    """Buffer the events recorded inside the block and insert them ``batch_size`` at a time."""
+    if _pending.get() is not None:
+        # already batching further up
+        yield
+        return
+    events = {}
+    token = _pending.set((events, batch_size))
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        for using, queued in events.items():
+            # the leads were saved (imports don't roll back), so their events are kept too
+            if not connections[using].needs_rollback:
+                LeadStatusEvent.objects.using(using).bulk_create(queued, batch_size=batch_size)
+
+
+def _seconds_between(vendor, start, end):
+    if vendor == 'postgresql':
+        return f'EXTRACT(EPOCH FROM {end} - {start})'
+    return f'(julianday({end}) - julianday({start})) * 86400'
+
+
+def time_in_stage(start, end, group_by=('sales_user',), sales_user=None, using=DEFAULT_DB_ALIAS):
+    """Time leads spent in each status, for stays that began on days ``start``..``end``.
+
+    One row per status and ``group_by`` value (see ``GROUPS``) with how many
+    leads ``entered`` the status, how many have ``left`` it since, and the
+    50th/90th percentile and mean of those completed stays in seconds. A stay
+    ends at the lead's next event (``LEAD()`` over its history) and the
+    percentiles are nearest-rank, from ``ROW_NUMBER()`` and ``COUNT()``
+    windows, so the whole computation stays in one SQL statement.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    params = [
+        connection.ops.adapt_datetimefield_value(local_midnight(start)),
+        connection.ops.adapt_datetimefield_value(local_midnight(end + timedelta(days=1))),
+    ]
+    user_filter = ''
+    if sales_user is not None:
+        # after LEAD(), so a stay still ends at an event of the lead's next owner
+        user_filter = 'AND owner = %s'
+        params.append(sales_user)
+    groups = [{'sales_user': 'e.sales_user_id', 'source': 'e.source'}[key] for key in group_by]
+    group_columns = ''.join(f', {column} AS g{i}' for i, column in enumerate(groups))
+    group_names = ''.join(f', g{i}' for i in range(len(groups)))
+
+    def qualified(table):
+        return ''.join(f', {table}.g{i}' for i in range(len(groups)))
+
+    # unassigned leads (NULL sales_user) form one group
+    join_groups = ''.join(
+        f' AND (percentiles.g{i} = entered.g{i} OR (percentiles.g{i} IS NULL AND entered.g{i} IS NULL))'
+        for i in range(len(groups))
+    )
+    # earlier events don't matter: a stay that began in range ends at a later event
+    sql = f"""
+        WITH stays AS (
+            SELECT e.to_status AS stage{group_columns}, e.sales_user_id AS owner, e.at,
+                   LEAD(e.at) OVER (PARTITION BY e.lead_id ORDER BY e.at, e.id) AS left_at
+            FROM {quote(LeadStatusEvent._meta.db_table)} e
+            WHERE e.at >= %s
+        ), timed AS (
+            SELECT stage{group_names}, {_seconds_between(connection.vendor, 'at', 'left_at')} AS seconds
+            FROM stays
+            WHERE at < %s {user_filter}
+        ), ranked AS (
+            -- only finished stays are sorted; open ones just count as entered
+            SELECT stage{group_names}, seconds,
+                   ROW_NUMBER() OVER (PARTITION BY stage{group_names} ORDER BY seconds) AS position,
+                   COUNT(*) OVER (PARTITION BY stage{group_names}) AS finished
+            FROM timed
+            WHERE seconds IS NOT NULL
+        ), percentiles AS (
+            SELECT stage{group_names}, MAX(finished) AS finished,
+                   MIN(CASE WHEN position >= 0.5 * finished THEN seconds END) AS p50,
+                   MIN(CASE WHEN position >= 0.9 * finished THEN seconds END) AS p90,
+                   AVG(seconds) AS mean
+            FROM ranked
+            GROUP BY stage{group_names}
+        ), entered AS (
+            SELECT stage{group_names}, COUNT(*) AS entered
+            FROM timed
+            GROUP BY stage{group_names}
+        )
+        SELECT entered.stage{qualified('entered')}, entered.entered, COALESCE(percentiles.finished, 0),
+               percentiles.p50, percentiles.p90, percentiles.mean
+        FROM entered
+        LEFT JOIN percentiles ON percentiles.stage = entered.stage{join_groups}
+        ORDER BY entered.stage{qualified('entered')}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    results = []
+    for row in rows:
+        stage, values = row[0], row[1:1 + len(groups)]
+        entered, left, p50, p90, mean = row[1 + len(groups):]
+        results.append({
+            'stage': stage,
+            **dict(zip(group_by, values)),
+            'entered': entered,
+            'left': left,
+            # SQLite's julianday() arithmetic leaves float noise below a second
+            'p50_seconds': round(float(p50), 1) if p50 is not None else None,
+            'p90_seconds': round(float(p90), 1) if p90 is not None else None,
+            'mean_seconds': round(float(mean), 1) if mean is not None else None,
+        })
+    return results
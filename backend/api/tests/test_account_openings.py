@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import AccountOpening, Lead, User
+
+SUMMARY = '/api/account_openings/summary/'
+
+
+class AccountOpeningSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', user_type='admin', is_staff=True)
+        cls.rep = User.objects.create(username='rep', first_name='Asha', last_name='Rao', user_type='sales')
+        cls.other = User.objects.create(username='other', user_type='sales')
+        lead = Lead.objects.create(name='Lead', source='csv', assigned_to=cls.rep)
+        # ten cents ten times: 0.9999999999999999 as floats
+        for _ in range(10):
+            AccountOpening.objects.create(lead=lead, created_by=cls.rep, deposit_amount=Decimal('0.10'))
+        for amount in ('0.01', '0.04'):
+            AccountOpening.objects.create(lead=lead, created_by=cls.other, deposit_amount=Decimal(amount))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_sums_and_averages_are_exact(self):
+        data = self.client.get(SUMMARY).json()
+        self.assertEqual(data['count'], 12)
+        self.assertEqual(data['deposits'], '1.05')
+        self.assertEqual(data['average_deposit'], '0.09')
+        self.assertEqual(data['top_reps'], [
+            {'created_by': self.rep.id, 'name': 'Asha Rao', 'count': 10, 'deposits': '1.00'},
+            {'created_by': self.other.id, 'name': 'other', 'count': 2, 'deposits': '0.05'},
+        ])
+
+    def test_average_rounds_half_up(self):
+        data = self.client.get(SUMMARY, {'created_by': self.other.id}).json()
+        # 0.025, which rounds half to even as 0.02
+        self.assertEqual(data['average_deposit'], '0.03')
+        self.assertEqual(self.client.get(SUMMARY, {'top': 1}).json()['top_reps'][0]['deposits'], '1.00')
+
+    def test_funnel_and_timeseries_match_the_summary(self):
+        today = timezone.localdate().isoformat()
+        funnel = self.client.get('/api/analytics/funnel/', {'group_by': 'sales_user'}).json()
+        self.assertEqual(funnel['totals']['deposits'], '1.05')
+        self.assertEqual(
+            {row['sales_user']: row['deposits'] for row in funnel['results']},
+            {self.rep.id: '1.00', self.other.id: '0.05'},
+        )
+        series = self.client.get('/api/analytics/timeseries/', {'metric': 'deposits', 'from': today, 'to': today}).json()
+        self.assertEqual(series['results'][0]['value'], '1.05')
@@ -0,0 +1,86 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from api import analytics
+from api.days import local_midnight
+from api.models import Lead, Task, User
+
+
+class SeriesCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = User.objects.create(username='rep', user_type='sales')
+        cls.end = timezone.localdate()
+        cls.start = cls.end - datetime.timedelta(days=13)
+
+    def setUp(self):
+        cache.clear()
+        self.compute = self.enterContext(
+            mock.patch.object(analytics.Metric, 'compute', autospec=True, side_effect=analytics.Metric.compute),
+        )
+
+    def lead(self, day, **fields):
+        return Lead.objects.create(name='Lead', assigned_to=self.rep, created_at=local_midnight(day) + datetime.timedelta(hours=12), **fields)
+
+    def series(self, bucket='day'):
+        rows = analytics.series('leads_created', bucket, self.start, self.end)
+        return {row['bucket']: row['value'] for row in rows}
+
+    def computed(self):
+        """The ``(start, end)`` of each ``Metric.compute()`` since the last call."""
+        spans = [call.args[1:3] for call in self.compute.call_args_list]
+        self.compute.reset_mock()
+        return spans
+
+    def test_cached_series_is_not_recomputed(self):
+        self.lead(self.end)
+        first = self.series()
+        self.assertEqual(self.computed(), [(self.start, self.end)])
+        self.assertEqual(self.series(), first)
+        self.assertEqual(self.computed(), [])
+        self.assertEqual(sum(first.values()), 1)
+
+    def test_a_save_recomputes_only_its_day(self):
+        day = self.end - datetime.timedelta(days=5)
+        self.series()
+        self.computed()
+        lead = self.lead(day)
+        self.assertEqual(self.series()[day.isoformat()], 1)
+        self.assertEqual(self.computed(), [(day, day)])
+        lead.status = 'contacted'
+        lead.save()
+        self.series()
+        self.assertEqual(self.computed(), [(day, day)])
+        lead.delete()
+        self.assertEqual(self.series()[day.isoformat()], 0)
+        self.assertEqual(self.computed(), [(day, day)])
+
+    def test_stale_buckets_are_recomputed_in_one_span(self):
+        first, last = self.start + datetime.timedelta(days=2), self.end - datetime.timedelta(days=3)
+        self.series()
+        self.computed()
+        self.lead(first)
+        self.lead(last)
+        values = self.series()
+        self.assertEqual(self.computed(), [(first, last)])
+        self.assertEqual(sum(values.values()), 2)
+
+    def test_week_buckets(self):
+        self.series('week')
+        self.computed()
+        day = self.end - datetime.timedelta(days=7)
+        self.lead(day)
+        self.series('week')
+        week = analytics.bucket_start(day, 'week')
+        self.assertEqual(self.computed(), [(max(self.start, week), week + datetime.timedelta(days=6))])
+
+    def test_other_metrics_keep_their_cache(self):
+        self.series()
+        self.computed()
+        Task.objects.create(title='Task', assigned_to=self.rep)
+        self.series()
+        self.assertEqual(self.computed(), [])
@@ -0,0 +1,48 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory, TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.async_views import AsyncBatchView, AsyncMeView
+from api.models import User
+
+
+class AsyncAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='rep', user_type='sales')
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view, request, session_user=None):
+        # what AuthenticationMiddleware leaves for SessionAuthentication
+        request.user = session_user or AnonymousUser()
+        response = await view.as_view()(request)
+        return response, json.loads(response.content)
+
+    async def test_bearer_token(self):
+        token = await sync_to_async(AccessToken.for_user)(self.user)
+        response, data = await self.call(AsyncMeView, self.factory.get('/api/users/me/', headers={'Authorization': f'Bearer {token}'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['username'], 'rep')
+
+    async def test_session(self):
+        response, data = await self.call(AsyncMeView, self.factory.get('/api/users/me/'), session_user=self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['username'], 'rep')
+
+    async def test_session_writes_need_the_csrf_token(self):
+        request = self.factory.post('/api/batch/', {'requests': []}, content_type='application/json')
+        response, data = await self.call(AsyncBatchView, request, session_user=self.user)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF', data['detail'])
+
+    async def test_anonymous(self):
+        response, _data = await self.call(AsyncMeView, self.factory.get('/api/users/me/'))
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(response['WWW-Authenticate'].startswith('Bearer'))
+        response, _data = await self.call(AsyncMeView, self.factory.get('/api/users/me/', headers={'Authorization': 'Bearer not-a-token'}))
+        self.assertEqual(response.status_code, 401)
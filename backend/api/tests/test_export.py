@@ -0,0 +1,191 @@
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import export
+from api.models import AccountOpening, Lead, Task, User
+from api.serializers import AccountOpeningSerializer, LeadSerializer, TaskSerializer
+from api.sparse_fields import readable_fields
+
+
+def as_json(data):
+    """``data`` as the non-streaming API would send it, decoded again."""
+    return json.loads(JSONRenderer().render(data))
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', user_type='admin')
+        cls.rep = User.objects.create(username='rep', email='rep@example.com', user_type='sales')
+        cls.other = User.objects.create(username='other', email='other@example.com', user_type='sales')
+        now = timezone.now()
+        # created out of id order, so the export's ordering is what puts them in place
+        for i in range(12):
+            Lead.objects.create(
+                name=f'Lead {i}', email=f'lead{i}@example.com', phone=f'+9190000000{i:02d}', city='Pune, MH',
+                source='csv', status='new' if i % 2 else 'contacted',
+                assigned_to=cls.rep if i % 3 else cls.other,
+                created_at=now - timedelta(hours=(i * 7) % 12), raw_data={'note': f'"quoted" {i}'},
+            )
+        for i in range(5):
+            Task.objects.create(title=f'Task {i}', assigned_to=cls.rep if i % 2 else cls.other)
+        lead = Lead.objects.filter(assigned_to=cls.rep).first()
+        AccountOpening.objects.create(lead=lead, created_by=cls.rep, deposit_amount=Decimal('1500.50'), notes='first')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return response, body
+
+    def ndjson(self, path):
+        _response, body = self.export(path)
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    def test_ndjson_rows_match_the_serializer_in_order(self):
+        expected = as_json(LeadSerializer(Lead.objects.order_by('-created_at'), many=True).data)
+        self.assertEqual(self.ndjson('/api/export/leads/?format=ndjson'), expected)
+
+    def test_csv_matches_the_ndjson_export(self):
+        response, body = self.export('/api/export/leads/?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="leads-', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        columns = list(readable_fields(LeadSerializer))
+        self.assertEqual(rows[0], columns)
+        records = self.ndjson('/api/export/leads/?format=ndjson')
+        self.assertEqual(len(rows) - 1, len(records))
+        for row, record in zip(rows[1:], records):
+            self.assertEqual(row[columns.index('id')], str(record['id']))
+            self.assertEqual(row[columns.index('city')], record['city'])
+            self.assertEqual(json.loads(row[columns.index('raw_data')]), record['raw_data'])
+
+    def test_sales_users_export_their_own_leads(self):
+        self.client.force_authenticate(self.rep)
+        records = self.ndjson('/api/export/leads/?format=ndjson')
+        expected = list(Lead.objects.filter(assigned_to=self.rep).order_by('-created_at').values_list('id', flat=True))
+        self.assertEqual([record['id'] for record in records], expected)
+
+    def test_tasks_and_account_openings(self):
+        self.assertEqual(
+            self.ndjson('/api/export/tasks/?format=ndjson'),
+            as_json(TaskSerializer(Task.objects.order_by('id'), many=True).data),
+        )
+        self.assertEqual(
+            self.ndjson('/api/export/account_openings/?format=ndjson'),
+            as_json(AccountOpeningSerializer(AccountOpening.objects.order_by('-created_at'), many=True).data),
+        )
+        self.client.force_authenticate(self.rep)
+        records = self.ndjson('/api/export/tasks/?format=ndjson')
+        self.assertEqual({record['assigned_to'] for record in records}, {self.rep.id})
+
+    def test_account_openings_take_the_list_filters(self):
+        lead = Lead.objects.filter(assigned_to=self.other).first()
+        AccountOpening.objects.create(lead=lead, created_by=self.other, deposit_amount=Decimal('20.00'))
+        AccountOpening.objects.filter(created_by=self.other).update(created_at=timezone.now() - timedelta(days=3))
+        today = timezone.localdate()
+        for query, expected in (
+            (f'created_by={self.rep.id}', AccountOpening.objects.filter(created_by=self.rep)),
+            (f'from={today}', AccountOpening.objects.filter(created_by=self.rep)),
+            (f'to={today - timedelta(days=1)}', AccountOpening.objects.filter(created_by=self.other)),
+            ('source=meta', AccountOpening.objects.none()),
+        ):
+            with self.subTest(query):
+                records = self.ndjson(f'/api/export/account_openings/?format=ndjson&{query}')
+                self.assertEqual([record['id'] for record in records], list(expected.values_list('id', flat=True)))
+        for query in ('created_by=rep', 'from=yesterday', f'from={today}&to={today - timedelta(days=1)}'):
+            with self.subTest(query):
+                response = self.client.get(f'/api/export/account_openings/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_sparse_fields(self):
+        records = self.ndjson('/api/export/leads/?format=ndjson&fields=id,name')
+        self.assertEqual(records, list(Lead.objects.order_by('-created_at').values('id', 'name')))
+        _response, body = self.export('/api/export/leads/?format=csv&fields=name,id')
+        self.assertEqual(body.decode().splitlines()[0], 'name,id')
+
+    def test_gzip_is_the_same_export(self):
+        _response, plain = self.export('/api/export/leads/?format=csv')
+        response, unzipped = self.export('/api/export/leads/?format=csv', **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(unzipped, plain)
+        response, _body = self.export('/api/export/leads/?format=csv', **{'Accept-Encoding': 'gzip;q=0'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    async def test_streams_chunk_by_chunk_under_asgi(self):
+        response = await AsyncClient().get(
+            '/api/export/leads/?format=ndjson', headers={'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        # an async iterator, which Django streams instead of collecting into a list
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        _response, expected = await sync_to_async(self.export)('/api/export/leads/?format=ndjson')
+        self.assertEqual(body, expected)
+
+    def test_rejects_unknown_formats_and_models(self):
+        self.assertEqual(self.client.get('/api/export/leads/?format=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/users/').status_code, 404)
+
+
+class ExportMemoryTests(TestCase):
+    CHUNK_SIZE = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', user_type='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.enterContext(mock.patch.object(export, 'EXPORT_CHUNK_SIZE', self.CHUNK_SIZE))
+
+    def seed(self, count):
+        Lead.objects.all().delete()
+        Lead.objects.bulk_create(
+            Lead(name=f'Lead {i}', email=f'lead{i}@example.com', city='Pune', source='csv', raw_data={'row': i, 'note': 'x' * 200})
+            for i in range(count)
+        )
+
+    def peak(self, path):
+        """Peak traced memory while the export streams, chunks dropped as they arrive."""
+        tracemalloc.start()
+        try:
+            response = self.client.get(path)
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            return size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_does_not_grow_with_the_row_count(self):
+        for path in ('/api/export/leads/?format=csv', '/api/export/leads/?format=ndjson'):
+            with self.subTest(path):
+                self.seed(self.CHUNK_SIZE)
+                self.peak(path)  # warm up
+                self.seed(4 * self.CHUNK_SIZE)
+                small_size, small_peak = self.peak(path)
+                self.seed(40 * self.CHUNK_SIZE)
+                large_size, large_peak = self.peak(path)
+                self.assertGreater(large_size, 9 * small_size)
+                # ten times the rows, well under twice the memory
+                self.assertLess(large_peak, 1.5 * small_peak, (small_peak, large_peak))
@@ -0,0 +1,61 @@
+import importlib
+import json
+import unittest
+
+from django.db import connection, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from api.management.commands.explain_hot_queries import hot_queries, table_scans
+from api.models import Attendance, Lead, Task, User
+
+hot_path_indexes = importlib.import_module('api.migrations.0012_hot_path_indexes')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'query plans are checked on PostgreSQL')
+class HotPathIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = User.objects.create(username='rep', user_type='sales')
+        cls.admin = User.objects.create(username='admin', user_type='admin')
+        cls.staff = User.objects.create(username='staff', user_type='staff')
+        Lead.objects.create(name='Lead', email='lead@example.com', phone='+910000000001', assigned_to=cls.rep)
+        Task.objects.create(title='Task', assigned_to=cls.staff)
+        Attendance.objects.create(user=cls.rep, date=timezone.localdate(), time_in=timezone.localtime().time())
+
+    def plan(self, queryset):
+        # the tables hold a handful of rows, so make the planner show which index it would use
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            return json.loads(queryset.explain(format='json'))[0]['Plan']
+
+    def test_indexes_are_present_and_valid(self):
+        names = [operation.index.name for operation in hot_path_indexes.Migration.operations]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_class.relname, pg_index.indisvalid FROM pg_index '
+                'JOIN pg_class ON pg_class.oid = pg_index.indexrelid WHERE pg_class.relname = ANY(%s)',
+                [names],
+            )
+            found = dict(cursor.fetchall())
+        self.assertEqual(found, dict.fromkeys(names, True))
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in hot_queries(self.rep, self.admin, self.staff):
+            with self.subTest(name):
+                scans = table_scans(self.plan(queryset))
+                self.assertFalse([table for node, table, _index in scans if node == 'Seq Scan'], scans)
+
+    def test_lookups_use_their_index(self):
+        today = timezone.localdate()
+        expected = [
+            (Lead.objects.filter(assigned_to=self.rep).order_by('-created_at'), 'api_lead_assignee_created_idx'),
+            (Lead.objects.filter(status='contacted').order_by('-created_at'), 'api_lead_status_created_idx'),
+            (Lead.objects.filter(email__iexact='lead@example.com'), 'api_lead_email_upper_idx'),
+            (Lead.objects.filter(phone='+910000000001'), 'api_lead_phone_idx'),
+            (Task.objects.filter(assigned_to=self.staff, status='pending'), 'api_task_assignee_status_idx'),
+            (Attendance.objects.filter(date=today, time_in__isnull=False, time_out__isnull=True), 'api_attendance_open_idx'),
+        ]
+        for queryset, index in expected:
+            with self.subTest(index):
+                self.assertIn(index, [scanned for _node, _table, scanned in table_scans(self.plan(queryset))])
@@ -0,0 +1,68 @@
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import AccountOpening, FollowUp, Lead, LeadStatusEvent, PaymentProof, User
+
+# the lead, then its follow-ups, account openings, payment proofs and status events
+DETAIL_QUERIES = 5
+
+
+class LeadDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = User.objects.create(username='rep', user_type='sales')
+        cls.other = User.objects.create(username='other', user_type='sales')
+        cls.admin = User.objects.create(username='admin', user_type='admin')
+        cls.users = [cls.rep, cls.other, cls.admin]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.rep)
+
+    def seed(self, size):
+        today = timezone.localdate()
+        lead = Lead.objects.create(name=f'Lead {size}', source='csv', assigned_to=self.rep)
+        for i in range(size):
+            user = self.users[i % len(self.users)]
+            FollowUp.objects.create(lead=lead, scheduled_date=today + datetime.timedelta(days=i), created_by=user)
+            AccountOpening.objects.create(lead=lead, created_by=user, deposit_amount=Decimal('100.00') * (i + 1))
+            PaymentProof.objects.create(lead=lead, uploaded_by=user, file=f'indicator_proofs/proof-{i}.png')
+            LeadStatusEvent.objects.create(
+                lead=lead, from_status='new', to_status='contacted', changed_by=user, sales_user=self.rep,
+                at=timezone.now() - datetime.timedelta(minutes=size - i),
+            )
+        return lead
+
+    def test_query_count_does_not_grow_with_related_rows(self):
+        for size in (1, 6):
+            lead = self.seed(size)
+            with self.subTest(size=size), self.assertNumQueries(DETAIL_QUERIES):
+                response = self.client.get(f'/api/leads/{lead.id}/')
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            for key in ('followups', 'account_openings', 'payment_proofs'):
+                self.assertEqual(len(data[key]), size, key)
+
+    def test_relations_are_ordered_and_named(self):
+        lead = self.seed(3)
+        data = self.client.get(f'/api/leads/{lead.id}/').json()
+        self.assertEqual(data['id'], lead.id)
+        dates = [followup['scheduled_date'] for followup in data['followups']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        events = data['status_history']
+        self.assertEqual(len(events), lead.status_events.count())
+        self.assertEqual([event['at'] for event in events], sorted(event['at'] for event in events))
+        names = {user.username for user in self.users}
+        self.assertLessEqual({proof['uploaded_by_username'] for proof in data['payment_proofs']}, names)
+        self.assertLessEqual({event['changed_by_username'] for event in events} - {None}, names)
+
+    def test_other_reps_leads_are_hidden(self):
+        lead = self.seed(1)
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(f'/api/leads/{lead.id}/').status_code, 404)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(f'/api/leads/{lead.id}/').status_code, 200)
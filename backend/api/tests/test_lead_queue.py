@@ -0,0 +1,157 @@
+import threading
+import unittest
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import lead_queue
+from api.models import Lead, User
+
+URL = '/api/leads/claim_next/'
+
+
+def queue(count, source='csv'):
+    now = timezone.now()
+    return [
+        Lead.objects.create(name=f'Lead {i}', source=source, created_at=now - timedelta(minutes=count - i))
+        for i in range(count)
+    ]
+
+
+@override_settings(LEAD_ASSIGNMENT='pull', LEAD_CLAIM_MAX=5)
+class ClaimNextLeadsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = User.objects.create(username='rep', user_type='sales')
+        cls.other = User.objects.create(username='other', user_type='sales')
+        cls.admin = User.objects.create(username='admin', user_type='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.rep)
+
+    def claim(self, data=None, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.post(f'{URL}?{query}' if query else URL, data, format='json')
+
+    def test_claims_the_oldest_queued_leads(self):
+        leads = queue(4)
+        response = self.claim(n=3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([lead['id'] for lead in response.json()['claimed']], [lead.id for lead in leads[:3]])
+        self.assertEqual(
+            set(Lead.objects.filter(assigned_to=self.rep).values_list('id', flat=True)), {lead.id for lead in leads[:3]},
+        )
+        self.assertEqual([lead['id'] for lead in self.claim({'n': 5}).json()['claimed']], [leads[3].id])
+        self.assertEqual(self.claim().json()['claimed'], [])
+
+    def test_source_filter(self):
+        csv_leads = queue(2)
+        meta_leads = queue(2, source='meta')
+        claimed = self.claim(n=5, source='meta').json()['claimed']
+        self.assertEqual([lead['id'] for lead in claimed], [lead.id for lead in meta_leads])
+        claimed = self.claim({'n': 5, 'source': 'csv'}).json()['claimed']
+        self.assertEqual([lead['id'] for lead in claimed], [lead.id for lead in csv_leads])
+
+    def test_invalid_n_and_source(self):
+        queue(1)
+        for value in (0, -1, 6, 'two', '1.5', True, 2.0, [1]):
+            with self.subTest(n=value):
+                self.assertEqual(self.claim({'n': value}).status_code, 400)
+        self.assertEqual(self.claim(n=6).status_code, 400)
+        self.assertEqual(self.claim(n='x').status_code, 400)
+        for value in (1, ['csv'], {'name': 'csv'}):
+            with self.subTest(source=value):
+                self.assertEqual(self.claim({'source': value}).status_code, 400)
+        self.assertEqual(self.claim([1]).status_code, 400)
+        self.assertFalse(Lead.objects.filter(assigned_to__isnull=False).exists())
+        self.assertEqual(self.claim(n='1').status_code, 200)
+
+    def test_only_sales_users_claim(self):
+        queue(1)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.claim().status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.claim().status_code, 401)
+        self.assertFalse(Lead.objects.filter(assigned_to__isnull=False).exists())
+
+    def test_expired_leases_go_back_to_the_queue(self):
+        lead, = queue(1)
+        self.claim()
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.claim().json()['claimed'], [])
+        Lead.objects.filter(pk=lead.pk).update(claim_expires_at=timezone.now() - timedelta(seconds=1))
+        claimed = self.claim().json()['claimed']
+        self.assertEqual([row['id'] for row in claimed], [lead.id])
+        lead.refresh_from_db()
+        self.assertEqual(lead.assigned_to, self.other)
+        self.assertGreater(lead.claim_expires_at, timezone.now())
+
+    def test_release_expired(self):
+        kept, returned = queue(2)
+        lead_queue.claim(self.rep, 2)
+        # worked on without going through set_status, then the lease ran out
+        Lead.objects.filter(pk=kept.pk).update(status='contacted')
+        Lead.objects.update(claim_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(lead_queue.release_expired(), 1)
+        self.assertEqual(lead_queue.release_expired(), 0)
+        kept.refresh_from_db()
+        returned.refresh_from_db()
+        self.assertEqual((kept.assigned_to, kept.claim_expires_at), (self.rep, None))
+        self.assertEqual((returned.assigned_to, returned.claim_expires_at), (None, None))
+        self.assertEqual(list(lead_queue.queued()), [returned])
+
+    def test_moving_a_lead_on_ends_its_lease(self):
+        lead, = queue(1)
+        self.claim()
+        response = self.client.post(f'/api/leads/{lead.id}/set_status/', {'status': 'contacted'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        lead.refresh_from_db()
+        self.assertEqual((lead.assigned_to, lead.claim_expires_at), (self.rep, None))
+        self.assertEqual(lead_queue.release_expired(), 0)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED is checked on PostgreSQL')
+@override_settings(LEAD_ASSIGNMENT='pull')
+class ConcurrentClaimTests(TransactionTestCase):
+    CLAIMERS = 6
+    LEADS = 120
+
+    def test_each_lead_is_claimed_exactly_once(self):
+        reps = [User.objects.create(username=f'rep{i}', user_type='sales') for i in range(self.CLAIMERS)]
+        queue(self.LEADS)
+        claimed = {rep.pk: [] for rep in reps}
+        errors = []
+        start = threading.Barrier(len(reps))
+
+        def claimer(rep):
+            try:
+                start.wait()
+                while True:
+                    leads, _expires = lead_queue.claim(rep, 3)
+                    if not leads:
+                        return
+                    claimed[rep.pk].extend(lead.pk for lead in leads)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claimer, args=(rep,)) for rep in reps]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        ids = [pk for pks in claimed.values() for pk in pks]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), set(Lead.objects.values_list('pk', flat=True)))
+        self.assertFalse(lead_queue.queued().exists())
+        for rep in reps:
+            self.assertEqual(
+                set(Lead.objects.filter(assigned_to=rep).values_list('pk', flat=True)), set(claimed[rep.pk]),
+            )
@@ -0,0 +1,109 @@
+import hashlib
+import hmac
+import json
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import meta_webhook
+from api.models import MetaLeadNotification
+
+URL = '/api/webhooks/meta/leadgen/'
+SECRET = 'app-secret'
+
+
+def payload(*leadgen_ids, page_id='page-1'):
+    return {
+        'object': 'page',
+        'entry': [{
+            'id': page_id,
+            'time': 1760000000,
+            'changes': [
+                {'field': 'leadgen', 'value': {'leadgen_id': leadgen_id, 'form_id': 'form-1', 'page_id': page_id}}
+                for leadgen_id in leadgen_ids
+            ],
+        }],
+    }
+
+
+def signature(body, secret=SECRET):
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+@override_settings(META_APP_SECRET=SECRET, META_WEBHOOK_VERIFY_TOKEN='verify-me')
+class MetaLeadgenWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def deliver(self, body, sig=None):
+        headers = {} if sig is False else {'X-Hub-Signature-256': sig or signature(body)}
+        return self.client.post(URL, body, content_type='application/json', headers=headers)
+
+    def test_signed_notification_is_queued(self):
+        response = self.deliver(json.dumps(payload('111', '222')).encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'queued': 2})
+        rows = MetaLeadNotification.objects.order_by('leadgen_id')
+        self.assertEqual(
+            list(rows.values_list('leadgen_id', 'form_id', 'page_id')),
+            [('111', 'form-1', 'page-1'), ('222', 'form-1', 'page-1')],
+        )
+
+    def test_bad_signature_is_rejected(self):
+        body = json.dumps(payload('111')).encode()
+        for sig in (False, 'sha256=' + '0' * 64, signature(body, 'other-secret'), signature(body)[len('sha256='):]):
+            with self.subTest(sig=sig):
+                self.assertEqual(self.deliver(body, sig).status_code, 403)
+        # signed for a different body
+        self.assertEqual(self.deliver(json.dumps(payload('999')).encode(), signature(body)).status_code, 403)
+        self.assertFalse(MetaLeadNotification.objects.exists())
+
+    @override_settings(META_APP_SECRET='')
+    def test_without_an_app_secret_nothing_is_accepted(self):
+        body = json.dumps(payload('111')).encode()
+        self.assertEqual(self.deliver(body, signature(body, '')).status_code, 403)
+
+    def test_signed_invalid_json(self):
+        self.assertEqual(self.deliver(b'{not json').status_code, 400)
+
+    def test_redeliveries_are_queued_once(self):
+        body = json.dumps(payload('111', '111', '222')).encode()
+        self.assertEqual(self.deliver(body).status_code, 200)
+        self.deliver(body)
+        self.deliver(json.dumps(payload('222', '333')).encode())
+        self.assertEqual(
+            sorted(MetaLeadNotification.objects.values_list('leadgen_id', flat=True)),
+            ['111', '222', '333'],
+        )
+
+    def test_redelivery_of_a_processed_lead_is_dropped(self):
+        self.deliver(json.dumps(payload('111')).encode())
+        MetaLeadNotification.objects.update(processed_at=timezone.now())
+        self.deliver(json.dumps(payload('111')).encode())
+        self.assertEqual(MetaLeadNotification.objects.count(), 1)
+        self.assertEqual(meta_webhook.lease(10), [])
+
+    def test_lease_takes_each_pending_lead_once(self):
+        self.deliver(json.dumps(payload('111', '222', '333')).encode())
+        first = meta_webhook.lease(2)
+        second = meta_webhook.lease(10)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({row.leadgen_id for row in first} & {row.leadgen_id for row in second})
+        self.assertEqual(meta_webhook.lease(10), [])
+        self.assertEqual(set(MetaLeadNotification.objects.values_list('attempts', flat=True)), {1})
+
+    def test_other_changes_are_ignored(self):
+        body = payload('111')
+        body['entry'][0]['changes'].append({'field': 'feed', 'value': {'post_id': '1'}})
+        self.assertEqual(self.deliver(json.dumps(body).encode()).json(), {'queued': 1})
+        self.assertEqual(self.deliver(json.dumps({'object': 'user', 'entry': []}).encode()).json(), {'queued': 0})
+
+    def test_subscription_check(self):
+        params = {'hub.mode': 'subscribe', 'hub.verify_token': 'verify-me', 'hub.challenge': '1158201444'}
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'1158201444')
+        response = self.client.get(URL, {**params, 'hub.verify_token': 'wrong'})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,31 @@
+import math
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_matches_drf_output(self):
+        data = {
+            'id': 1,
+            'name': 'Priya\u2028Shah',
+            'deposit': Decimal('1500.50'),
+            'created_at': datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+            'tags': ['a', None, True],
+            'nested': {'rate': 0.25, 'count': 3},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_non_finite_floats_render_as_null(self):
+        # documented difference: DRF's renderer raises ValueError for these
+        data = {'nan': math.nan, 'inf': math.inf, 'ninf': -math.inf}
+        self.assertEqual(ORJSONRenderer().render(data), b'{"nan":null,"inf":null,"ninf":null}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+
+    def test_none_renders_empty_body(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
@@ -0,0 +1,111 @@
+import datetime
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api import rollups
+from api.models import AccountOpening, DailySalesRollup, FollowUp, Lead, User
+
+
+def nonzero(rows):
+    """``{key: counters}`` without the counters, and then the keys, that are all zero."""
+    return {
+        key: kept for key, counters in rows.items()
+        if (kept := {name: value for name, value in counters.items() if value})
+    }
+
+
+def stored():
+    return nonzero({
+        (row.day, row.sales_user_id, row.source): {name: getattr(row, name) for name in rollups.COUNTER_FIELDS}
+        for row in DailySalesRollup.objects.all()
+    })
+
+
+class RollupUpkeepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = User.objects.create(username='rep', user_type='sales')
+        cls.other = User.objects.create(username='other', user_type='sales')
+        now = timezone.now()
+        cls.leads = [
+            Lead.objects.create(
+                name=f'Lead {i}', source='csv' if i % 2 else 'meta', assigned_to=cls.rep if i % 3 else cls.other,
+                created_at=now - datetime.timedelta(days=i),
+            )
+            for i in range(6)
+        ]
+        for i, lead in enumerate(cls.leads[:4]):
+            AccountOpening.objects.create(lead=lead, created_by=cls.rep if i % 2 else cls.other, deposit_amount=Decimal('12.50') * (i + 1))
+            FollowUp.objects.create(lead=lead, created_by=cls.other, scheduled_date=timezone.localdate())
+
+    def assertUpToDate(self):
+        self.assertEqual(stored(), nonzero(rollups.compute()))
+
+    def test_creates(self):
+        self.assertTrue(stored())
+        self.assertUpToDate()
+
+    def test_status_change(self):
+        for status in ('contacted', 'converted', 'not_interested', 'new'):
+            with self.subTest(status):
+                lead = self.leads[1]
+                lead.status = status
+                lead.save()
+                self.assertUpToDate()
+
+    def test_reassignment(self):
+        lead = self.leads[2]
+        for user in (self.rep, None, self.other):
+            with self.subTest(user=user):
+                lead.assigned_to = user
+                lead.save()
+                self.assertUpToDate()
+
+    def test_source_change_moves_the_child_rows(self):
+        lead = self.leads[0]
+        for source in ('csv', None, 'meta'):
+            with self.subTest(source=source):
+                lead.source = source
+                lead.save()
+                self.assertUpToDate()
+
+    def test_child_edits(self):
+        opening = AccountOpening.objects.first()
+        opening.deposit_amount = Decimal('0.01')
+        opening.created_by = self.rep
+        opening.save()
+        self.assertUpToDate()
+        followup = FollowUp.objects.first()
+        followup.created_by = None
+        followup.save()
+        self.assertUpToDate()
+
+    def test_deletes(self):
+        AccountOpening.objects.first().delete()
+        FollowUp.objects.first().delete()
+        self.assertUpToDate()
+        # with its openings and follow-ups
+        self.leads[1].delete()
+        self.assertUpToDate()
+
+    def test_user_deletion_folds_into_unassigned(self):
+        pk = self.other.pk
+        self.other.delete()
+        self.assertFalse(DailySalesRollup.objects.filter(sales_user_id=pk).exists())
+        self.assertUpToDate()
+
+    def test_rebuild_writes_the_same_rows(self):
+        before = stored()
+        DailySalesRollup.objects.update(leads_new=99)
+        call_command('rebuild_rollups', verbosity=0)
+        self.assertEqual(stored(), before)
+        # a range leaves the other days alone
+        day = timezone.localdate() - datetime.timedelta(days=2)
+        DailySalesRollup.objects.update(followups=7)
+        rollups.rebuild(day, day)
+        self.assertEqual({key: counters for key, counters in stored().items() if key[0] == day},
+                         {key: counters for key, counters in before.items() if key[0] == day})
+        self.assertTrue(all(row.followups == 7 for row in DailySalesRollup.objects.exclude(day=day)))
@@ -0,0 +1,53 @@
+import datetime
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import analytics, push
+from api.models import Attendance, Task, User
+
+
+class StoredValueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = User.objects.create(username='rep', user_type='sales')
+        cls.staff = User.objects.create(username='staff', user_type='staff')
+
+    def selects(self, instance):
+        """The SELECTs of ``instance``'s table that saving it runs."""
+        table = connection.ops.quote_name(type(instance)._meta.db_table)
+        with CaptureQueriesContext(connection) as queries:
+            instance.save()
+        return [query['sql'] for query in queries if query['sql'].startswith('SELECT') and f'FROM {table}' in query['sql']]
+
+    def test_task_save_reads_the_stored_row_once(self):
+        task = Task.objects.create(title='Task', assigned_to=self.rep)
+        task.assigned_to = self.staff
+        task.status = 'completed'
+        with mock.patch.object(push, 'publish') as publish, mock.patch.object(analytics, 'invalidate') as invalidate:
+            self.assertEqual(len(self.selects(task)), 1)
+        publish.assert_has_calls([
+            mock.call(self.staff.pk, 'task.assigned', [task.pk], 'default'),
+            mock.call(self.rep.pk, 'task.unassigned', [task.pk], 'default'),
+        ])
+        stored_updated_at = Task.objects.values_list('updated_at', flat=True).get()
+        self.assertEqual(invalidate.call_args.args[0], 'tasks_completed')
+        self.assertEqual(invalidate.call_args.args[1], stored_updated_at)
+
+    def test_unchanged_assignee_is_an_update(self):
+        task = Task.objects.create(title='Task', assigned_to=self.rep)
+        task.title = 'Renamed'
+        with mock.patch.object(push, 'publish') as publish:
+            task.save()
+        publish.assert_called_once_with(self.rep.pk, 'task.updated', [task.pk], 'default')
+
+    def test_attendance_change_of_day_invalidates_both_days(self):
+        today = timezone.localdate()
+        record = Attendance.objects.create(user=self.rep, date=today, status='present')
+        record.date = today - datetime.timedelta(days=1)
+        with mock.patch.object(analytics, 'invalidate') as invalidate:
+            self.assertEqual(len(self.selects(record)), 1)
+        invalidate.assert_called_once_with('attendance_present', record.date, today)
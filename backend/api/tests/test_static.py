@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from api.static import IMMUTABLE, REVALIDATE, StaticFiles
+
+
+class StaticFilesTests(SimpleTestCase):
+    def build(self, names, manifest=None):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        for name in names:
+            path = os.path.join(root.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as fh:
+                fh.write(name.encode())
+        if manifest is not None:
+            os.makedirs(os.path.join(root.name, '.vite'))
+            with open(os.path.join(root.name, '.vite', 'manifest.json'), 'w') as fh:
+                json.dump(manifest, fh)
+        return StaticFiles(root.name)
+
+    def cache_control(self, files, name):
+        return files.get(name).cache_control
+
+    def test_hashed_assets_are_immutable(self):
+        files = self.build([
+            'index.html', 'assets/js/index-4f2a9c1b.js', 'assets/css/index-Bx_9-aZ1.css', 'assets/logo-DlKhr3aE.svg',
+            'apple-touch-icon.png', 'android-chrome-192x192.png', 'favicon-32x32.png',
+        ])
+        for name in ('assets/js/index-4f2a9c1b.js', 'assets/css/index-Bx_9-aZ1.css', 'assets/logo-DlKhr3aE.svg'):
+            with self.subTest(name):
+                self.assertEqual(self.cache_control(files, name), IMMUTABLE)
+        # copied from public/ under their own names
+        for name in ('index.html', 'apple-touch-icon.png', 'android-chrome-192x192.png', 'favicon-32x32.png'):
+            with self.subTest(name):
+                self.assertEqual(self.cache_control(files, name), REVALIDATE)
+
+    def test_manifest_entries_are_immutable(self):
+        files = self.build(['index.html', 'assets/app.js', 'assets/app.css', 'assets/font.woff2', 'robots.txt'], manifest={
+            'index.html': {'file': 'assets/app.js', 'css': ['assets/app.css'], 'assets': ['assets/font.woff2']},
+        })
+        for name in ('assets/app.js', 'assets/app.css', 'assets/font.woff2'):
+            with self.subTest(name):
+                self.assertEqual(self.cache_control(files, name), IMMUTABLE)
+        self.assertEqual(self.cache_control(files, 'robots.txt'), REVALIDATE)
+        self.assertEqual(self.cache_control(files, 'index.html'), REVALIDATE)
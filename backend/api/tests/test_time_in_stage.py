@@ -0,0 +1,76 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.days import local_midnight
+from api.models import Lead, LeadStatusEvent, User
+
+URL = '/api/analytics/time_in_stage/'
+
+
+class TimeInStageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', user_type='admin')
+        cls.rep = User.objects.create(username='rep', first_name='Asha', last_name='Rao', user_type='sales')
+        cls.other = User.objects.create(username='other', user_type='sales')
+        # every event falls on today
+        start = local_midnight(timezone.localdate()) + datetime.timedelta(minutes=1)
+        # rep: ten leads new for 1..10 minutes; other: two leads new for 1000s and 3000s
+        stays = [(cls.rep, 60 * minutes) for minutes in range(1, 11)] + [(cls.other, 1000), (cls.other, 3000)]
+        # bulk_create, so the save signal doesn't record events of its own
+        leads = Lead.objects.bulk_create(Lead(name=f'Lead {i}', source='csv', status='contacted') for i in range(len(stays)))
+        events = []
+        for lead, (user, seconds) in zip(leads, stays):
+            events.append(LeadStatusEvent(lead=lead, to_status='new', at=start, sales_user=user, source='csv'))
+            events.append(LeadStatusEvent(
+                lead=lead, from_status='new', to_status='contacted', at=start + datetime.timedelta(seconds=seconds),
+                sales_user=user, source='csv',
+            ))
+        LeadStatusEvent.objects.bulk_create(events)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def results(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        return {(row['stage'], row.get('sales_user')): row for row in response.json()['results']}
+
+    def test_percentiles_per_rep(self):
+        rows = self.results()
+        rep_new = rows['new', self.rep.id]
+        self.assertEqual(
+            (rep_new['entered'], rep_new['left'], rep_new['p50_seconds'], rep_new['p90_seconds'], rep_new['mean_seconds']),
+            (10, 10, 300.0, 540.0, 330.0),
+        )
+        self.assertEqual(rep_new['sales_user_name'], 'Asha Rao')
+        other_new = rows['new', self.other.id]
+        self.assertEqual(
+            (other_new['p50_seconds'], other_new['p90_seconds'], other_new['mean_seconds']), (1000.0, 3000.0, 2000.0),
+        )
+        self.assertEqual(other_new['sales_user_name'], 'other')
+        # still in the stage, so counted but not timed
+        contacted = rows['contacted', self.rep.id]
+        self.assertEqual((contacted['entered'], contacted['left'], contacted['p50_seconds']), (10, 0, None))
+
+    def test_ungrouped_and_by_source(self):
+        new = self.results(group_by='source')['new', None]
+        self.assertEqual(new['source'], 'csv')
+        self.assertEqual((new['entered'], new['p50_seconds'], new['p90_seconds']), (12, 360.0, 1000.0))
+        self.assertNotIn('sales_user_name', new)
+
+    def test_sales_users_see_their_own_stays(self):
+        self.client.force_authenticate(self.other)
+        rows = self.results()
+        self.assertEqual({user for _stage, user in rows}, {self.other.id})
+        self.assertEqual(rows['new', self.other.id]['p90_seconds'], 3000.0)
+
+    def test_range_excludes_stays_that_began_outside_it(self):
+        yesterday = (timezone.localdate() - datetime.timedelta(days=1)).isoformat()
+        self.assertEqual(self.results(**{'from': yesterday, 'to': yesterday}), {})
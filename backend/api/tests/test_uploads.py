@@ -0,0 +1,47 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from api import uploads
+from api.models import StoredFile
+
+
+class StoredFileTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        # thumbnailing is not under test here
+        self.enterContext(mock.patch.object(uploads, '_executor'))
+
+    def store(self, content=b'proof'):
+        return uploads.store_upload(SimpleUploadedFile('proof.png', content, content_type='image/png'))
+
+    def exists(self, stored):
+        return os.path.exists(stored.file.path)
+
+    def test_identical_uploads_share_a_blob(self):
+        first, second = self.store(), self.store()
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(second.ref_count, 2)
+        uploads.release_stored_file(first.pk)
+        self.assertEqual(StoredFile.objects.get().ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.release_stored_file(first.pk)
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertFalse(self.exists(first))
+
+    def test_release_does_not_delete_a_newer_upload_of_the_same_bytes(self):
+        first = self.store()
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.release_stored_file(first.pk)
+            # stored again before the release's deletion runs
+            second = self.store()
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertFalse(self.exists(first))
+        self.assertTrue(self.exists(second))
+        with open(second.file.path, 'rb') as fh:
+            self.assertEqual(fh.read(), b'proof')
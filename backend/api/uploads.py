@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import secrets
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StoredFile
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is in requirements.txt
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = 'indicator_proofs/sha256'
+THUMBNAIL_SIZE = getattr(settings, 'UPLOAD_THUMBNAIL_SIZE', 320)
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'UPLOAD_WORKERS', 2), thread_name_prefix='uploads')
+
+
+def _write_to_disk(uploaded_file):
+    """Copy the upload into MEDIA_ROOT chunk by chunk, hashing as we go."""
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in uploaded_file.chunks():
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return hasher.hexdigest(), size, tmp_path
+
+
+def store_upload(uploaded_file):
+    """Persist an upload by content hash and return its ``StoredFile``.
+
+    The bytes are fsync'ed before this returns. Identical content is stored
+    once; the returned row's ``ref_count`` already includes the caller, who
+    must call ``release_stored_file`` if it does not end up referencing it.
+    Thumbnailing is queued to run after the surrounding transaction commits.
+    """
+    digest, size, tmp_path = _write_to_disk(uploaded_file)
+    ext = os.path.splitext(uploaded_file.name or '')[1].lower()[:10]
+    # each row gets its own blob name, so releasing one never deletes the file
+    # that a concurrent upload of the same bytes has just written
+    name = f'{UPLOAD_DIR}/{digest[:2]}/{digest}-{secrets.token_hex(4)}{ext}'
+
+    existing = _add_reference(digest)
+    if existing is not None:
+        os.remove(tmp_path)
+        return existing
+
+    final_path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    content_type = getattr(uploaded_file, 'content_type', None) or mimetypes.guess_type(name)[0] or ''
+    while True:
+        try:
+            with transaction.atomic():
+                stored = StoredFile.objects.create(
+                    sha256=digest, file=name, size=size, content_type=content_type, ref_count=1,
+                )
+        except IntegrityError:
+            # a concurrent upload created the row; unless it was released since, share it
+            existing = _add_reference(digest)
+            if existing is None:
+                continue
+            os.remove(final_path)
+            return existing
+        transaction.on_commit(lambda pk=stored.pk: _executor.submit(process_stored_file, pk))
+        return stored
+
+
+def _add_reference(digest):
+    """The ``StoredFile`` of ``digest`` with one more reference, or None if there is none.
+
+    The row is locked first, so ``release_stored_file`` can't delete it between
+    the lookup and the increment.
+    """
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(sha256=digest).first()
+        if stored is not None:
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') + 1)
+            stored.refresh_from_db(fields=['ref_count'])
+    return stored
+
+
+def release_stored_file(stored_file_id):
+    """Drop one reference; delete the row and its files when none remain."""
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(pk=stored_file_id).first()
+        if stored is None:
+            return
+        if stored.ref_count > 1:
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') - 1)
+            return
+        names = [n for n in (stored.file.name, stored.thumbnail.name if stored.thumbnail else None) if n]
+        stored.delete()
+    transaction.on_commit(lambda: [default_storage.delete(n) for n in names])
+
+
+def process_stored_file(stored_file_id):
+    """Build the thumbnail for an image upload. Runs on the upload worker pool."""
+    close_old_connections()
+    try:
+        stored = StoredFile.objects.filter(pk=stored_file_id, processed_at__isnull=True).first()
+        if stored is None:
+            return
+        if Image is not None and stored.content_type.startswith('image/'):
+            with default_storage.open(stored.file.name, 'rb') as fh, Image.open(fh) as image:
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                buffer = BytesIO()
+                image.convert('RGB').save(buffer, format='JPEG', quality=80, optimize=True)
+            thumb_name = f'{os.path.splitext(stored.file.name)[0]}.thumb.jpg'
+            if not default_storage.exists(thumb_name):
+                default_storage.save(thumb_name, ContentFile(buffer.getvalue()))
+            stored.thumbnail = thumb_name
+        stored.processed_at = timezone.now()
+        stored.save(update_fields=['thumbnail', 'processed_at'])
+    except Exception:
+        logger.exception('Error processing stored file %s', stored_file_id)
+    finally:
+        close_old_connections()
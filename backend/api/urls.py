@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import LoginView, RegisterView, UserViewSet, AttendanceViewSet, AdminTaskViewSet, StaffTaskViewSet, FetchMetaLeadsView, UploadLeadsCSVView
-from .views import LeadsListView, AccountOpeningCreateView, LeadSetStatusView, LeadIndicatorUploadView, FollowUpCreateView, FollowUpListView
+from .views import LoginView, RegisterView, UserViewSet, AttendanceViewSet, AdminTaskViewSet, StaffTaskViewSet, FetchMetaLeadsView, MetaLeadgenWebhookView, UploadLeadsCSVView
+from .views import LeadsListView, LeadDetailView, ClaimNextLeadsView, AccountOpeningListCreateView, AccountOpeningSummaryView, LeadSetStatusView, LeadIndicatorUploadView, FollowUpCreateView, FollowUpListView
+from .views import BatchView, ExportView, FunnelView, TimeInStageView, TimeseriesView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -15,12 +17,36 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('fetch_meta_leads/', FetchMetaLeadsView.as_view(), name='fetch_meta_leads'),
+    path('webhooks/meta/leadgen/', MetaLeadgenWebhookView.as_view(), name='meta_leadgen_webhook'),
     path('upload_leads_csv/', UploadLeadsCSVView.as_view(), name='upload_leads_csv'),
     path('leads/', LeadsListView.as_view(), name='leads_list'),
+    path('leads/claim_next/', ClaimNextLeadsView.as_view(), name='leads_claim_next'),
+    path('leads/<int:pk>/', LeadDetailView.as_view(), name='lead_detail'),
     path('leads/<int:pk>/set_status/', LeadSetStatusView.as_view(), name='lead_set_status'),
     path('leads/<int:pk>/indicator_upload/', LeadIndicatorUploadView.as_view(), name='lead_indicator_upload'),
     path('leads/<int:pk>/followups/', FollowUpCreateView.as_view(), name='lead_followups_create'),
     path('followups/', FollowUpListView.as_view(), name='followups_list'),
-    path('account_openings/', AccountOpeningCreateView.as_view(), name='account_openings'),
+    path('account_openings/', AccountOpeningListCreateView.as_view(), name='account_openings'),
+    path('account_openings/summary/', AccountOpeningSummaryView.as_view(), name='account_openings_summary'),
+    path('export/<str:model>/', ExportView.as_view(), name='export'),
+    path('analytics/funnel/', FunnelView.as_view(), name='analytics_funnel'),
+    path('analytics/timeseries/', TimeseriesView.as_view(), name='analytics_timeseries'),
+    path('analytics/time_in_stage/', TimeInStageView.as_view(), name='analytics_time_in_stage'),
+    path('batch/', BatchView.as_view(), name='batch'),
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncAttendanceTodayView, AsyncBatchView, AsyncEventStreamView, AsyncFetchMetaLeadsView, AsyncFollowUpListView, AsyncLeadsListView, AsyncMeView
+
+    # Matched before the sync views and the router's users/me and attendance/today actions.
+    urlpatterns = [
+        path('users/me/', AsyncMeView.as_view(), name='user-me'),
+        path('attendance/today/', AsyncAttendanceTodayView.as_view(), name='attendance-today'),
+        path('fetch_meta_leads/', AsyncFetchMetaLeadsView.as_view(), name='fetch_meta_leads'),
+        path('leads/', AsyncLeadsListView.as_view(), name='leads_list'),
+        path('followups/', AsyncFollowUpListView.as_view(), name='followups_list'),
+        # push events stream for as long as the client stays, which only ASGI can serve
+        path('events/', AsyncEventStreamView.as_view(), name='events'),
+        path('batch/', AsyncBatchView.as_view(), name='batch'),
+    ] + urlpatterns
@@ -1,23 +1,44 @@
 from rest_framework import viewsets, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.views.generic import View
-from django.http import FileResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from django.conf import settings
 from django.urls import path
 from django.utils import timezone
-from datetime import datetime
-import os
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, Sum
+from django.db.models.functions import Lower
+from datetime import date, timedelta
+from decimal import Decimal
+import hmac
+import json
 import requests
 import logging
 from .models import User, Attendance, Task
+from .authentication import user_cache
+from .days import on_days
+from .pagination import AlwaysPageNumberPagination, OptionalPageNumberPagination
+from .replicas import ReplicaReadsMixin, read_alias
+from .sparse_fields import SparseFieldsMixin
+from .export import async_chunks, serves_async, stream_csv, stream_ndjson
+from .static import accepts_encoding, static_files, static_response
+from .media import media_response
+from .metrics import ATTENDANCE_MARKS, LEADS_IMPORTED, LOGINS, META_WEBHOOK_LEADS
+from .uploads import release_stored_file, store_upload
+from .meta_leads import MetaLeadImporter, graph_url, meta_config
 from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, AttendanceSerializer, TaskSerializer
 from rest_framework import permissions
-from .models import Lead, AccountOpening, PaymentProof, FollowUp
+from .models import Lead, AccountOpening, PaymentProof, FollowUp, DailySalesRollup, LeadStatusEvent
+from . import analytics, batch, lead_queue, meta_webhook, push, rollups, status_events
 from .serializers import LeadSerializer, AccountOpeningSerializer, PaymentProofSerializer
-from .serializers import FollowUpSerializer
+from .serializers import FollowUpSerializer, LeadDetailSerializer, display_name, money
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -35,14 +56,28 @@ class IsStaffUser(permissions.BasePermission):
         return bool(request.user and (request.user.is_staff or getattr(request.user, 'user_type', None) == 'staff'))
 
 
+def can_see_all_leads(user):
+    return bool(user.is_superuser or getattr(user, 'user_type', None) == 'admin' or user.is_staff)
+
+
+def visible_leads(user):
+    """Leads the user may see: everything for admins/staff, otherwise their own."""
+    if can_see_all_leads(user):
+        return Lead.objects.all()
+    return Lead.objects.filter(assigned_to=user)
+
+
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
     permission_classes = [AllowAny]
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        if not serializer.is_valid():
+            LOGINS.labels(result='failure').inc()
+            raise ValidationError(serializer.errors)
         user = serializer.validated_data['user']
+        LOGINS.labels(result='success').inc()
 
         # Mark attendance on login
         local_now = timezone.localtime(timezone.now())
@@ -57,6 +92,8 @@ class LoginView(generics.GenericAPIView):
                 'status': 'present'
             }
         )
+        if created:
+            ATTENDANCE_MARKS.labels(action='check_in', via='login').inc()
 
         refresh = RefreshToken.for_user(user)
 
@@ -109,10 +146,46 @@ class RegisterView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadsMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalPageNumberPagination
+    replica_actions = {'list'}
+    ordering_fields = ('id', 'username', 'email', 'first_name', 'last_name', 'user_type', 'date_joined', 'created_at')
+
+    def get_queryset(self):
+        qs = User.objects.all()
+        if self.action != 'list':
+            return qs
+
+        params = self.request.query_params
+        user_types = [t for t in params.get('user_type', '').split(',') if t]
+        if user_types:
+            qs = qs.filter(user_type__in=user_types)
+
+        is_active = params.get('is_active')
+        if is_active is not None:
+            qs = qs.filter(is_active=is_active.lower() in ('1', 'true', 'yes'))
+
+        q = (params.get('q') or '').strip().lower()
+        if q:
+            # Prefix match on lower(column) so PostgreSQL can use the
+            # lower(...) text_pattern_ops indexes from migration 0010.
+            qs = qs.alias(
+                username_lower=Lower('username'),
+                email_lower=Lower('email'),
+                first_name_lower=Lower('first_name'),
+                last_name_lower=Lower('last_name'),
+            ).filter(
+                Q(username_lower__startswith=q)
+                | Q(email_lower__startswith=q)
+                | Q(first_name_lower__startswith=q)
+                | Q(last_name_lower__startswith=q)
+            )
+
+        ordering = [o for o in params.get('ordering', '').split(',') if o.lstrip('-') in self.ordering_fields]
+        return qs.order_by(*(ordering or ['id']))
 
     @action(detail=False, methods=['get'])
     def me(self, request):
@@ -129,6 +202,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
         user.user_type = target_role
         user.save()
+        user_cache.invalidate(user.pk)
 
         return Response({
             'success': True,
@@ -137,11 +211,12 @@ class UserViewSet(viewsets.ModelViewSet):
         })
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ReplicaReadsMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """ViewSet for managing attendance records"""
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
+    replica_actions = {'list', 'user_attendance', 'active_users'}
 
     def get_queryset(self):
         """Filter attendance based on user type"""
@@ -177,6 +252,8 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 'status': 'present'
             }
         )
+        if created:
+            ATTENDANCE_MARKS.labels(action='check_in', via='manual').inc()
 
         serializer = self.get_serializer(attendance)
         return Response({
@@ -198,6 +275,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             attendance = Attendance.objects.get(user=user, date=today)
             attendance.time_out = current_time
             attendance.save()
+            ATTENDANCE_MARKS.labels(action='check_out', via='manual').inc()
 
             serializer = self.get_serializer(attendance)
             return Response({
@@ -305,11 +383,12 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class AdminTaskViewSet(viewsets.ModelViewSet):
+class AdminTaskViewSet(ReplicaReadsMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """Admin Task endpoints exposed on main API for frontend compatibility"""
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    replica_actions = {'list'}
 
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
@@ -362,71 +441,32 @@ class StaffTaskViewSet(viewsets.ModelViewSet):
 
 class SPAView(View):
     """View to serve React SPA frontend"""
-    
+
     def get(self, request, *args, **kwargs):
-        index_path = os.path.join(settings.BASE_DIR, 'static', 'index.html')
-        if os.path.exists(index_path):
-            return FileResponse(open(index_path, 'rb'), content_type='text/html')
-        else:
-            return Response({'error': 'Frontend not found'}, status=404)
+        index = static_files.get('index.html')
+        if not index:
+            return JsonResponse({'error': 'Frontend not found'}, status=404)
+        return static_response(request, index)
 
 
 class FetchMetaLeadsView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def post(self, request):
-        logger = logging.getLogger(__name__)
-
-        # Prefer explicit FACEBOOK_* settings (used by lead.py); fall back to FB_* names
-        fb_app_id = getattr(settings, 'FACEBOOK_APP_ID', None) or os.getenv('FACEBOOK_APP_ID')
-        fb_app_secret = getattr(settings, 'FACEBOOK_APP_SECRET', None) or os.getenv('FACEBOOK_APP_SECRET')
-        access_token = (
-            getattr(settings, 'FACEBOOK_ACCESS_TOKEN', None)
-            or getattr(settings, 'FB_ACCESS_TOKEN', None)
-            or os.getenv('FACEBOOK_ACCESS_TOKEN')
-            or os.getenv('FB_ACCESS_TOKEN')
-        )
-
-        # Support either a single FACEBOOK_PAGE_ID or comma-separated FB_PAGE_IDS
-        page_ids_setting = (
-            getattr(settings, 'FACEBOOK_PAGE_ID', None)
-            or getattr(settings, 'FB_PAGE_IDS', None)
-            or os.getenv('FACEBOOK_PAGE_ID')
-            or os.getenv('FB_PAGE_IDS')
-        )
-
-        api_version = (
-            getattr(settings, 'FB_API_VERSION', None)
-            or getattr(settings, 'FACEBOOK_API_VERSION', None)
-            or os.getenv('FB_API_VERSION')
-            or os.getenv('FACEBOOK_API_VERSION')
-            or '14.0'
-        )
-
-        if not access_token or not page_ids_setting:
+        config = meta_config()
+        if config is None:
             return Response({'error': 'Facebook credentials (access token and page id(s)) must be configured in settings'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Normalize to list of page ids
-        page_ids_str = str(page_ids_setting)
-        if ',' in page_ids_str:
-            page_list = [p.strip() for p in page_ids_str.split(',') if p.strip()]
-        else:
-            page_list = [page_ids_str.strip()]
+        access_token, page_list, api_version = config
 
         created = 0
         skipped = 0
         errors = []
-
         # prepare sales pool for optional assignment of fetched leads
-        sales_qs = User.objects.filter(user_type='sales', is_active=True)
-        sales_list = list(sales_qs)
-        sales_count = len(sales_list)
-        rr_index = 0
+        importer = MetaLeadImporter()
 
         for page_id in page_list:
             try:
-                forms_url = f"https://graph.facebook.com/v{api_version}/{page_id}/leadgen_forms?access_token={access_token}"
-                resp = requests.get(forms_url, timeout=20)
+                resp = requests.get(graph_url(api_version, page_id, 'leadgen_forms', access_token), timeout=20)
                 resp.raise_for_status()
                 forms_data = resp.json().get('data', [])
 
@@ -436,97 +476,19 @@ class FetchMetaLeadsView(APIView):
                         continue
 
                     # fetch leads for this form
-                    leads_url = f"https://graph.facebook.com/v{api_version}/{form_id}/leads?access_token={access_token}"
-                    lresp = requests.get(leads_url, timeout=20)
+                    lresp = requests.get(graph_url(api_version, form_id, 'leads', access_token), timeout=20)
                     lresp.raise_for_status()
-                    leads_data = lresp.json().get('data', [])
-
-                    for lead in leads_data:
-                        external_id = lead.get('id')
-                        created_time = lead.get('created_time')
-                        field_data = lead.get('field_data') or []
-
-                        # parse fields flexibly
-                        lead_info = {
-                            'name': None,
-                            'email': None,
-                            'phone': None,
-                            'city': None,
-                            'source': 'facebook',
-                        }
-
-                        # field_data can be list of dicts with 'name' and 'values' or 'values' list
-                        for item in field_data:
-                            # support both {'name': 'email', 'values': ['a@b.com']} and {'name': 'email', 'values': [{'value':'a@b.com'}]}
-                            key = item.get('name') or item.get('field') or None
-                            values = item.get('values') or item.get('value') or []
-                            if isinstance(values, list) and values:
-                                # try to extract string
-                                val = None
-                                first = values[0]
-                                if isinstance(first, dict):
-                                    val = first.get('value') or first.get('name')
-                                else:
-                                    val = first
-                            elif isinstance(values, dict):
-                                val = values.get('value') or values.get('name')
-                            else:
-                                val = values
-
-                            if not key or val is None:
-                                continue
-
-                            k = key.lower()
-                            v = str(val).strip()
-                            if 'email' in k:
-                                lead_info['email'] = v
-                            elif 'phone' in k or 'mobile' in k:
-                                lead_info['phone'] = v
-                            elif 'name' in k:
-                                lead_info['name'] = v
-                            elif 'city' in k or 'town' in k:
-                                lead_info['city'] = v
-                            else:
-                                # unknown fields go into raw_data below
-                                pass
-
-                        # dedupe by external_id first, then email/phone
-                        if external_id and Lead.objects.filter(external_id=external_id).exists():
-                            skipped += 1
-                            continue
-
-                        email = lead_info.get('email')
-                        phone = lead_info.get('phone')
-                        if (email and Lead.objects.filter(email__iexact=email).exists()) or (phone and Lead.objects.filter(phone=phone).exists()):
-                            skipped += 1
-                            continue
-
-                        # create lead record and optionally assign to a sales user (round-robin)
-                        try:
-                            assigned = None
-                            if sales_count > 0:
-                                assigned = sales_list[rr_index % sales_count]
-                                rr_index += 1
-
-                            lead_obj = Lead.objects.create(
-                                name=lead_info.get('name'),
-                                email=lead_info.get('email'),
-                                phone=lead_info.get('phone'),
-                                city=lead_info.get('city'),
-                                source='facebook',
-                                external_id=external_id,
-                                form_id=form_id,
-                                raw_data=lead,
-                                assigned_to=assigned,
-                                created_at=created_time if created_time else timezone.now()
-                            )
-                            created += 1
-                        except Exception as e:
-                            logger.exception('Error creating lead')
-                            errors.append(str(e))
+
+                    form_created, form_skipped, form_errors = importer.import_batch(lresp.json().get('data', []), form_id)
+                    created += form_created
+                    skipped += form_skipped
+                    errors.extend(form_errors)
             except Exception as e:
                 errors.append(f"page {page_id}: {str(e)}")
 
+        LEADS_IMPORTED.labels(source='meta', result='created').inc(created)
+        LEADS_IMPORTED.labels(source='meta', result='skipped').inc(skipped)
+        LEADS_IMPORTED.labels(source='meta', result='error').inc(len(errors))
         return Response({
             'success': True,
             'created': created,
@@ -535,6 +497,50 @@ class FetchMetaLeadsView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class BatchView(APIView):
+    """``POST /api/batch/``: several API calls in one round trip (see api.batch)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        entries = batch.parse(request.data)
+        return batch.response(batch.execute(request, entries))
+
+
+class MetaLeadgenWebhookView(APIView):
+    """Meta's Lead Ads webhook (see api.meta_webhook).
+
+    ``GET`` answers Meta's subscription check; ``POST`` queues the leads of a
+    signed notification for ``manage.py consume_meta_leads`` and returns
+    straight away. Meta signs instead of authenticating, so no credentials
+    are read.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        token = settings.META_WEBHOOK_VERIFY_TOKEN
+        params = request.query_params
+        if token and params.get('hub.mode') == 'subscribe' and hmac.compare_digest(params.get('hub.verify_token', ''), token):
+            return HttpResponse(params.get('hub.challenge', ''), content_type='text/plain')
+        return Response({'error': 'Invalid verify token'}, status=status.HTTP_403_FORBIDDEN)
+
+    def post(self, request):
+        # the signature covers the raw bytes, so the body isn't parsed by DRF
+        body = request.body
+        if not meta_webhook.valid_signature(body, request.headers.get('X-Hub-Signature-256')):
+            META_WEBHOOK_LEADS.labels(result='rejected').inc()
+            return Response({'error': 'Invalid signature'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return Response({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = meta_webhook.leadgen_changes(payload)
+        meta_webhook.enqueue(changes)
+        META_WEBHOOK_LEADS.labels(result='queued').inc(len(changes))
+        return Response({'queued': len(changes)}, status=status.HTTP_200_OK)
+
+
 class UploadLeadsCSVView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     parser_classes = [MultiPartParser, FormParser]
@@ -557,72 +563,89 @@ class UploadLeadsCSVView(APIView):
         skipped = 0
         errors = []
 
-        # gather active sales users for round-robin assignment
+        # gather active sales users for round-robin assignment; in pull mode the leads wait in the claim queue
         sales_qs = User.objects.filter(user_type='sales', is_active=True)
-        sales_list = list(sales_qs)
+        sales_list = [] if lead_queue.pull_mode() else list(sales_qs)
         sales_count = len(sales_list)
         rr_index = 0
 
-        for i, row in enumerate(reader):
-            try:
-                # normalize keys to lower-case
-                row_lc = {k.strip().lower(): (v.strip() if v is not None else '') for k, v in row.items()}
-
-                # ensure at least one identifier
-                email = row_lc.get('email') or row_lc.get('mail-id') or row_lc.get('mail')
-                phone = row_lc.get('phone') or row_lc.get('number') or row_lc.get('mobile')
-                name = row_lc.get('name') or ''
-                city = row_lc.get('city') or ''
-
-                # dedupe by external_id not available for CSV; use email/phone
-                if email and Lead.objects.filter(email__iexact=email).exists():
-                    skipped += 1
-                    continue
-                if phone and Lead.objects.filter(phone=phone).exists():
-                    skipped += 1
-                    continue
-
-                assigned = None
-                if sales_count > 0:
-                    assigned = sales_list[rr_index % sales_count]
-                    rr_index += 1
-
-                lead = Lead.objects.create(
-                    name=name or None,
-                    email=email or None,
-                    phone=phone or None,
-                    city=city or None,
-                    source='csv',
-                    assigned_to=assigned
-                )
-                created += 1
-            except Exception as e:
-                logger.exception('Error creating lead from CSV')
-                errors.append({'row': i+1, 'error': str(e)})
+        # one bulk insert of status events per batch of leads, one push event per rep
+        with status_events.batch(), push.batch():
+            for i, row in enumerate(reader):
+                try:
+                    # normalize keys to lower-case
+                    row_lc = {k.strip().lower(): (v.strip() if v is not None else '') for k, v in row.items()}
+
+                    # ensure at least one identifier
+                    email = row_lc.get('email') or row_lc.get('mail-id') or row_lc.get('mail')
+                    phone = row_lc.get('phone') or row_lc.get('number') or row_lc.get('mobile')
+                    name = row_lc.get('name') or ''
+                    city = row_lc.get('city') or ''
+
+                    # dedupe by external_id not available for CSV; use email/phone
+                    if email and Lead.objects.filter(email__iexact=email).exists():
+                        skipped += 1
+                        continue
+                    if phone and Lead.objects.filter(phone=phone).exists():
+                        skipped += 1
+                        continue
 
+                    assigned = None
+                    if sales_count > 0:
+                        assigned = sales_list[rr_index % sales_count]
+                        rr_index += 1
+
+                    lead = Lead.objects.create(
+                        name=name or None,
+                        email=email or None,
+                        phone=phone or None,
+                        city=city or None,
+                        source='csv',
+                        assigned_to=assigned
+                    )
+                    created += 1
+                except Exception as e:
+                    logger.exception('Error creating lead from CSV')
+                    errors.append({'row': i+1, 'error': str(e)})
+
+        LEADS_IMPORTED.labels(source='csv', result='created').inc(created)
+        LEADS_IMPORTED.labels(source='csv', result='skipped').inc(skipped)
+        LEADS_IMPORTED.labels(source='csv', result='error').inc(len(errors))
         return Response({'success': True, 'created': created, 'skipped': skipped, 'errors': errors}, status=status.HTTP_200_OK)
 
 
-class LeadsListView(APIView):
+class LeadsListView(ReplicaReadsMixin, SparseFieldsMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
         try:
-            if user.is_superuser or getattr(user, 'user_type', None) == 'admin' or user.is_staff:
-                qs = Lead.objects.all()
-            else:
-                # sales users see leads assigned to them
-                qs = Lead.objects.filter(assigned_to=user)
-
-            qs = qs.order_by('-created_at')
-            serializer = LeadSerializer(qs, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # admins/staff see everything, sales users see leads assigned to them
+            qs = visible_leads(request.user).order_by('-created_at')
+            return self.list_response(qs, LeadSerializer)
+        except ValidationError:
+            raise
         except Exception as e:
             logging.exception('Error listing leads')
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class LeadDetailView(ReplicaReadsMixin, APIView):
+    """A lead with everything the sales UI shows next to it, in a fixed number of queries."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk=None):
+        qs = visible_leads(request.user).select_related('assigned_to').prefetch_related(
+            Prefetch('followups', queryset=FollowUp.objects.select_related('created_by').order_by('-scheduled_date', '-created_at')),
+            Prefetch('account_openings', queryset=AccountOpening.objects.select_related('created_by').order_by('-created_at')),
+            Prefetch('payment_proofs', queryset=PaymentProof.objects.select_related('uploaded_by', 'stored_file').order_by('-created_at')),
+            Prefetch('status_events', queryset=LeadStatusEvent.objects.select_related('changed_by').order_by('at', 'id')),
+        )
+        lead = qs.filter(id=pk).first()
+        if lead is None:
+            return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(LeadDetailSerializer(lead, context={'request': request}).data)
+
+
 class LeadSetStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -631,21 +654,59 @@ class LeadSetStatusView(APIView):
         if not status_value:
             return Response({'error': 'status is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            lead = Lead.objects.get(id=pk)
-        except Lead.DoesNotExist:
-            return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
-
         # validate status choice
         valid = [c[0] for c in Lead.STATUS_CHOICES]
         if status_value not in valid:
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
 
-        lead.status = status_value
-        lead.save()
+        # locked, so a concurrent claim of the lead isn't overwritten by this save
+        with transaction.atomic():
+            try:
+                lead = Lead.objects.select_for_update().get(id=pk)
+            except Lead.DoesNotExist:
+                return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            lead.status = status_value
+            if status_value != 'new':
+                # worked on, so a claimed lead stays with its rep
+                lead.claim_expires_at = None
+            lead.status_changed_by = request.user
+            lead.save()
         return Response(LeadSerializer(lead).data, status=status.HTTP_200_OK)
 
 
+class ClaimNextLeadsView(APIView):
+    """Claim the ``?n=`` oldest queued leads (default 1), optionally of one ``?source=``.
+
+    Sales users only. The leads are assigned to the caller until
+    ``expires_at``; any still new by then go back to the queue.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if getattr(request.user, 'user_type', None) != 'sales':
+            return Response({'error': 'Only sales users can claim leads'}, status=status.HTTP_403_FORBIDDEN)
+        body = request.data
+        if not isinstance(body, dict):
+            return Response({'error': 'The body must be a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
+        n = request.query_params.get('n', body.get('n', 1))
+        if isinstance(n, str) and n.strip().lstrip('-').isdigit():
+            n = int(n)
+        if not isinstance(n, int) or isinstance(n, bool):
+            return Response({'error': 'n must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= n <= settings.LEAD_CLAIM_MAX:
+            return Response({'error': f'n must be between 1 and {settings.LEAD_CLAIM_MAX}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        source = request.query_params.get('source') or body.get('source')
+        if source is not None and not isinstance(source, str):
+            return Response({'error': 'source must be a string'}, status=status.HTTP_400_BAD_REQUEST)
+        leads, expires = lead_queue.claim(request.user, n, source=source)
+        return Response({
+            'claimed': LeadSerializer(leads, many=True).data,
+            'expires_at': expires.isoformat(),
+        }, status=status.HTTP_200_OK)
+
+
 class LeadIndicatorUploadView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
@@ -663,16 +724,22 @@ class LeadIndicatorUploadView(APIView):
         if not file_obj:
             return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+        stored = None
         try:
+            # identical uploads share one blob; thumbnailing runs after commit
+            stored = store_upload(file_obj)
             obj = PaymentProof.objects.create(
                 lead=lead,
                 uploaded_by=request.user if request.user.is_authenticated else None,
-                file=file_obj,
+                file=stored.file.name,
+                stored_file=stored,
                 notes=notes
             )
             return Response(PaymentProofSerializer(obj).data, status=status.HTTP_201_CREATED)
         except Exception as e:
             logging.exception('Error saving payment proof')
+            if stored is not None:
+                release_stored_file(stored.pk)
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -709,21 +776,63 @@ class FollowUpCreateView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class FollowUpListView(APIView):
+class FollowUpListView(ReplicaReadsMixin, SparseFieldsMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         try:
             qs = FollowUp.objects.all().order_by('-scheduled_date')
-            serializer = FollowUpSerializer(qs, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return self.list_response(qs, FollowUpSerializer)
+        except ValidationError:
+            raise
         except Exception as e:
             logging.exception('Error listing followups')
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class AccountOpeningCreateView(APIView):
+def visible_account_openings(user):
+    """Openings the user may see: everything for admins/staff, otherwise those they made or on their leads."""
+    qs = AccountOpening.objects.all()
+    if not can_see_all_leads(user):
+        qs = qs.filter(Q(created_by=user) | Q(lead__assigned_to=user))
+    return qs
+
+
+def filter_account_openings(qs, params):
+    """Apply ``?created_by=&from=&to=&source=``; ValueError if invalid.
+
+    ``from``/``to`` are inclusive ISO dates in ``TIME_ZONE``, either may be left out.
+    """
+    if params.get('created_by'):
+        try:
+            qs = qs.filter(created_by=int(params['created_by']))
+        except ValueError:
+            raise ValueError('created_by must be a user id')
+    try:
+        start = date.fromisoformat(params['from']) if params.get('from') else None
+        end = date.fromisoformat(params['to']) if params.get('to') else None
+    except ValueError:
+        raise ValueError('from and to must be dates (YYYY-MM-DD)')
+    if start and end and start > end:
+        raise ValueError('from must not be after to')
+    qs = on_days(qs, 'created_at', start, end)
+    if params.get('source'):
+        qs = qs.filter(lead__source=params['source'])
+    return qs
+
+
+class AccountOpeningListCreateView(ReplicaReadsMixin, SparseFieldsMixin, generics.GenericAPIView):
+    """List account openings (``?created_by=&from=&to=&source=``, paginated) or record one."""
     permission_classes = [IsAuthenticated]
+    pagination_class = AlwaysPageNumberPagination
+
+    def get(self, request):
+        try:
+            qs = filter_account_openings(visible_account_openings(request.user), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        qs = qs.select_related('lead', 'created_by').order_by('-created_at', '-id')
+        return self.list_response(qs, AccountOpeningSerializer)
 
     def post(self, request):
         user = request.user
@@ -754,3 +863,246 @@ class AccountOpeningCreateView(APIView):
         except Exception as e:
             logging.exception('Error creating account opening')
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+
+class AccountOpeningSummaryView(ReplicaReadsMixin, APIView):
+    """Deposit total, count and average of the openings ``AccountOpeningListCreateView`` would list, and the top reps.
+
+    Sums come from the database as Decimals and the average is divided
+    in Python, so amounts are exact to the cent. ``?top=`` sets how many
+    reps are ranked by deposits (default 5, at most 100).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            qs = filter_account_openings(visible_account_openings(request.user), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top = max(min(int(request.query_params.get('top', 5)), 100), 0)
+        except ValueError:
+            return Response({'error': 'top must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        qs = qs.order_by()
+        totals = qs.aggregate(deposits=Sum('deposit_amount', default=Decimal('0')), count=Count('id'))
+        reps = qs.filter(created_by__isnull=False).values(
+            'created_by', 'created_by__username', 'created_by__first_name', 'created_by__last_name',
+        ).annotate(deposits=Sum('deposit_amount'), count=Count('id')).order_by('-deposits', 'created_by')[:top]
+        return Response({
+            'count': totals['count'],
+            'deposits': money(totals['deposits']),
+            'average_deposit': money(totals['deposits'] / totals['count']) if totals['count'] else None,
+            'top_reps': [
+                {
+                    'created_by': rep['created_by'],
+                    'name': f"{rep['created_by__first_name']} {rep['created_by__last_name']}".strip() or rep['created_by__username'],
+                    'count': rep['count'],
+                    'deposits': money(rep['deposits']),
+                }
+                for rep in reps
+            ],
+        })
+
+
+class ExportView(ReplicaReadsMixin, SparseFieldsMixin, APIView):
+    """Stream leads, tasks or account openings as CSV or NDJSON.
+
+    Account openings take the filters of ``AccountOpeningListCreateView``.
+
+    Rows are read through a server-side cursor and written out in chunks,
+    so memory stays flat regardless of table size (under ASGI too, where the
+    chunks are produced by ``async_chunks``). Clients that send
+    ``Accept-Encoding: gzip`` get the stream compressed on the fly.
+    """
+    permission_classes = [IsAuthenticated]
+    formats = {
+        'csv': ('text/csv', stream_csv),
+        'ndjson': ('application/x-ndjson', stream_ndjson),
+    }
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= picks the export format, not a DRF renderer
+        return super().perform_content_negotiation(request, force=True)
+
+    def get_export(self, model, user):
+        if model == 'leads':
+            return visible_leads(user).order_by('-created_at'), LeadSerializer
+        if model == 'tasks':
+            qs = Task.objects.all()
+            if not IsAdminUser().has_permission(self.request, self):
+                qs = qs.filter(assigned_to=user)
+            return qs.order_by('id'), TaskSerializer
+        if model == 'account_openings':
+            # the same ?created_by=&from=&to=&source= as the list
+            qs = filter_account_openings(visible_account_openings(user), self.request.query_params)
+            return qs.select_related('lead', 'created_by').order_by('-created_at'), AccountOpeningSerializer
+        return None, None
+
+    def get(self, request, model=None):
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in self.formats:
+            return Response({'error': 'format must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            qs, serializer_class = self.get_export(model, request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if qs is None:
+            return Response({'error': f'Unknown export: {model}'}, status=status.HTTP_404_NOT_FOUND)
+
+        # the rows are read while the response streams, after the request's routing is gone
+        qs = qs.using(read_alias())
+        fields = self.get_requested_fields(serializer_class)
+        content_type, stream = self.formats[export_format]
+        content = stream(qs, serializer_class, fields)
+        gzipped = accepts_encoding(request, 'gzip') and request.query_params.get('gzip') != '0'
+        if gzipped:
+            content = compress_sequence(content)
+
+        if serves_async(request):
+            content = async_chunks(content)
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        filename = f"{model}-{timezone.localdate():%Y%m%d}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+def date_range(params, days=30):
+    """Inclusive ``?from=&to=`` ISO dates, by default the ``days`` up to today; ValueError if invalid."""
+    try:
+        end = date.fromisoformat(params['to']) if params.get('to') else timezone.localdate()
+        start = date.fromisoformat(params['from']) if params.get('from') else end - timedelta(days=days - 1)
+    except ValueError:
+        raise ValueError('from and to must be dates (YYYY-MM-DD)')
+    if start > end:
+        raise ValueError('from must not be after to')
+    return start, end
+
+
+def add_sales_user_names(rows):
+    """Set ``sales_user_name`` on report rows grouped by ``sales_user``, with one query for all of them."""
+    users = User.objects.filter(id__in={row['sales_user'] for row in rows}).values_list('id', 'first_name', 'last_name', 'username')
+    names = {pk: display_name(first, last, username) for pk, first, last, username in users}
+    for row in rows:
+        row['sales_user_name'] = names.get(row['sales_user'])
+
+
+class FunnelView(ReplicaReadsMixin, APIView):
+    """Sales funnel and revenue totals from the daily rollups.
+
+    ``?from=&to=`` are inclusive ISO dates (default: the last 30 days);
+    ``group_by`` is a comma list of day|week|month, sales_user and source.
+    Sales users only see their own numbers.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            start, end = date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_by = [key for key in request.query_params.get('group_by', '').split(',') if key]
+        unknown = [key for key in group_by if key not in rollups.GROUPS]
+        if unknown:
+            return Response({'error': f"Unknown group_by: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rollups.PERIODS.keys() & set(group_by)) > 1:
+            return Response({'error': 'group_by takes one of day, week or month'}, status=status.HTTP_400_BAD_REQUEST)
+        group_by = list(dict.fromkeys(group_by))
+
+        qs = DailySalesRollup.objects.filter(day__range=(start, end))
+        if not can_see_all_leads(request.user):
+            qs = qs.filter(sales_user=request.user)
+        rows, totals = rollups.summarize(qs, group_by)
+        if 'sales_user' in group_by:
+            add_sales_user_names(rows)
+        return Response({'from': start.isoformat(), 'to': end.isoformat(), 'group_by': group_by, 'results': rows, 'totals': totals})
+
+
+class TimeseriesView(ReplicaReadsMixin, APIView):
+    """Leads created, tasks completed, attendance or deposits per day, week or month.
+
+    ``?metric=&bucket=day|week|month&from=&to=&team=``; ``team`` is a user
+    type (sales, staff, ...) and narrows the rows to its members. Buckets are
+    calendar days in ``TIME_ZONE``, weeks start on Monday.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        metric = request.query_params.get('metric')
+        if metric not in analytics.METRICS:
+            return Response({'error': f"metric must be one of {', '.join(analytics.METRICS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in analytics.TRUNCS:
+            return Response({'error': 'bucket must be day, week or month'}, status=status.HTTP_400_BAD_REQUEST)
+        team = request.query_params.get('team') or None
+        if team is not None and team not in dict(User.USER_TYPE_CHOICES):
+            return Response({'error': f'Unknown team: {team}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = date_range(request.query_params, days=90)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = analytics.series(metric, bucket, start, end, team)
+        return Response({
+            'metric': metric, 'bucket': bucket, 'from': start.isoformat(), 'to': end.isoformat(),
+            'team': team, 'results': results,
+        })
+
+
+class TimeInStageView(ReplicaReadsMixin, APIView):
+    """p50/p90 time leads spend in each status, per sales rep and/or source.
+
+    ``?from=&to=`` limit the stays to those that began on those days (default:
+    the last 90); ``group_by`` is sales_user, source or both. Sales users only
+    see their own leads.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            start, end = date_range(request.query_params, days=90)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        group_by = list(dict.fromkeys(key for key in request.query_params.get('group_by', 'sales_user').split(',') if key))
+        unknown = [key for key in group_by if key not in status_events.GROUPS]
+        if unknown:
+            return Response({'error': f"Unknown group_by: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        sales_user = None if can_see_all_leads(request.user) else request.user.id
+        # one pass over every event in the range; the distributions barely move within the TTL
+        rows = cache.get_or_set(
+            f"analytics:time_in_stage:{start.isoformat()}:{end.isoformat()}:{','.join(group_by)}:{sales_user or ''}",
+            lambda: status_events.time_in_stage(start, end, group_by, sales_user=sales_user, using=read_alias()),
+            settings.ANALYTICS_CACHE_TTL,
+        )
+        if 'sales_user' in group_by:
+            add_sales_user_names(rows)
+        return Response({'from': start.isoformat(), 'to': end.isoformat(), 'group_by': group_by, 'results': rows})
+
+
+class PaymentProofMediaView(APIView):
+    """Serve uploaded payment proofs to users who can see the proof's lead."""
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # the payload is a file, the JSON renderer only matters for errors
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, name=None):
+        proofs = PaymentProof.objects.filter(Q(file=name) | Q(stored_file__thumbnail=name))
+        if not can_see_all_leads(request.user):
+            proofs = proofs.filter(lead__assigned_to=request.user)
+        if not proofs.exists():
+            return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return media_response(request, name)
+        except FileNotFoundError:
+            return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -3,5 +3,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Serve the async views. Every ASGI request gets its own connection object, so
+# persistent connections would only pile up; use DB_POOL=1 to reuse them.
+os.environ.setdefault('ASYNC_VIEWS', 'true')
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# Load the built SPA into memory before the first request.
+from api.static import static_files  # noqa: E402
+
+static_files.load()
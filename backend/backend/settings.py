@@ -1,6 +1,6 @@
 import os
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -23,6 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.middleware.PerformanceMiddleware',
+    'api.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -61,9 +64,48 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='Vtindex@123'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Reuse connections across requests instead of reconnecting each time;
+        # health checks replace a connection the server has dropped.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {},
     }
 }
 
+# Optional per-process psycopg 3 pool, shared by all threads of a worker. Size
+# it so that workers x DB_POOL_MAX_SIZE stays below the server's max_connections.
+if config('DB_POOL', default=False, cast=bool):
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # the pool owns connection lifetime
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+    }
+
+# Read replicas for the list, report and export endpoints (see api.replicas):
+# comma-separated host[:port][/name], connecting with the DB_* credentials and
+# connection settings. Replicas more than DB_REPLICA_MAX_LAG seconds behind are
+# skipped, and clients that just wrote read from the primary for
+# DB_REPLICA_PIN_SECONDS.
+REPLICA_DATABASES = []
+for _index, _replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), 1):
+    _address, _, _name = _replica.partition('/')
+    _host, _, _port = _address.partition(':')
+    REPLICA_DATABASES.append(f'replica{_index}')
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host or DATABASES['default']['HOST'],
+        'PORT': _port or DATABASES['default']['PORT'],
+        'NAME': _name or DATABASES['default']['NAME'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter'] if REPLICA_DATABASES else []
+DB_REPLICA_MAX_LAG = config('DB_REPLICA_MAX_LAG', default=5, cast=float)
+DB_REPLICA_CHECK_INTERVAL = config('DB_REPLICA_CHECK_INTERVAL', default=5, cast=float)
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=10, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -84,17 +126,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Hand media transfers to a front proxy after the permission check: set the
+# nginx `internal` location prefix for X-Accel-Redirect, or the header name
+# (e.g. X-Sendfile) for Apache/lighttpd. Empty means Django streams the file.
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+MEDIA_SENDFILE_HEADER = config('MEDIA_SENDFILE_HEADER', default='')
+# Background thumbnailing of payment proofs (see api.uploads); `manage.py
+# process_uploads` picks up anything a restart interrupted.
+UPLOAD_WORKERS = config('UPLOAD_WORKERS', default=2, cast=int)
+UPLOAD_THUMBNAIL_SIZE = config('UPLOAD_THUMBNAIL_SIZE', default=320, cast=int)
 
 AUTH_USER_MODEL = 'api.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -103,6 +163,100 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Per-process cache of the authenticated user (see api.authentication).
+# A TTL of 0 disables it; other workers see role changes after at most TTL seconds.
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=30, cast=int)
+USER_CACHE_MAX_SIZE = config('USER_CACHE_MAX_SIZE', default=1024, cast=int)
+
+# Django cache, used for the analytics time series (see api.analytics). The
+# default is per process, so a write only invalidates the worker that served it
+# and other workers catch up after ANALYTICS_CACHE_TTL; point CACHE_BACKEND and
+# CACHE_LOCATION at a shared cache (e.g. django.core.cache.backends.redis.RedisCache
+# and redis://host:6379) to invalidate everywhere at once.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+if CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    # room for a year of daily buckets per metric, not the default 300 entries
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+ANALYTICS_CACHE_TTL = config('ANALYTICS_CACHE_TTL', default=300, cast=int)
+
+# How imported leads reach the sales reps (see api.lead_queue): 'push' assigns
+# them round-robin, 'pull' leaves them unassigned for /api/leads/claim_next/.
+# A claim lapses back to the queue if the lead is still new after
+# LEAD_CLAIM_LEASE_SECONDS; one call claims at most LEAD_CLAIM_MAX leads.
+LEAD_ASSIGNMENT = config('LEAD_ASSIGNMENT', default='push')
+LEAD_CLAIM_LEASE_SECONDS = config('LEAD_CLAIM_LEASE_SECONDS', default=900, cast=int)
+LEAD_CLAIM_MAX = config('LEAD_CLAIM_MAX', default=20, cast=int)
+
+# Push events at /api/events/ (see api.push; needs the ASGI server). 'postgres'
+# relays them between worker processes with LISTEN/NOTIFY on the default
+# database, 'local' only reaches the streams of the process that wrote (SQLite,
+# a single worker); empty picks by the database. A stream falling more than
+# PUSH_QUEUE_SIZE events behind is told to resync, and idle streams get a
+# keep-alive comment every PUSH_HEARTBEAT seconds.
+PUSH_BACKEND = config('PUSH_BACKEND', default='')
+PUSH_QUEUE_SIZE = config('PUSH_QUEUE_SIZE', default=100, cast=int)
+PUSH_HEARTBEAT = config('PUSH_HEARTBEAT', default=25, cast=float)
+
+# POST /api/batch/ (see api.batch) takes at most BATCH_MAX_REQUESTS entries and
+# runs up to BATCH_CONCURRENCY reads of a batch at once. Under WSGI those run on
+# a per-process pool of that many threads, each keeping a database connection
+# like a request thread does, so count them against max_connections.
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+BATCH_CONCURRENCY = config('BATCH_CONCURRENCY', default=4, cast=int)
+
+# Request instrumentation (see api.middleware.PerformanceMiddleware). A sample
+# rate of 0 disables it; budgets of 0 turn the corresponding warning off.
+PERF_SAMPLE_RATE = config('PERF_SAMPLE_RATE', default=0.0, cast=float)
+PERF_QUERY_BUDGET = config('PERF_QUERY_BUDGET', default=50, cast=int)
+PERF_LATENCY_BUDGET_MS = config('PERF_LATENCY_BUDGET_MS', default=500, cast=int)
+
+# Prometheus metrics at /metrics (see api.metrics). Export PROMETHEUS_MULTIPROC_DIR
+# to an empty directory before starting gunicorn/uvicorn workers so /metrics
+# aggregates all of them. Scrapers send METRICS_TOKEN as a bearer token; without
+# a token /metrics answers 404 unless METRICS_PUBLIC serves it to anyone.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_PUBLIC = config('METRICS_PUBLIC', default=False, cast=bool)
+
+# Async implementations of the hot read endpoints and the Meta fetch (see
+# api.async_views), for running under ASGI; backend.asgi turns them on. Each
+# process allows ASYNC_DB_CONCURRENCY requests into the database at once and
+# answers 503 to requests that waited ASYNC_DB_TIMEOUT seconds for a slot.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+ASYNC_DB_CONCURRENCY = config('ASYNC_DB_CONCURRENCY', default=10, cast=int)
+ASYNC_DB_TIMEOUT = config('ASYNC_DB_TIMEOUT', default=5, cast=float)
+# Graph API requests the async Meta fetch keeps in flight at once.
+META_FETCH_CONCURRENCY = config('META_FETCH_CONCURRENCY', default=8, cast=int)
+META_GRAPH_URL = config('META_GRAPH_URL', default='https://graph.facebook.com')
+
+# Meta Lead Ads webhook at /api/webhooks/meta/leadgen/ (see api.meta_webhook).
+# Notifications are accepted when signed with META_APP_SECRET, and Meta's
+# subscription check when it sends META_WEBHOOK_VERIFY_TOKEN. manage.py
+# consume_meta_leads leases queued leads for META_WEBHOOK_LEASE_SECONDS per
+# fetch; a failed fetch is retried after META_WEBHOOK_RETRY_SECONDS, doubling
+# up to an hour, and the lead given up after META_WEBHOOK_MAX_ATTEMPTS.
+META_APP_SECRET = config('META_APP_SECRET', default='')
+META_WEBHOOK_VERIFY_TOKEN = config('META_WEBHOOK_VERIFY_TOKEN', default='')
+META_WEBHOOK_LEASE_SECONDS = config('META_WEBHOOK_LEASE_SECONDS', default=300, cast=int)
+META_WEBHOOK_RETRY_SECONDS = config('META_WEBHOOK_RETRY_SECONDS', default=60, cast=int)
+META_WEBHOOK_MAX_ATTEMPTS = config('META_WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.perf': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://localhost:8000",
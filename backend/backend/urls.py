@@ -1,20 +1,20 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.conf import settings
-from django.views.static import serve
-import os
-from api.views import SPAView
+from api.metrics import metrics_view
+from api.static import serve_static
+from api.views import SPAView, PaymentProofMediaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view),
 ]
 
-# Serve assets from backend static folder
+# Serve the built frontend from memory (see api.static)
 urlpatterns += [
-    re_path(r'^assets/(?P<path>.*)$', serve, {'document_root': os.path.join(settings.STATIC_ROOT, 'assets')}),
-    re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    re_path(r'^assets/(?P<path>.*)$', serve_static, {'prefix': 'assets/'}),
+    re_path(r'^static/(?P<path>.*)$', serve_static),
+    re_path(r'^media/(?P<name>.*)$', PaymentProofMediaView.as_view()),
 ]
 
 # Catchall for SPA - must be last. Exclude API and static/asset paths to avoid returning
@@ -0,0 +1,285 @@
+"""Sync WSGI (gunicorn gthread) vs ASGI (uvicorn) under many concurrent clients.
+
+    python -m benchmarks.bench_asgi --clients 500 --duration 20
+    BENCH_DB=postgres DB_POOL=1 python -m benchmarks.bench_asgi --clients 500
+
+Needs ``gunicorn`` and ``uvicorn`` installed. A throwaway SQLite database is
+seeded like ``benchmarks.loadtest`` (or the ``DB_*`` PostgreSQL database is
+used with ``BENCH_DB=postgres``), then each server is started with the same
+number of worker processes and driven by ``--clients`` keep-alive
+connections from one asyncio client, each pausing ``--think-ms`` on average
+between requests. Most clients are sales reps cycling
+through the lead list, follow-ups, today's attendance and their profile;
+``--meta-share`` of them are admins calling ``fetch_meta_leads`` against a
+local stand-in for the Graph API that answers after ``--graph-delay-ms``,
+which is what ties up sync worker threads. Throughput, latency percentiles
+and failed requests (including 503s from the async DB limiter) are printed
+per endpoint and server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from benchmarks.loadtest import BACKEND_DIR, SEED_PASSWORD, discover_users, free_port, manage, percentile
+
+READS = (
+    ('GET /api/leads/', '/api/leads/?fields=id,name,status,created_at'),
+    ('GET /api/followups/', '/api/followups/?fields=id,scheduled_date'),
+    ('GET /api/attendance/today/', '/api/attendance/today/'),
+    ('GET /api/users/me/', '/api/users/me/'),
+)
+META = ('POST /api/fetch_meta_leads/', '/api/fetch_meta_leads/')
+FORMS = 3
+LEADS_PER_FORM = 20
+
+
+class FakeGraph:
+    """Answers leadgen_forms/leads requests after a fixed delay, on its own event loop."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.port = free_port()
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._serve, args=(ready,), daemon=True).start()
+        ready.wait()
+
+    def _serve(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', self.port))
+        ready.set()
+        self.loop.run_forever()
+
+    @staticmethod
+    def payload(path):
+        node, edge = path.split('?')[0].strip('/').split('/')[1:3]
+        if edge == 'leadgen_forms':
+            return {'data': [{'id': f'{node}-form{i}'} for i in range(FORMS)]}
+        return {'data': [
+            {
+                'id': f'{node}-lead{i}',
+                'created_time': '2025-01-01T00:00:00+0000',
+                'field_data': [
+                    {'name': 'full_name', 'values': [f'Graph Lead {i}']},
+                    {'name': 'email', 'values': [f'{node}-{i}@graph.example.com']},
+                ],
+            }
+            for i in range(LEADS_PER_FORM)
+        ]}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                await asyncio.sleep(self.delay)
+                body = json.dumps(self.payload(request_line.split()[1].decode())).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection; reconnects when the server closes it."""
+
+    def __init__(self, port, token):
+        self.port = port
+        self.token = token
+        self.reader = self.writer = None
+
+    async def request(self, method, path):
+        reused = self.writer is not None
+        try:
+            return await self._request(method, path)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            # like browsers, retry once if the server had closed an idle keep-alive connection
+            if not reused:
+                raise
+            return await self._request(method, path)
+
+    async def _request(self, method, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.writer.write(
+            f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {self.token}\r\n'
+            f'Content-Length: 0\r\n\r\n'.encode()
+        )
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('server closed the connection')
+        status = int(status_line.split()[1])
+        length = 0
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection' and value.strip().lower() == 'close':
+                keep_alive = False
+        await self.reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def drive(port, tokens, args):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    meta_clients = int(args.clients * args.meta_share)
+    deadline = time.monotonic() + args.duration
+
+    async def loop(index):
+        rng = random.Random(index)
+        admin = index < meta_clients
+        client = Client(port, tokens['admin'] if admin else tokens['sales'][index % len(tokens['sales'])])
+        step = index
+        # spread the first requests over one think time
+        await asyncio.sleep(rng.uniform(0, args.think_ms / 1000))
+        while time.monotonic() < deadline:
+            name, path = META if admin else READS[step % len(READS)]
+            step += 1
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(client.request('POST' if admin else 'GET', path), args.timeout)
+            except (asyncio.TimeoutError, OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                client.close()
+                status = None
+            elapsed = (time.perf_counter() - start) * 1000
+            # attendance/today is a 404 for reps who haven't checked in
+            if status is None or status >= 500 or (status >= 400 and status != 404):
+                errors[name] += 1
+            else:
+                samples[name].append(elapsed)
+            if args.think_ms:
+                await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+        client.close()
+
+    await asyncio.gather(*(loop(i) for i in range(args.clients)))
+    return samples, errors
+
+
+def start(kind, args, env):
+    port = free_port()
+    if kind == 'wsgi':
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', '-w', str(args.workers),
+                   '-k', 'gthread', '--threads', str(args.threads), '--timeout', '120', '--log-level', 'warning',
+                   'backend.wsgi']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'backend.asgi:application', '--port', str(port),
+                   '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log',
+                   '--backlog', str(max(2048, args.clients * 2))]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{kind} server exited with status {process.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/metrics', timeout=5)
+            return process, port
+        except (requests.ConnectionError, requests.Timeout):
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def login(base_url, email):
+    response = requests.post(f'{base_url}/api/login/', json={'email': email, 'password': SEED_PASSWORD}, timeout=30)
+    response.raise_for_status()
+    return response.json()['tokens']['access']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes for both servers.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker.')
+    parser.add_argument('--meta-share', type=float, default=0.05, help='Share of clients calling fetch_meta_leads.')
+    parser.add_argument('--graph-delay-ms', type=float, default=1000)
+    parser.add_argument('--sales-users', type=int, default=50, help='Distinct sales reps to log in as.')
+    parser.add_argument('--think-ms', type=float, default=10000, help='Mean pause between a client\'s requests.')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed.')
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--admin-email', default='seed-admin000000@example.com')
+    parser.add_argument('--seed-args', default='--users 200 --leads 5000 --tasks 500 --attendance-days 30 --followups 500')
+    args = parser.parse_args()
+
+    graph = FakeGraph(args.graph_delay_ms / 1000)
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', PERF_SAMPLE_RATE='0',
+        META_GRAPH_URL=f'http://127.0.0.1:{graph.port}', FACEBOOK_ACCESS_TOKEN='bench', FACEBOOK_PAGE_ID='page1,page2',
+    )
+    tmpdir = None
+    postgres = os.environ.get('BENCH_DB') == 'postgres'
+    if not postgres:
+        tmpdir = tempfile.mkdtemp(prefix='bench-asgi-')
+        env['BENCH_SQLITE_PATH'] = os.path.join(tmpdir, 'db.sqlite3')
+    try:
+        manage(env, 'migrate', '-v', '0')
+        if not postgres:
+            manage(env, 'seed_scale', '-v', '0', *args.seed_args.split())
+
+        results = {}
+        for kind in args.servers.split(','):
+            process, port = start(kind, args, env)
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                emails = discover_users(base_url, args.admin_email, args.sales_users)
+                tokens = {
+                    'admin': login(base_url, args.admin_email),
+                    'sales': [login(base_url, email) for email in emails['sales'][:args.sales_users]],
+                }
+                # first import creates the Graph leads; the measured calls dedupe them
+                requests.post(f'{base_url}/api/fetch_meta_leads/', headers={'Authorization': f"Bearer {tokens['admin']}"}, timeout=120)
+                results[kind] = asyncio.run(drive(port, tokens, args))
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f'{args.clients} clients, {args.duration:.0f}s, {args.workers} workers '
+          f'(gunicorn gthread x{args.threads} threads), Graph API delay {args.graph_delay_ms:.0f}ms')
+    print(f"{'server':<6} {'endpoint':<30} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for kind, (samples, errors) in results.items():
+        total = 0
+        for name, _path in READS + (META,):
+            values = sorted(samples.get(name, []))
+            total += len(values)
+            p50, p95, p99 = (percentile(values, p) for p in (50, 95, 99))
+            print(f'{kind:<6} {name:<30} {len(values) / args.duration:8.1f} '
+                  + ' '.join(f'{v:8.1f}' if v is not None else f"{'-':>8}" for v in (p50, p95, p99))
+                  + f' {errors.get(name, 0):7d}')
+        print(f"{kind:<6} {'total':<30} {total / args.duration:8.1f} {'':>26} {sum(errors.values()):7d}")
+
+
+if __name__ == '__main__':
+    main()
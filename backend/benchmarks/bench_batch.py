@@ -0,0 +1,156 @@
+"""Admin page loads with the SPA's separate API calls vs batched /api/batch/ calls.
+
+    python -m benchmarks.bench_batch --rtt-ms 50
+    BENCH_DB=postgres python -m benchmarks.bench_batch --servers wsgi,asgi --users 20
+
+Replays what the admin Dashboard and ManageTasks screens request when they
+load. ``before`` issues the calls as ``services/api.js`` used to: the tasks,
+then the users filtered by team, then every user for the stats, while the
+active users load alongside. ``after`` makes the calls as they do now: the
+Dashboard's reads as one batch, ManageTasks' tasks and team in one batch
+while its user list loads alongside.
+Each request first waits ``--rtt-ms``, a stand-in for the network round trip
+the browser pays per call (keep-alive connections, so no handshakes).
+``--users`` admins load the pages back to back for ``--duration`` seconds
+against each of ``--servers`` (see benchmarks.bench_asgi). A throwaway
+SQLite database is seeded like benchmarks.loadtest unless ``BENCH_DB=postgres``.
+
+Printed per server, page and variant are the page loads per second, their
+p50/p95 time and the requests each load made.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.bench_asgi import login, start
+from benchmarks.loadtest import manage, percentile
+
+USERS_OF_TEAM = '/api/users/?fields=id,user_type,is_staff'
+
+# before: chains whose calls run one after another, the chains of a page side
+# by side; after: calls side by side, each a batch or (alone) a plain GET
+PAGES = {
+    'dashboard': {
+        'before': [['/api/tasks/', USERS_OF_TEAM, '/api/users/'], ['/api/attendance/active_users/']],
+        'after': [['/api/tasks/', '/api/users/', '/api/attendance/active_users/']],
+    },
+    'manage_tasks': {
+        'before': [['/api/tasks/', USERS_OF_TEAM], ['/api/users/']],
+        'after': [['/api/tasks/', USERS_OF_TEAM], ['/api/users/']],
+    },
+}
+
+
+async def call(client, rtt, method, path, **kwargs):
+    await asyncio.sleep(rtt)
+    response = await client.request(method, path, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+async def load_before(client, rtt, chains):
+    async def chain(paths):
+        for path in paths:
+            await call(client, rtt, 'GET', path)
+
+    await asyncio.gather(*(chain(paths) for paths in chains))
+    return sum(len(paths) for paths in chains)
+
+
+async def load_after(client, rtt, calls):
+    async def batch(paths):
+        if len(paths) == 1:
+            await call(client, rtt, 'GET', paths[0])
+            return
+        response = await call(client, rtt, 'POST', '/api/batch/', json={
+            'requests': [{'method': 'GET', 'path': path} for path in paths],
+        })
+        failed = [item['status'] for item in response.json()['responses'] if item['status'] >= 400]
+        if failed:
+            raise RuntimeError(f'batched requests failed with {failed}')
+
+    await asyncio.gather(*(batch(paths) for paths in calls))
+    return len(calls)
+
+
+async def drive(port, token, args):
+    """``{(page, variant): [load ms, ...]}`` and the requests per load, for each variant in turn."""
+    rtt = args.rtt_ms / 1000
+    samples = defaultdict(list)
+    requests_per_load = {}
+    for page, variants in PAGES.items():
+        for variant, spec in variants.items():
+            load = load_before if variant == 'before' else load_after
+            deadline = time.monotonic() + args.duration
+
+            async def user(page=page, variant=variant, spec=spec, load=load, deadline=deadline):
+                # a browser: keep-alive, up to six connections to the origin
+                async with httpx.AsyncClient(
+                    base_url=f'http://127.0.0.1:{port}', headers={'Authorization': f'Bearer {token}'},
+                    limits=httpx.Limits(max_connections=6), timeout=60,
+                ) as client:
+                    await load(client, rtt, spec)  # warm up the connections
+                    while time.monotonic() < deadline:
+                        start_time = time.perf_counter()
+                        requests_per_load[page, variant] = await load(client, rtt, spec)
+                        samples[page, variant].append((time.perf_counter() - start_time) * 1000)
+
+            await asyncio.gather(*(user() for _ in range(args.users)))
+    return samples, requests_per_load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=10, help='Admins loading pages at once.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per page and variant.')
+    parser.add_argument('--rtt-ms', type=float, default=50, help='Simulated network round trip per request.')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes for both servers.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker.')
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--admin-email', default='seed-admin000000@example.com')
+    parser.add_argument('--seed-args', default='--users 200 --leads 5000 --tasks 500 --attendance-days 30 --followups 500')
+    args = parser.parse_args()
+    # the listen backlog bench_asgi.start sizes from its client count
+    args.clients = args.users * 6
+
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', PERF_SAMPLE_RATE='0')
+    tmpdir = None
+    postgres = os.environ.get('BENCH_DB') == 'postgres'
+    if not postgres:
+        tmpdir = tempfile.mkdtemp(prefix='bench-batch-')
+        env['BENCH_SQLITE_PATH'] = os.path.join(tmpdir, 'db.sqlite3')
+    results = {}
+    try:
+        manage(env, 'migrate', '-v', '0')
+        if not postgres:
+            manage(env, 'seed_scale', '-v', '0', *args.seed_args.split())
+        for kind in args.servers.split(','):
+            process, port = start(kind, args, env)
+            try:
+                token = login(f'http://127.0.0.1:{port}', args.admin_email)
+                results[kind] = asyncio.run(drive(port, token, args))
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f'{args.users} admins, {args.duration:.0f}s per page and variant, {args.rtt_ms:.0f}ms per round trip, '
+          f'{args.workers} workers (gunicorn gthread x{args.threads} threads)')
+    print(f"{'server':<6} {'page':<13} {'variant':<7} {'loads/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'requests':>9}")
+    for kind, (samples, requests_per_load) in results.items():
+        for (page, variant), values in samples.items():
+            values.sort()
+            print(f'{kind:<6} {page:<13} {variant:<7} {len(values) / args.duration:8.1f} '
+                  f'{percentile(values, 50):8.1f} {percentile(values, 95):8.1f} {requests_per_load[page, variant]:9d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Concurrent claiming from the lead queue (api.lead_queue.claim).
+
+    BENCH_DB=postgres python -m benchmarks.bench_claim --claimers 150 --leads 20000 --n 5
+
+Needs PostgreSQL for ``FOR UPDATE SKIP LOCKED``; each claimer is a thread
+with its own connection, so keep ``--claimers`` below the server's
+max_connections. The leads are created under their own source and claimed
+from it only, first fresh and then again after their leases are expired by
+hand. Each round checks that every lead was handed out exactly once and
+that the table agrees with who got it; the script exits non-zero if not.
+The leads, their users and the rollups of their days are removed afterwards.
+
+A sampler counts statements waiting on locks: claim statements (those on
+the lead table) skip locked rows instead, so they should show none, while
+the rollup upkeep after each claim queues on the unassigned row of the
+leads' day.
+"""
+import argparse
+import datetime
+import os
+import threading
+import time
+from collections import Counter
+
+from benchmarks.utils import setup
+
+setup()
+
+from django.db import connection, connections  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from api import lead_queue, rollups  # noqa: E402
+from api.models import DailySalesRollup, Lead, User  # noqa: E402
+from benchmarks.loadtest import percentile  # noqa: E402
+
+SOURCE = 'bench-claim'
+EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def sample_lock_waits(stop, samples):
+    """Until ``stop`` is set, append how many claim and other (rollup upkeep) statements wait on a lock, every 20ms."""
+    lead_table = f'"{Lead._meta.db_table}"'
+    try:
+        with connection.cursor() as cursor:
+            while not stop.wait(0.02):
+                cursor.execute(
+                    'SELECT count(*) FILTER (WHERE strpos(query, %s) > 0), count(*) FILTER (WHERE strpos(query, %s) = 0) '
+                    "FROM pg_stat_activity WHERE datname = current_database() AND wait_event_type = 'Lock'",
+                    [lead_table, lead_table],
+                )
+                samples.append(cursor.fetchone())
+    finally:
+        connection.close()
+
+
+def claim_all(users, n):
+    """Every user claims ``n`` at a time until the queue runs dry.
+
+    Returns ``{lead id: [user ids]}``, the claim latencies in ms and the lock-wait samples.
+    """
+    claims, latencies, waits = {}, [], []
+    lock = threading.Lock()
+    start = threading.Barrier(len(users))
+
+    def run(user):
+        mine, times = [], []
+        start.wait()
+        try:
+            while True:
+                began = time.perf_counter()
+                leads, _expires = lead_queue.claim(user, n, source=SOURCE)
+                times.append((time.perf_counter() - began) * 1000)
+                if not leads:
+                    break
+                mine.extend(lead.pk for lead in leads)
+        finally:
+            connections.close_all()
+        with lock:
+            for lead_id in mine:
+                claims.setdefault(lead_id, []).append(user.pk)
+            latencies.extend(times)
+
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_lock_waits, args=(stop, waits))
+    sampler.start()
+    threads = [threading.Thread(target=run, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    sampler.join()
+    return claims, latencies, waits
+
+
+def check(label, claims, lead_ids, latencies, waits, seconds):
+    doubles = {lead_id: owners for lead_id, owners in claims.items() if len(owners) > 1}
+    missing = set(lead_ids) - claims.keys()
+    stored = dict(Lead.objects.filter(pk__in=lead_ids).values_list('pk', 'assigned_to'))
+    mismatched = [lead_id for lead_id, owners in claims.items() if stored.get(lead_id) != owners[0]]
+    per_user = Counter(owners[0] for owners in claims.values())
+    latencies.sort()
+    print(
+        f'{label:<16} {len(claims):>7} leads in {seconds:5.2f}s ({len(claims) / seconds:>8,.0f}/s)   '
+        f'claim p50 {percentile(latencies, 50):6.1f}ms  p99 {percentile(latencies, 99):6.1f}ms   '
+        f'per claimer {min(per_user.values())}-{max(per_user.values())}'
+    )
+    claim_waits = [leads for leads, _rollups in waits if leads]
+    rollup_waits = [rollups for _leads, rollups in waits if rollups]
+    print(
+        f'{"":<16} lock waits in {len(waits)} samples: claims {len(claim_waits)} (max {max(claim_waits, default=0)}), '
+        f'rollup upkeep {len(rollup_waits)} (max {max(rollup_waits, default=0)})'
+    )
+    if doubles or missing or mismatched:
+        raise SystemExit(f'{label}: {len(doubles)} claimed twice, {len(missing)} never claimed, {len(mismatched)} stored with another rep')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--claimers', type=int, default=150)
+    parser.add_argument('--leads', type=int, default=20000)
+    parser.add_argument('--n', type=int, default=5, help='Leads per claim.')
+    args = parser.parse_args()
+    if connection.vendor != 'postgresql':
+        raise SystemExit('SKIP LOCKED needs PostgreSQL; run with BENCH_DB=postgres.')
+
+    tag = os.getpid()
+    users = User.objects.bulk_create([
+        User(username=f'bench-claimer-{tag}-{i}', user_type='sales') for i in range(args.claimers)
+    ])
+    # older than any real lead, spread over days so the rollup rows differ
+    leads = Lead.objects.bulk_create([
+        Lead(name=f'Claim {i}', source=SOURCE, created_at=EPOCH + datetime.timedelta(minutes=i))
+        for i in range(args.leads)
+    ], batch_size=5000)
+    lead_ids = [lead.pk for lead in leads]
+    with connection.cursor() as cursor:
+        # or the planner, not knowing the source, reads the whole queue for every claim
+        cursor.execute(f'ANALYZE {Lead._meta.db_table}')
+    days = (EPOCH.date(), (EPOCH + datetime.timedelta(minutes=args.leads)).date())
+    rollups.rebuild(*days)
+    try:
+        began = time.perf_counter()
+        claims, latencies, waits = claim_all(users, args.n)
+        check('fresh queue', claims, lead_ids, latencies, waits, time.perf_counter() - began)
+
+        Lead.objects.filter(pk__in=lead_ids).update(claim_expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        began = time.perf_counter()
+        claims, latencies, waits = claim_all(users[::-1], args.n)
+        check('expired leases', claims, lead_ids, latencies, waits, time.perf_counter() - began)
+
+        expected = rollups.compute(*days)
+        stored = {
+            (row.day, row.sales_user_id, row.source): row.leads_new
+            for row in DailySalesRollup.objects.filter(day__range=days, leads_new__gt=0)
+        }
+        if stored != {key: counters['leads_new'] for key, counters in expected.items() if counters['leads_new']}:
+            raise SystemExit('rollups drifted from the claimed leads')
+    finally:
+        # without the per-row delete signals; the rollups are dropped below
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Lead._meta.db_table} WHERE id = ANY(%s)', [lead_ids])
+        User.objects.filter(pk__in=[user.pk for user in users]).delete()
+        DailySalesRollup.objects.filter(day__range=days, source=SOURCE).delete()
+
+
+if __name__ == '__main__':
+    main()
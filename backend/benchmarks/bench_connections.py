@@ -0,0 +1,92 @@
+"""Per-request latency of /api/users/me/ with fresh, persistent and pooled connections.
+
+    BENCH_DB=postgres python -m benchmarks.bench_connections --requests 500
+
+Needs the PostgreSQL database from the ``DB_*`` settings, migrated and seeded
+(``manage.py seed_scale``). Each case starts ``runserver`` with different
+connection settings and the user cache disabled, so every request runs
+exactly one query, then times sequential authenticated requests and reads
+the number of connections the server opened from /metrics. The server runs
+with ``--nothreading`` because threaded ``runserver`` closes the connections
+of each request thread, which would make every case behave like CONN_MAX_AGE=0.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+from benchmarks.loadtest import BACKEND_DIR, SEED_PASSWORD, free_port, percentile
+
+CASES = (
+    ('CONN_MAX_AGE=0          ', {'DB_CONN_MAX_AGE': '0'}),
+    ('CONN_MAX_AGE=60 + checks', {'DB_CONN_MAX_AGE': '60'}),
+    ('psycopg pool            ', {'DB_POOL': '1'}),
+)
+
+
+def start(env):
+    port = free_port()
+    command = [sys.executable, '-W', 'ignore', 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload', '--nothreading']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(150):
+        try:
+            requests.get(base_url + '/metrics', timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('runserver did not start')
+
+
+def connections_opened(session, base_url):
+    text = session.get(base_url + '/metrics').text
+    return sum(
+        float(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+        if line.startswith(('db_connections_opened_total', 'db_pool_connections_opened_total'))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--email', default='seed-admin000000@example.com')
+    args = parser.parse_args()
+    if os.environ.get('BENCH_DB') != 'postgres':
+        raise SystemExit('This benchmark measures PostgreSQL connection setup; run it with BENCH_DB=postgres.')
+
+    print(f'{args.requests} sequential GET /api/users/me/ (one query each)')
+    for label, overrides in CASES:
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', USER_CACHE_TTL='0', **overrides)
+        process, base_url = start(env)
+        try:
+            session = requests.Session()
+            response = session.post(base_url + '/api/login/', json={'email': args.email, 'password': SEED_PASSWORD})
+            response.raise_for_status()
+            session.headers['Authorization'] = f"Bearer {response.json()['tokens']['access']}"
+            for _ in range(20):
+                session.get(base_url + '/api/users/me/')
+            before = connections_opened(session, base_url)
+
+            timings = []
+            for _ in range(args.requests):
+                start_at = time.perf_counter()
+                session.get(base_url + '/api/users/me/').raise_for_status()
+                timings.append((time.perf_counter() - start_at) * 1000)
+            opened = connections_opened(session, base_url) - before
+        finally:
+            process.terminate()
+            process.wait()
+
+        timings.sort()
+        print(
+            f'{label} mean={sum(timings) / len(timings):6.2f}ms  p50={percentile(timings, 50):6.2f}ms  '
+            f'p95={percentile(timings, 95):6.2f}ms  connections opened={opened:.0f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
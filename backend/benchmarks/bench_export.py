@@ -0,0 +1,70 @@
+"""Peak Python memory of /api/export/leads/ for a small and a large table.
+
+    python -m benchmarks.bench_export --small 1000 --large 200000
+
+Exits non-zero if the large export needs noticeably more memory than the
+small one, i.e. if rows are being accumulated instead of streamed.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from benchmarks.utils import setup
+
+setup()
+
+from django.test import Client  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from api.models import Lead, User  # noqa: E402
+
+
+def seed(total, owner):
+    existing = Lead.objects.count()
+    Lead.objects.bulk_create([
+        Lead(name=f'Lead {i}', email=f'lead{i}@example.com', phone=f'+91{i:010d}', source='csv',
+             assigned_to=owner, raw_data={'campaign': 'spring', 'i': i})
+        for i in range(existing, total)
+    ], batch_size=5000)
+
+
+def export(client, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, HTTP_ACCEPT_ENCODING='gzip' if 'gzip' in path else '')
+    size = sum(len(chunk) for chunk in response.streaming_content)
+    secs = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, secs, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--small', type=int, default=1000)
+    parser.add_argument('--large', type=int, default=200000)
+    args = parser.parse_args()
+
+    admin = User.objects.create(username='export-admin', email='export@example.com', user_type='admin')
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}')
+
+    ok = True
+    for fmt in ('csv', 'ndjson', 'ndjson&gzip'):
+        peaks = []
+        for rows in (args.small, args.large):
+            seed(rows, admin)
+            # seed() only tops up, so trim back down for the small run
+            Lead.objects.filter(id__gt=Lead.objects.order_by('id').values_list('id', flat=True)[rows - 1]).delete()
+            size, secs, peak = export(client, f'/api/export/leads/?format={fmt}')
+            peaks.append(peak)
+            print(f'{fmt:<12} rows={rows:>8}  bytes={size:>12,}  {rows / secs:>10,.0f} rows/s  peak={peak / 2 ** 20:6.2f} MiB')
+        # allow for one chunk of rows plus allocator noise
+        if peaks[1] > peaks[0] * 2 + 8 * 2 ** 20:
+            print(f'FAIL: {fmt} peak memory grows with row count')
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
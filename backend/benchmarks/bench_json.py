@@ -0,0 +1,138 @@
+"""Compatibility check and encode/decode throughput for ORJSONRenderer/ORJSONParser.
+
+    python -m benchmarks.bench_json --rows 50000
+
+Every fixture must render byte-for-byte the same as DRF's JSONRenderer and
+parse back to the same value as DRF's JSONParser; the script exits non-zero
+otherwise.
+"""
+import argparse
+import datetime
+import io
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+from benchmarks.utils import setup
+
+setup()
+
+from django.utils import timezone  # noqa: E402
+from django.utils.translation import gettext_lazy  # noqa: E402
+from rest_framework.exceptions import ErrorDetail  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList  # noqa: E402
+
+from api.parsers import ORJSONParser  # noqa: E402
+from api.renderers import ORJSONRenderer  # noqa: E402
+
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+
+FIXTURES = {
+    'scalars': [None, True, False, 0, -1, 2 ** 63 - 1, 1.5, 0.1, 'plain', ''],
+    'unicode': ['नमस्ते', 'emoji \U0001F600', 'line sep para', 'quote " backslash \\ tab \t nl \n', '\x00\x1f'],
+    'datetimes': {
+        'utc': datetime.datetime(2024, 3, 1, 10, 0, tzinfo=datetime.timezone.utc),
+        'utc_micro': datetime.datetime(2024, 3, 1, 10, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+        'ist': datetime.datetime(2024, 3, 1, 15, 30, tzinfo=IST),
+        'naive': datetime.datetime(2024, 3, 1, 10, 0),
+        'date': datetime.date(2024, 3, 1),
+        'time': datetime.time(9, 30, 15),
+        'time_micro': datetime.time(9, 30, 15, 500),
+        'timedelta': datetime.timedelta(hours=1, seconds=3),
+    },
+    'decimals': [Decimal('0'), Decimal('1500.50'), Decimal('12345678.90'), Decimal('-0.01')],
+    'misc': {'uuid': uuid.UUID(int=42), 'lazy': gettext_lazy('Not found.'), 'bytes': b'raw', 'tuple': (1, 2)},
+    'errors': {'detail': ErrorDetail('Invalid token.', code='token_not_valid'), 'fields': [ErrorDetail('required')]},
+    'non_str_keys': {2: 'a', None: 'b', True: 'c'},
+    'meta_raw_data': {
+        'id': '1234567890', 'created_time': '2024-03-01T10:00:00+0000',
+        'field_data': [{'name': 'full_name', 'values': ['Priya Sharma']}, {'name': 'phone_number', 'values': ['+919876543210']}],
+    },
+    'return_types': ReturnList([ReturnDict({'id': 1, 'nested': {'a': [1, 2, {'b': None}]}}, serializer=None)], serializer=None),
+    'empty': [[], {}, [[]], [{}]],
+}
+
+PARSE_FIXTURES = [
+    b'{}', b'[]', b'{"status": "contacted"}', b'{"a": [1, 2.5, "x", null, true]}',
+    '{"name": "नमस्ते"}'.encode(), b'{"deposit_amount": "1500.50", "lead": 3}',
+]
+
+
+def lead_rows(rows):
+    now = timezone.now()
+    return ReturnList([
+        {
+            'id': i, 'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'phone': f'+91{i:010d}', 'city': 'Chennai',
+            'source': 'facebook', 'status': 'new', 'assigned_to': i % 50, 'assigned_to_username': f'rep{i % 50}',
+            'external_id': str(10 ** 15 + i), 'form_id': '998877', 'raw_data': FIXTURES['meta_raw_data'],
+            'created_at': timezone.localtime(now).isoformat(), 'updated_at': now.isoformat(),
+        }
+        for i in range(rows)
+    ], serializer=None)
+
+
+def check_compatibility():
+    failures = []
+    drf, fast = JSONRenderer(), ORJSONRenderer()
+    for name, data in FIXTURES.items():
+        expected, actual = drf.render(data), fast.render(data)
+        if expected != actual:
+            failures.append(f'render {name}: {expected!r} != {actual!r}')
+    for accepted in ('application/json; indent=4', 'application/json; indent=0'):
+        if drf.render(FIXTURES['datetimes'], accepted) != fast.render(FIXTURES['datetimes'], accepted):
+            failures.append(f'render with {accepted}')
+    for body in PARSE_FIXTURES:
+        if JSONParser().parse(io.BytesIO(body)) != ORJSONParser().parse(io.BytesIO(body)):
+            failures.append(f'parse {body!r}')
+    for body in (b'{bad', b'NaN', b''):
+        errors = []
+        for parser in (JSONParser(), ORJSONParser()):
+            try:
+                parser.parse(io.BytesIO(body))
+                errors.append(None)
+            except Exception as exc:
+                errors.append(str(exc))
+        if errors[0] != errors[1]:
+            failures.append(f'parse error {body!r}: {errors}')
+    return failures
+
+
+def throughput(fn, payload_bytes, repeat=5):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    secs = (time.perf_counter() - start) / repeat
+    return secs * 1000, payload_bytes / secs / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    failures = check_compatibility()
+    for failure in failures:
+        print('MISMATCH', failure)
+    print(f'compatibility: {len(FIXTURES) + len(PARSE_FIXTURES) + 5 - len(failures)} checks passed, {len(failures)} failed')
+
+    data = lead_rows(args.rows)
+    body = JSONRenderer().render(data)
+    assert ORJSONRenderer().render(data) == body
+    print(f'payload: {args.rows} leads, {len(body) / 2 ** 20:.1f} MiB')
+    for label, fn in (
+        ('render JSONRenderer', lambda: JSONRenderer().render(data)),
+        ('render ORJSONRenderer', lambda: ORJSONRenderer().render(data)),
+        ('parse  JSONParser', lambda: JSONParser().parse(io.BytesIO(body))),
+        ('parse  ORJSONParser', lambda: ORJSONParser().parse(io.BytesIO(body))),
+    ):
+        ms, mib_s = throughput(fn, len(body))
+        print(f'{label:<24} {ms:>8.1f} ms  {mib_s:>8.1f} MiB/s')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Query count and latency of GET /api/leads/<id>/ as a lead's history grows.
+
+    python -m benchmarks.bench_lead_detail --sizes 1 10 100 1000
+
+The detail view prefetches its relations, so the number of queries must not
+depend on how many follow-ups, account openings, payment proofs and status
+events the lead has; the script exits non-zero if it does.
+"""
+import argparse
+import datetime
+import time
+from decimal import Decimal
+
+from benchmarks.utils import count_queries, setup
+
+setup()
+
+from django.core.files.base import ContentFile  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from api.models import AccountOpening, FollowUp, Lead, LeadStatusEvent, PaymentProof, User  # noqa: E402
+
+
+def seed(size, users):
+    now = timezone.now()
+    lead = Lead.objects.create(name=f'Lead {size}', phone=f'+91{size:010d}', source='csv', assigned_to=users[0])
+    FollowUp.objects.bulk_create([
+        FollowUp(lead=lead, scheduled_date=now.date() + datetime.timedelta(days=i % 30), notes='call back', created_by=users[i % len(users)])
+        for i in range(size)
+    ])
+    AccountOpening.objects.bulk_create([
+        AccountOpening(lead=lead, created_by=users[i % len(users)], deposit_amount=Decimal('1500.50'))
+        for i in range(size)
+    ])
+    proof = PaymentProof(lead=lead, uploaded_by=users[0])
+    proof.file.save(f'bench-{size}.txt', ContentFile(b'proof'), save=False)
+    PaymentProof.objects.bulk_create([
+        PaymentProof(lead=lead, uploaded_by=users[i % len(users)], file=proof.file.name)
+        for i in range(size)
+    ])
+    LeadStatusEvent.objects.bulk_create([
+        LeadStatusEvent(
+            lead=lead, from_status='new', to_status='contacted', at=now - datetime.timedelta(minutes=i),
+            changed_by=users[i % len(users)], sales_user=users[0], source='csv',
+        )
+        for i in range(size)
+    ])
+    return lead
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    users = [
+        User.objects.create(username=f'detail-rep-{i}-{time.time_ns()}', user_type='sales')
+        for i in range(5)
+    ]
+    client = APIClient()
+    client.force_authenticate(users[0])
+
+    counts = set()
+    for size in args.sizes:
+        lead = seed(size, users)
+        url = f'/api/leads/{lead.id}/'
+        with count_queries() as queries:
+            response = client.get(url)
+        assert response.status_code == 200, response.content
+        data = response.json()
+        assert all(len(data[key]) == size for key in ('followups', 'account_openings', 'payment_proofs')), size
+        assert len(data['status_history']) >= size, size
+        counts.add(len(queries))
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            client.get(url)
+        ms = (time.perf_counter() - start) * 1000 / args.repeat
+        print(f'{size:>6} rows per relation   {len(queries):>3} queries   {ms:>8.1f} ms')
+
+    if len(counts) != 1:
+        raise SystemExit(f'query count grows with the related rows: {sorted(counts)}')
+    print(f'constant: {counts.pop()} queries per request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""End-to-end run of the Meta leadgen webhook and its consumers under a burst.
+
+    BENCH_DB=postgres python -m benchmarks.bench_meta_webhook --leads 5000 --consumers 2
+    BENCH_DB=postgres python -m benchmarks.bench_meta_webhook --leads 20000 --concurrency 100
+
+Needs PostgreSQL: consumers split the queue with SKIP LOCKED. gunicorn
+(``gunicorn.conf.py``) serves the webhook, and ``--consumers`` ``manage.py
+consume_meta_leads`` processes work the queue while ``--concurrency``
+clients post signed notifications for ``--leads`` leads as fast as the
+server acks them. Deliveries mimic Meta: ``--redeliver`` of them are sent
+twice and ``--forged`` carry a wrong signature, whose leads must never
+appear. A stand-in for the Graph API answers batch requests after
+``--graph-delay-ms`` and fails ``--graph-fail-rate`` of the leads on their
+first fetch, which the consumers must retry.
+
+Printed are the ack rate and latency, the batch requests Graph saw, and how
+long after the last ack the queue drained. The script checks that every
+signed lead was imported once with its parsed fields and exits non-zero
+otherwise. The leads and notifications are removed afterwards.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import parse_qs
+
+from benchmarks.utils import setup
+
+setup()
+
+import httpx  # noqa: E402
+import requests  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from api.models import Lead, MetaLeadNotification  # noqa: E402
+from benchmarks.loadtest import BACKEND_DIR, free_port, percentile  # noqa: E402
+
+PREFIX = 'bench-webhook-'
+PAGE_ID = 'bench-page'
+APP_SECRET = 'bench-app-secret'
+FORMS = 5
+
+
+def lead_email(leadgen_id):
+    return f'{leadgen_id}@webhook.example.com'
+
+
+class StubGraph:
+    """Answers Graph batch requests for leads after a fixed delay, on its own event loop."""
+
+    def __init__(self, delay, fail_rate):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.failed = set()
+        self.batches = []
+        self.port = free_port()
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._serve, args=(ready,), daemon=True).start()
+        ready.wait()
+
+    def _serve(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', self.port))
+        ready.set()
+        self.loop.run_forever()
+
+    def answer(self, request):
+        leadgen_id = request['relative_url'].split('?')[0]
+        if leadgen_id not in self.failed and random.random() < self.fail_rate:
+            self.failed.add(leadgen_id)
+            return {'code': 500, 'body': json.dumps({'error': {'message': 'An unknown error occurred', 'code': 1}})}
+        form = int(leadgen_id.rsplit('-', 1)[1]) % FORMS
+        lead = {
+            'id': leadgen_id,
+            'created_time': '2025-01-01T00:00:00+0000',
+            'form_id': f'{PREFIX}form{form}',
+            'field_data': [
+                {'name': 'full_name', 'values': [f'Webhook Lead {leadgen_id}']},
+                {'name': 'email', 'values': [lead_email(leadgen_id)]},
+                {'name': 'city', 'values': ['Pune']},
+            ],
+        }
+        return {'code': 200, 'body': json.dumps(lead)}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while (line := await reader.readline()) not in (b'\r\n', b''):
+                    name, _, value = line.decode().partition(':')
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                form = parse_qs((await reader.readexactly(length)).decode())
+                batch = json.loads(form['batch'][0])
+                self.batches.append(len(batch))
+                await asyncio.sleep(self.delay)
+                body = json.dumps([self.answer(request) for request in batch]).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def notification(leadgen_ids):
+    """A webhook body as Meta sends it, one change per lead."""
+    return json.dumps({'object': 'page', 'entry': [{
+        'id': PAGE_ID,
+        'time': int(time.time()),
+        'changes': [{'field': 'leadgen', 'value': {
+            'leadgen_id': leadgen_id, 'page_id': PAGE_ID, 'created_time': int(time.time()),
+            'form_id': f'{PREFIX}form{int(leadgen_id.rsplit("-", 1)[1]) % FORMS}',
+        }} for leadgen_id in leadgen_ids],
+    }]}).encode()
+
+
+def sign(body, secret=APP_SECRET):
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def deliveries(args):
+    """``(body, signature, leadgen_ids, forged)`` for every POST of the burst, shuffled."""
+    signed = [f'{PREFIX}{i}' for i in range(args.leads)]
+    sent = []
+    for start in range(0, len(signed), args.leads_per_delivery):
+        body = notification(signed[start:start + args.leads_per_delivery])
+        sent.append((body, sign(body), False))
+        if random.random() < args.redeliver:
+            sent.append((body, sign(body), False))
+    for i in range(args.forged):
+        body = notification([f'{PREFIX}forged-{i}'])
+        sent.append((body, sign(body, 'not-the-secret'), True))
+    random.shuffle(sent)
+    return signed, sent
+
+
+async def burst(url, sent, concurrency):
+    queue = asyncio.Queue()
+    for delivery in sent:
+        queue.put_nowait(delivery)
+    latencies = []
+    wrong = []
+
+    async def client():
+        async with httpx.AsyncClient(timeout=30) as session:
+            while not queue.empty():
+                body, signature, forged = queue.get_nowait()
+                start = time.perf_counter()
+                resp = await session.post(url, content=body, headers={
+                    'Content-Type': 'application/json', 'X-Hub-Signature-256': signature,
+                })
+                latencies.append((time.perf_counter() - start) * 1000)
+                if resp.status_code != (403 if forged else 200):
+                    wrong.append(resp.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return sorted(latencies), wrong, time.perf_counter() - start
+
+
+def start_server(args, env):
+    port = free_port()
+    process = subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', '-w', str(args.workers),
+         '-k', 'gthread', '--threads', str(args.threads), '--log-level', 'warning', 'backend.wsgi'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/metrics', timeout=5)
+            return process, port
+        except (requests.ConnectionError, requests.Timeout):
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def cleanup():
+    Lead.objects.filter(external_id__startswith=PREFIX).delete()
+    MetaLeadNotification.objects.filter(leadgen_id__startswith=PREFIX).delete()
+
+
+def check(signed, args):
+    """Problems with the imported leads, if any."""
+    problems = []
+    leads = {lead.external_id: lead for lead in Lead.objects.filter(external_id__startswith=PREFIX)}
+    forged = [external_id for external_id in leads if 'forged' in external_id]
+    forged += MetaLeadNotification.objects.filter(leadgen_id__contains='forged').values_list('leadgen_id', flat=True)
+    if forged:
+        problems.append(f'{len(forged)} forged leads were queued or imported')
+    missing = [leadgen_id for leadgen_id in signed if leadgen_id not in leads]
+    if missing:
+        problems.append(f'{len(missing)} signed leads missing, e.g. {missing[:3]}')
+    wrong = [
+        leadgen_id for leadgen_id in signed if leadgen_id in leads and (
+            leads[leadgen_id].email != lead_email(leadgen_id) or leads[leadgen_id].city != 'Pune'
+            or leads[leadgen_id].source != 'facebook'
+            or leads[leadgen_id].form_id != f'{PREFIX}form{int(leadgen_id.rsplit("-", 1)[1]) % FORMS}'
+        )
+    ]
+    if wrong:
+        problems.append(f'{len(wrong)} leads imported with the wrong fields, e.g. {wrong[:3]}')
+    pending = MetaLeadNotification.objects.filter(leadgen_id__startswith=PREFIX, processed_at__isnull=True).count()
+    if pending:
+        problems.append(f'{pending} notifications still pending')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--leads', type=int, default=5000, help='Signed leads delivered.')
+    parser.add_argument('--leads-per-delivery', type=int, default=1, help='Leadgen changes per webhook POST.')
+    parser.add_argument('--redeliver', type=float, default=0.05, help='Share of deliveries Meta sends twice.')
+    parser.add_argument('--forged', type=int, default=50, help='Deliveries with a wrong signature.')
+    parser.add_argument('--concurrency', type=int, default=50, help='Deliveries in flight at once.')
+    parser.add_argument('--consumers', type=int, default=2, help='consume_meta_leads processes.')
+    parser.add_argument('--batch', type=int, default=200, help='Leads a consumer leases per pass.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker.')
+    parser.add_argument('--graph-delay-ms', type=float, default=300, help='Time Graph takes per batch request.')
+    parser.add_argument('--graph-fail-rate', type=float, default=0.02, help='Leads failing their first fetch.')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds to wait for the queue to drain.')
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        raise SystemExit('Consumers split the queue with SKIP LOCKED; run with BENCH_DB=postgres.')
+
+    random.seed(0)
+    graph = StubGraph(args.graph_delay_ms / 1000, args.graph_fail_rate)
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', PERF_SAMPLE_RATE='0',
+        META_APP_SECRET=APP_SECRET, META_GRAPH_URL=f'http://127.0.0.1:{graph.port}',
+        FACEBOOK_ACCESS_TOKEN='bench', FACEBOOK_PAGE_ID=PAGE_ID, META_WEBHOOK_RETRY_SECONDS='1',
+    )
+    signed, sent = deliveries(args)
+    cleanup()
+    server = None
+    consumers = []
+    try:
+        server, port = start_server(args, env)
+        consumers = [
+            subprocess.Popen(
+                [sys.executable, 'manage.py', 'consume_meta_leads', '--batch', str(args.batch), '--interval', '0.2'],
+                cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            )
+            for _ in range(args.consumers)
+        ]
+        latencies, wrong_status, burst_seconds = asyncio.run(
+            burst(f'http://127.0.0.1:{port}/api/webhooks/meta/leadgen/', sent, args.concurrency)
+        )
+        acked = time.perf_counter()
+        deadline = time.monotonic() + args.timeout
+        pending = MetaLeadNotification.objects.filter(leadgen_id__startswith=PREFIX, processed_at__isnull=True)
+        while time.monotonic() < deadline and pending.exists():
+            time.sleep(0.1)
+        drain_seconds = time.perf_counter() - acked
+        for consumer in consumers:
+            consumer.send_signal(signal.SIGINT)
+        summaries = [consumer.communicate(timeout=30)[0].strip() for consumer in consumers]
+        problems = check(signed, args)
+    finally:
+        for consumer in consumers:
+            if consumer.poll() is None:
+                consumer.kill()
+        if server is not None:
+            server.terminate()
+            server.wait()
+        cleanup()
+
+    print(f'{len(sent)} deliveries ({args.leads} signed leads, {args.forged} forged) from {args.concurrency} clients, '
+          f'gunicorn {args.workers}x{args.threads}')
+    print(f'acked in {burst_seconds:.1f}s ({len(sent) / burst_seconds:.0f}/s), '
+          f'latency p50 {percentile(latencies, 50):.0f}ms p99 {percentile(latencies, 99):.0f}ms max {latencies[-1]:.0f}ms')
+    print(f'Graph: {len(graph.batches)} batch requests, {sum(graph.batches) / max(len(graph.batches), 1):.1f} leads each, '
+          f'{len(graph.failed)} leads failed once')
+    print(f'{args.consumers} consumers drained the queue {drain_seconds:.1f}s after the last ack')
+    for summary in summaries:
+        print(f'  {summary}')
+    if wrong_status:
+        problems.append(f'{len(wrong_status)} deliveries answered with an unexpected status: {sorted(set(wrong_status))}')
+    if problems:
+        raise SystemExit('; '.join(problems))
+    print('all signed leads imported once, no forged ones')
+
+
+if __name__ == '__main__':
+    main()
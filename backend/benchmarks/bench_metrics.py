@@ -0,0 +1,89 @@
+"""MetricsMiddleware overhead and multi-process aggregation of /metrics.
+
+    python -m benchmarks.bench_metrics --workers 4
+
+Starts ``--workers`` processes sharing one PROMETHEUS_MULTIPROC_DIR, has
+each log in and mark attendance, then checks that a single scrape of
+/metrics reports the sum over all of them. Afterwards it times an
+authenticated list request with the middleware disabled and enabled.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+if __name__ == '__main__' and '--worker' not in sys.argv and 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    # must be set before prometheus_client is imported
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = _metrics_dir = tempfile.mkdtemp(prefix='metrics-')
+
+from benchmarks.utils import setup, timeit  # noqa: E402
+
+setup()
+
+from django.test import Client, override_settings  # noqa: E402
+
+from api.models import User  # noqa: E402
+
+PASSWORD = 'bench-password-1'
+LOGINS_PER_WORKER = 25
+
+
+def worker():
+    User.objects.create_user(username='bench', email='bench@example.com', password=PASSWORD, user_type='sales')
+    client = Client()
+    for _ in range(LOGINS_PER_WORKER):
+        response = client.post('/api/login/', {'email': 'bench@example.com', 'password': PASSWORD}, content_type='application/json')
+        assert response.status_code == 200, response.content
+    token = response.json()['tokens']['access']
+    Client(HTTP_AUTHORIZATION=f'Bearer {token}').post('/api/attendance/mark_checkout/')
+
+
+def sample(text, name):
+    return sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(name))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker()
+        return
+
+    processes = [
+        subprocess.Popen([sys.executable, '-W', 'ignore', '-m', 'benchmarks.bench_metrics', '--worker'])
+        for _ in range(args.workers)
+    ]
+    assert all(p.wait() == 0 for p in processes)
+
+    text = Client().get('/metrics').content.decode()
+    expected = args.workers * LOGINS_PER_WORKER
+    print(f'{args.workers} workers x {LOGINS_PER_WORKER} logins')
+    checks = (
+        ('logins_total{result="success"}', expected),
+        ('attendance_marks_total', 2 * args.workers),
+        ('http_requests_total', expected + args.workers),
+    )
+    for name, want in checks:
+        print(f'  {name:<34} {sample(text, name):>6.0f} (expected {want})')
+
+    user = User.objects.create_user(username='timing', email='timing@example.com', password=PASSWORD, user_type='admin')
+    for i in range(100):
+        User.objects.create(username=f'user{i}', email=f'user{i}@example.com')
+    token = Client().post('/api/login/', {'email': user.email, 'password': PASSWORD}, content_type='application/json').json()['tokens']['access']
+    for enabled in (False, True):
+        with override_settings(METRICS_ENABLED=enabled):
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            ms = timeit(lambda client=client: client.get('/api/users/'), repeat=500)
+            print(f'METRICS_ENABLED={enabled!s:<5}  GET /api/users/ mean={ms:.3f}ms')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        if '_metrics_dir' in globals():
+            shutil.rmtree(_metrics_dir)
@@ -0,0 +1,35 @@
+"""Overhead of PerformanceMiddleware with sampling off, at 1% and at 100%.
+
+    python -m benchmarks.bench_perf_middleware
+"""
+import logging
+
+from benchmarks.utils import setup, timeit
+
+setup()
+
+from django.test import Client, override_settings  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from api.models import Task, User  # noqa: E402
+
+REQUESTS = 500
+
+
+def main():
+    logging.getLogger('api.perf').disabled = True
+    admin, _ = User.objects.get_or_create(username='bench', defaults={'user_type': 'admin'})
+    Task.objects.bulk_create(Task(title=f'Task {i}', assigned_to=admin) for i in range(200))
+    token = str(RefreshToken.for_user(admin).access_token)
+
+    for rate in (0, 0.01, 1):
+        with override_settings(PERF_SAMPLE_RATE=rate):
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            response = client.get('/api/tasks/')
+            assert response.status_code == 200, response.content
+            ms = timeit(lambda client=client: client.get('/api/tasks/'), repeat=REQUESTS)
+            print(f'PERF_SAMPLE_RATE={rate:<5} mean={ms:.3f}ms  Server-Timing: {response.get("Server-Timing", "-")}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Fan-out of push events (api.push) to thousands of open /api/events/ streams.
+
+    BENCH_DB=postgres python -m benchmarks.bench_push --clients 5000 --users 1000
+    BENCH_DB=postgres python -m benchmarks.bench_push --clients 5000 --workers 2
+
+Needs PostgreSQL: events are published from this process and reach the
+uvicorn workers through LISTEN/NOTIFY, as the writes of other processes
+would. ``--users`` sales users are created and ``--clients`` streams opened
+round-robin over them (several tabs per rep), from one asyncio client.
+Each round then publishes one event to every user in a single ``batch()``,
+i.e. one NOTIFY per user, and waits for every stream to receive it.
+
+Printed are the time to open the streams, the server's memory and threads
+per stream, and per round how many deliveries arrived and their latency
+from publish to receipt. The client shares the machine, so on few cores the
+latency includes the client reading the other streams. The script exits
+non-zero if a delivery is missing. The users are removed afterwards.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.utils import setup
+
+setup()
+
+import requests  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from api import push  # noqa: E402
+from api.models import User  # noqa: E402
+from benchmarks.loadtest import BACKEND_DIR, free_port, percentile  # noqa: E402
+
+PREFIX = 'bench-push-'
+EVENT = 'bench.ping'
+
+
+class StreamClient:
+    """One /api/events/ connection, reading chunked SSE frames and timing the bench events."""
+
+    def __init__(self, port, token):
+        self.port = port
+        self.token = token
+        self.received = {}
+        self.ready = asyncio.Event()
+        self.task = None
+
+    async def open(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(
+            f'GET /api/events/ HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {self.token}\r\n'
+            f'Accept: text/event-stream\r\n\r\n'.encode()
+        )
+        status = int((await reader.readline()).split()[1])
+        if status != 200:
+            raise RuntimeError(f'/api/events/ answered {status}')
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        self.writer = writer
+        self.task = asyncio.create_task(self.read(reader))
+
+    async def read(self, reader):
+        buffer = b''
+        while True:
+            size = int((await reader.readline()).strip() or b'0', 16)
+            if not size:
+                return
+            buffer += (await reader.readexactly(size + 2))[:-2]
+            *frames, buffer = buffer.split(b'\n\n')
+            now = time.time()
+            for frame in frames:
+                fields = dict(line.split(b': ', 1) for line in frame.split(b'\n') if b': ' in line)
+                event = fields.get(b'event')
+                if event == b'ready':
+                    self.ready.set()
+                elif event == EVENT.encode():
+                    self.received[int(fields[b'data'][8:-2])] = now
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.writer.close()
+
+
+def start_server(args, env):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.asgi:application', '--port', str(port),
+         '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log',
+         '--backlog', str(max(2048, args.clients)), '--timeout-graceful-shutdown', '1'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'uvicorn exited with status {process.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/metrics', timeout=5)
+            return process, port
+        except (requests.ConnectionError, requests.Timeout):
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError('uvicorn did not start')
+
+
+def server_usage(pid):
+    """Resident memory (KiB) and threads of ``pid`` and its children (the uvicorn workers)."""
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except OSError:
+                pass
+    rss = threads = 0
+    for child in pids:
+        with open(f'/proc/{child}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss += int(line.split()[1])
+                elif line.startswith('Threads:'):
+                    threads += int(line.split()[1])
+    return rss, threads
+
+
+async def connect_all(port, tokens, args):
+    clients = [StreamClient(port, tokens[i % len(tokens)]) for i in range(args.clients)]
+    slots = asyncio.Semaphore(args.connect_concurrency)
+    times = []
+
+    async def connect(client):
+        async with slots:
+            start = time.perf_counter()
+            await client.open()
+            await asyncio.wait_for(client.ready.wait(), 60)
+            times.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connect(client) for client in clients))
+    return clients, sorted(times), time.perf_counter() - start
+
+
+def publish_round(user_ids, number):
+    with push.batch():
+        for user_id in user_ids:
+            push.publish(user_id, EVENT, [number])
+
+
+async def fan_out(clients, user_ids, args):
+    rounds = []
+    for number in range(args.rounds):
+        sent = time.time()
+        await asyncio.to_thread(publish_round, user_ids, number)
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline and any(number not in client.received for client in clients):
+            await asyncio.sleep(0.05)
+        latencies = sorted((client.received[number] - sent) * 1000 for client in clients if number in client.received)
+        rounds.append((number, latencies))
+        await asyncio.sleep(args.interval)
+    return rounds
+
+
+async def drive(port, tokens, user_ids, args, pid):
+    idle = server_usage(pid)
+    clients, connect_times, connect_seconds = await connect_all(port, tokens, args)
+    try:
+        # let the last streams settle before sampling memory
+        await asyncio.sleep(1)
+        connected = server_usage(pid)
+        rounds = await fan_out(clients, user_ids, args)
+    finally:
+        for client in clients:
+            client.close()
+    return idle, connected, connect_times, connect_seconds, rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--clients', type=int, default=5000, help='Open /api/events/ streams.')
+    parser.add_argument('--users', type=int, default=1000, help='Distinct users the streams belong to.')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes.')
+    parser.add_argument('--rounds', type=int, default=10, help='Events published to every user.')
+    parser.add_argument('--interval', type=float, default=1, help='Seconds between rounds.')
+    parser.add_argument('--connect-concurrency', type=int, default=200, help='Streams being opened at once.')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for a round to arrive everywhere.')
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        raise SystemExit('Events reach the server through LISTEN/NOTIFY; run with BENCH_DB=postgres.')
+
+    User.objects.filter(username__startswith=PREFIX).delete()
+    users = User.objects.bulk_create(
+        User(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@example.com', user_type='sales') for i in range(args.users)
+    )
+    tokens = [str(AccessToken.for_user(user)) for user in users]
+    user_ids = [user.pk for user in users]
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', PERF_SAMPLE_RATE='0',
+        PUSH_BACKEND='postgres', USER_CACHE_MAX_SIZE=str(max(1024, args.users)),
+    )
+    process = None
+    try:
+        process, port = start_server(args, env)
+        idle, connected, connect_times, connect_seconds, rounds = asyncio.run(drive(port, tokens, user_ids, args, process.pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    print(f'{args.clients} streams of {args.users} users, {args.workers} uvicorn worker(s)')
+    print(f'opened in {connect_seconds:.1f}s, time to ready p50 {percentile(connect_times, 50):.0f}ms '
+          f'p99 {percentile(connect_times, 99):.0f}ms')
+    print(f'server: {idle[0] / 1024:.0f} MiB / {idle[1]} threads idle, {connected[0] / 1024:.0f} MiB / '
+          f'{connected[1]} threads with the streams open '
+          f'({(connected[0] - idle[0]) / args.clients:.1f} KiB per stream)')
+    print(f"{'round':>5} {'delivered':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    missing = 0
+    everything = []
+    for number, latencies in rounds + [('all', everything)]:
+        if number == 'all':
+            everything.sort()
+        else:
+            missing += args.clients - len(latencies)
+            everything.extend(latencies)
+        stats = (percentile(latencies, 50), percentile(latencies, 99), latencies[-1] if latencies else None)
+        print(f'{number:>5} {len(latencies):>10} ' + ' '.join(f'{v:8.0f}' if v is not None else f"{'-':>8}" for v in stats))
+    if missing:
+        raise SystemExit(f'{missing} deliveries missing')
+
+
+if __name__ == '__main__':
+    main()
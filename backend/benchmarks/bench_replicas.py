@@ -0,0 +1,182 @@
+"""Shift-start writes next to admin list/report/export reads, with and without a read replica.
+
+    BENCH_DB=postgres DB_REPLICAS=127.0.0.1:5433 python -m benchmarks.bench_replicas
+
+Needs the seeded ``DB_*`` PostgreSQL database and a replica of it in
+``DB_REPLICAS`` (see "Read replicas" in the README). First checks the
+routing request by request: which database each endpoint read from, that a
+write sets the pin cookie and that the writer's next list read comes from
+the primary. Then gunicorn is started once without and once with the
+replica, ``--readers`` admins loop over list, report and export endpoints
+while ``--writers`` sales reps check in, reload their leads and check out,
+and latency per group and queries per database are printed.
+"""
+import argparse
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from benchmarks.loadtest import BACKEND_DIR, SEED_PASSWORD, discover_users, free_port, percentile
+
+READS = (
+    '/api/users/?page_size=200&fields=id,email,user_type',
+    '/api/attendance/active_users/',
+    '/api/export/tasks/?format=ndjson&fields=id,status',
+)
+WRITES = (
+    ('post', '/api/attendance/mark_attendance/'),
+    ('get', '/api/leads/?fields=id,name,status'),
+    ('post', '/api/attendance/mark_checkout/'),
+)
+QUERY_COUNT = re.compile(r'^db_query_duration_seconds_count\{alias="(\w+)"\} (\S+)$', re.M)
+
+
+def start(env, args):
+    port = free_port()
+    command = ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', '-w', str(args.workers),
+               '-k', 'gthread', '--threads', str(args.threads), '--log-level', 'warning', 'backend.wsgi']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(150):
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            requests.get(base_url + '/metrics', timeout=5)
+            return process, base_url
+        except (requests.ConnectionError, requests.Timeout):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def queries(base_url):
+    text = requests.get(base_url + '/metrics', timeout=30).text
+    counts = defaultdict(float)
+    for alias, value in QUERY_COUNT.findall(text):
+        counts[alias] += float(value)
+    return counts
+
+
+def login(base_url, email):
+    session = requests.Session()
+    response = session.post(f'{base_url}/api/login/', json={'email': email, 'password': SEED_PASSWORD}, timeout=30)
+    response.raise_for_status()
+    session.headers['Authorization'] = f"Bearer {response.json()['tokens']['access']}"
+    return session
+
+
+def check_routing(base_url, admin_email, rep_email):
+    admin = login(base_url, admin_email)
+    admin.cookies.clear()
+    rep = login(base_url, rep_email)
+    steps = [(admin, 'get', path) for path in READS] + [(rep, 'post', WRITES[0][1]), (rep, 'get', WRITES[1][1])]
+    print(f"{'request':<58} {'status':>6} {'primary':>8} {'replica':>8}  pin cookie")
+    for session, method, path in steps + [(None, 'get', WRITES[1][1])]:
+        if session is None:
+            # the same rep once the pin has expired
+            rep.cookies.clear()
+            session = rep
+        before = queries(base_url)
+        response = session.request(method, base_url + path, timeout=120)
+        after = queries(base_url)
+        primary = after['default'] - before['default']
+        replica = sum(after[a] - before[a] for a in after if a != 'default')
+        print(f'{method.upper() + " " + path:<58} {response.status_code:>6} {primary:8.0f} {replica:8.0f}  '
+              f"{'set' if 'db_primary' in response.cookies else ('sent' if 'db_primary' in session.cookies else '-')}")
+
+
+def drive(base_url, admin_email, rep_emails, args):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + args.duration
+    lock = threading.Lock()
+
+    def loop(name, session, steps):
+        step = 0
+        while time.monotonic() < deadline:
+            method, path = steps[step % len(steps)]
+            step += 1
+            start_at = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, timeout=120)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            with lock:
+                if ok:
+                    samples[name].append((time.perf_counter() - start_at) * 1000)
+                else:
+                    errors[name] += 1
+
+    admins = [login(base_url, admin_email) for _ in range(args.readers)]
+    for session in admins:
+        # logging in wrote last_login; the reports don't need to follow that
+        session.cookies.clear()
+    threads = [
+        threading.Thread(target=loop, args=('admin reads', session, [('get', p) for p in READS[i:] + READS[:i]]))
+        for i, session in enumerate(admins)
+    ] + [
+        threading.Thread(target=loop, args=('rep writes', login(base_url, email), WRITES))
+        for email in rep_emails[:args.writers]
+    ]
+    before = queries(base_url)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    after = queries(base_url)
+    return samples, errors, {alias: after[alias] - before.get(alias, 0) for alias in after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--readers', type=int, default=4, help='Admins looping over list/report/export endpoints.')
+    parser.add_argument('--writers', type=int, default=8, help='Sales reps checking in and out.')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--admin-email', default='seed-admin000000@example.com')
+    args = parser.parse_args()
+    if os.environ.get('BENCH_DB') != 'postgres' or not os.environ.get('DB_REPLICAS'):
+        raise SystemExit('Run this with BENCH_DB=postgres and DB_REPLICAS pointing at a replica of the DB_* database.')
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench-replicas-') as metrics_dir:
+        for label, replicas in (('primary only', ''), ('with replica', os.environ['DB_REPLICAS'])):
+            env = dict(
+                os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', PERF_SAMPLE_RATE='0',
+                DB_REPLICAS=replicas, PROMETHEUS_MULTIPROC_DIR=os.path.join(metrics_dir, str(len(results))),
+            )
+            os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+            process, base_url = start(env, args)
+            try:
+                reps = discover_users(base_url, args.admin_email, args.writers + 1)['sales']
+                if replicas:
+                    check_routing(base_url, args.admin_email, reps[-1])
+                    print()
+                results[label] = drive(base_url, args.admin_email, reps, args)
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(f'{args.readers} admins reading, {args.writers} reps writing, {args.duration:.0f}s, '
+          f'{args.workers} gunicorn workers x {args.threads} threads')
+    print(f"{'setup':<13} {'group':<12} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7}  queries by database")
+    for label, (samples, errors, counts) in results.items():
+        for name in ('admin reads', 'rep writes'):
+            values = sorted(samples.get(name, []))
+            p50, p95 = (percentile(values, p) for p in (50, 95))
+            print(f'{label:<13} {name:<12} {len(values) / args.duration:7.1f} '
+                  + ' '.join(f'{v:8.1f}' if v is not None else f"{'-':>8}" for v in (p50, p95))
+                  + f' {errors.get(name, 0):7d}'
+                  + ('  ' + ', '.join(f'{alias}={count:.0f}' for alias, count in sorted(counts.items())) if name == 'rep writes' else ''))
+
+
+if __name__ == '__main__':
+    main()
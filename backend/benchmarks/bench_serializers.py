@@ -0,0 +1,90 @@
+"""Rows/sec of the DRF list serializers vs api.sparse_fields.RowSerializer.
+
+    python -m benchmarks.bench_serializers --rows 100000
+
+Also checks that both paths render byte-identical JSON.
+"""
+import argparse
+import datetime
+import time
+from decimal import Decimal
+
+from benchmarks.utils import setup
+
+setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.models import AccountOpening, Attendance, FollowUp, Lead, Task, User  # noqa: E402
+from api.serializers import (  # noqa: E402
+    AccountOpeningSerializer, AttendanceSerializer, FollowUpSerializer, LeadSerializer, TaskSerializer,
+)
+from api.sparse_fields import RowSerializer  # noqa: E402
+
+
+def seed(rows):
+    users = User.objects.bulk_create([
+        User(username=f'rep{i}', email=f'rep{i}@example.com', first_name='Rep' if i % 2 else '', user_type='sales')
+        for i in range(50)
+    ])
+    now = timezone.now()
+    Lead.objects.bulk_create([
+        Lead(
+            name=f'Lead {i}', email=f'lead{i}@example.com', phone=f'+91{i:010d}', city='Chennai', source='csv',
+            assigned_to=users[i % 50] if i % 7 else None, raw_data={'i': i, 'tags': ['a', 'b']},
+            created_at=now - datetime.timedelta(minutes=i),
+        )
+        for i in range(rows)
+    ], batch_size=5000)
+    lead_ids = list(Lead.objects.values_list('id', flat=True))
+    FollowUp.objects.bulk_create([
+        FollowUp(lead_id=lead_ids[i], scheduled_date=now.date(), notes='call back', created_by=users[i % 50])
+        for i in range(rows)
+    ], batch_size=5000)
+    AccountOpening.objects.bulk_create([
+        AccountOpening(lead_id=lead_ids[i], created_by=users[i % 50], deposit_amount=Decimal('1500.50'))
+        for i in range(rows)
+    ], batch_size=5000)
+    Task.objects.bulk_create([
+        Task(title=f'Task {i}', assigned_to=users[i % 50] if i % 3 else None, deadline=now)
+        for i in range(rows)
+    ], batch_size=5000)
+    Attendance.objects.bulk_create([
+        Attendance(user=users[i % 50], date=now.date() - datetime.timedelta(days=i // 50), time_in=datetime.time(9, 30))
+        for i in range(rows)
+    ], batch_size=5000)
+
+
+def measure(fn):
+    start = time.perf_counter()
+    data = fn()
+    return data, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    seed(args.rows)
+
+    cases = [
+        (Lead.objects.select_related('assigned_to').order_by('-created_at'), LeadSerializer),
+        (FollowUp.objects.select_related('lead', 'created_by').order_by('-scheduled_date'), FollowUpSerializer),
+        (AccountOpening.objects.select_related('lead', 'created_by'), AccountOpeningSerializer),
+        (Task.objects.select_related('assigned_to').order_by('id'), TaskSerializer),
+        (Attendance.objects.select_related('user'), AttendanceSerializer),
+    ]
+    renderer = JSONRenderer()
+    for queryset, serializer_class in cases:
+        drf_data, drf_secs = measure(lambda qs=queryset, cls=serializer_class: cls(qs, many=True).data)
+        row_data, row_secs = measure(lambda qs=queryset, cls=serializer_class: RowSerializer(cls).serialize(qs))
+        assert renderer.render(drf_data) == renderer.render(row_data), serializer_class.__name__
+        print(
+            f'{serializer_class.__name__:<26} DRF {args.rows / drf_secs:>10,.0f} rows/s   '
+            f'RowSerializer {args.rows / row_secs:>10,.0f} rows/s   x{drf_secs / row_secs:.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
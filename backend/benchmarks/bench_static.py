@@ -0,0 +1,64 @@
+"""Old django.views.static.serve path vs the in-memory static layer.
+
+    python -m benchmarks.bench_static
+
+Builds a fake Vite output (index.html plus a hashed JS bundle) in a temp
+directory, precompresses it with ``compress_static`` and times full
+responses, gzip responses and conditional (304) requests.
+"""
+import os
+import tempfile
+
+from benchmarks.utils import setup, timeit
+
+setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.views.static import serve  # noqa: E402
+
+from api.static import static_files, serve_static  # noqa: E402
+
+
+def build(root):
+    os.makedirs(os.path.join(root, 'assets', 'js'))
+    with open(os.path.join(root, 'index.html'), 'w') as fh:
+        fh.write('<!doctype html><html><head><script type="module" src="/assets/js/index-4f2a9c1b.js"></script>'
+                 '</head><body><div id="root"></div></body></html>' + '<!-- pad -->' * 200)
+    with open(os.path.join(root, 'assets', 'js', 'index-4f2a9c1b.js'), 'w') as fh:
+        fh.write(''.join(f'export const value{i} = () => "component {i}";\n' for i in range(12000)))
+
+
+def drain(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def main():
+    factory = RequestFactory()
+    path = 'assets/js/index-4f2a9c1b.js'
+    with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+        build(root)
+        call_command('compress_static', verbosity=0)
+        static_files.root, static_files.autoreload = root, False
+        static_files.load()
+
+        plain = factory.get('/' + path)
+        gzip_request = factory.get('/' + path, HTTP_ACCEPT_ENCODING='gzip, br')
+        etag = serve_static(gzip_request, path)['ETag']
+        conditional = factory.get('/' + path, HTTP_ACCEPT_ENCODING='gzip, br', HTTP_IF_NONE_MATCH=etag)
+
+        cases = [
+            ('django serve          ', lambda: drain(serve(plain, path, document_root=root))),
+            ('memory, identity      ', lambda: drain(serve_static(plain, path))),
+            ('memory, precompressed ', lambda: drain(serve_static(gzip_request, path))),
+            ('memory, 304           ', lambda: drain(serve_static(conditional, path))),
+        ]
+        for label, fn in cases:
+            size = fn()
+            print(f'{label} {timeit(fn, repeat=2000) * 1000:>8.1f} us/request  {size:>8,} bytes on the wire')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Upload latency and disk usage: plain FileField saves vs content-addressed storage.
+
+    python -m benchmarks.bench_uploads
+
+Stores phone-sized JPEGs the way ``LeadIndicatorUploadView`` used to and the
+way it does now, where most of them are re-uploads of an earlier screenshot,
+then reports the time until the proof row exists, bytes written under
+MEDIA_ROOT and the size of the thumbnails the background worker produced.
+The content-addressed path fsyncs every upload before returning.
+"""
+import os
+import random
+import tempfile
+import time
+from io import BytesIO
+
+from benchmarks.utils import setup
+
+# the thumbnail worker runs on another thread, which can't see ':memory:'
+_db = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+os.environ.setdefault('BENCH_SQLITE_PATH', _db.name)
+setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from api import uploads  # noqa: E402
+from api.models import Lead, PaymentProof, StoredFile, User  # noqa: E402
+
+UPLOADS = 40
+DISTINCT = 10
+
+
+def photo(seed):
+    rng = random.Random(seed)
+    image = Image.effect_noise((2000, 1500), 40).convert('RGB')
+    image.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (0, 0, 400, 300))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def disk_usage(root):
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _dirnames, names in os.walk(root)
+        for name in names
+    )
+
+
+def plain_upload(lead, user, upload):
+    PaymentProof.objects.create(lead=lead, uploaded_by=user, file=upload)
+
+
+def content_addressed_upload(lead, user, upload):
+    stored = uploads.store_upload(upload)
+    PaymentProof.objects.create(lead=lead, uploaded_by=user, file=stored.file.name, stored_file=stored)
+
+
+def main():
+
+    user, _ = User.objects.get_or_create(username='bench', defaults={'user_type': 'admin'})
+    lead = Lead.objects.create(name='Bench lead', phone='0000000000')
+    photos = [photo(i) for i in range(DISTINCT)]
+    rng = random.Random(0)
+    sequence = [photos[i % DISTINCT] if i < DISTINCT else rng.choice(photos) for i in range(UPLOADS)]
+    print(f'{UPLOADS} uploads of {DISTINCT} distinct ~{len(photos[0]) / 2 ** 20:.1f} MiB JPEGs')
+
+    cases = (('plain FileField     ', plain_upload), ('content-addressed   ', content_addressed_upload))
+    for label, upload_fn in cases:
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            timings = []
+            for body in sequence:
+                upload = SimpleUploadedFile('proof.jpg', body, 'image/jpeg')
+                start = time.perf_counter()
+                upload_fn(lead, user, upload)
+                timings.append((time.perf_counter() - start) * 1000)
+            if upload_fn is content_addressed_upload:
+                # wait for the thumbnail queue so the disk numbers are final
+                uploads._executor.shutdown(wait=True)
+
+            timings.sort()
+            thumbs = [s.thumbnail.size for s in StoredFile.objects.exclude(thumbnail='')]
+            print(
+                f'{label} p50={timings[len(timings) // 2]:6.1f}ms  p95={timings[int(len(timings) * 0.95)]:6.1f}ms  '
+                f'on disk={disk_usage(root) / 2 ** 20:6.1f} MiB'
+                + (f'  thumbnails={len(thumbs)} x ~{sum(thumbs) / len(thumbs) / 1024:.0f} KiB' if thumbs else '')
+            )
+            PaymentProof.objects.all().delete()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        os.remove(_db.name)
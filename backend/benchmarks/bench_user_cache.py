@@ -0,0 +1,41 @@
+"""Queries and latency per authenticated request with and without the user cache.
+
+    python -m benchmarks.bench_user_cache
+"""
+from benchmarks.utils import count_queries, setup, timeit
+
+setup()
+
+from django.test import Client  # noqa: E402
+from rest_framework_simplejwt.authentication import JWTAuthentication  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from api.authentication import CachedJWTAuthentication, user_cache  # noqa: E402
+from api.models import User  # noqa: E402
+from api.views import UserViewSet  # noqa: E402
+
+AUTH_CLASSES = (JWTAuthentication, CachedJWTAuthentication)
+
+
+def main():
+    user, _ = User.objects.get_or_create(username='bench', defaults={'email': 'bench@example.com', 'user_type': 'sales'})
+    token = str(RefreshToken.for_user(user).access_token)
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    original = UserViewSet.authentication_classes
+    try:
+        for auth_class in AUTH_CLASSES:
+            user_cache.clear()
+            UserViewSet.authentication_classes = [auth_class]
+            client.get('/api/users/me/')
+            with count_queries() as queries:
+                response = client.get('/api/users/me/')
+            assert response.status_code == 200, response.content
+            ms = timeit(lambda: client.get('/api/users/me/'))
+            print(f'{auth_class.__name__:<24} queries/request={len(queries)}  mean={ms:.3f}ms')
+    finally:
+        UserViewSet.authentication_classes = original
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""End-to-end load test of the main API with realistic user mixes.
+
+    python -m benchmarks.loadtest --duration 30 --concurrency 16 --output results.json
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --no-seed
+
+Unless ``--url`` is given, a throwaway SQLite database is migrated, filled by
+``manage.py seed_scale`` and served by ``manage.py runserver`` (or gunicorn
+with ``--server gunicorn``); with ``BENCH_DB=postgres`` the regular ``DB_*``
+database is used and only seeded when ``--seed`` is passed. Everything runs
+on localhost.
+
+Each run starts with a login storm (every virtual user plus ``--storm``
+extra logins at once), then virtual users pick a persona by ``--mix`` and
+loop for ``--duration`` seconds:
+
+* sales: lead list, follow-ups, today's attendance, own profile
+* staff: own task list, task status updates
+* admin: task list, sales directory, active users, lead dashboard fields
+
+Per-endpoint throughput and p50/p95/p99 latency are printed and written as
+JSON. With ``--baseline`` the run is compared against an earlier result and
+the exit status is 1 if any endpoint's p95 got slower than ``--tolerance``
+allows or started failing.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_PASSWORD = 'seed-password'
+TASK_STATUSES = ('pending', 'in_progress', 'completed')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint latencies."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            self.samples[name].append(seconds * 1000)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for name in sorted(self.samples):
+            values = sorted(self.samples[name])
+            endpoints[name] = {
+                'count': len(values),
+                'errors': self.errors[name],
+                'rps': round(len(values) / elapsed, 2),
+                'mean_ms': round(sum(values) / len(values), 2),
+                'p50_ms': round(percentile(values, 50), 2),
+                'p95_ms': round(percentile(values, 95), 2),
+                'p99_ms': round(percentile(values, 99), 2),
+                'max_ms': round(values[-1], 2),
+            }
+        return endpoints
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, email, rng):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.email = email
+        self.rng = rng
+        self.session = requests.Session()
+
+    def call(self, method, path, name=None, ok_statuses=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=60, **kwargs)
+            ok = response.status_code in ok_statuses if ok_statuses else response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(name or f'{method} {path.split("?")[0]}', time.perf_counter() - start, ok)
+        return response
+
+    def login(self):
+        response = self.call('POST', '/api/login/', json={'email': self.email, 'password': SEED_PASSWORD})
+        if response is None or response.status_code != 200:
+            raise RuntimeError(f'login failed for {self.email}: {getattr(response, "text", "no response")[:200]}')
+        self.session.headers['Authorization'] = f"Bearer {response.json()['tokens']['access']}"
+
+
+class SalesRep(VirtualUser):
+    def step(self):
+        self.call('GET', '/api/leads/')
+        self.call('GET', '/api/followups/')
+        # 404 just means "not checked in yet"
+        self.call('GET', '/api/attendance/today/', ok_statuses=(200, 404))
+        self.call('GET', '/api/users/me/')
+
+
+class Staff(VirtualUser):
+    task_ids = ()
+
+    def step(self):
+        response = self.call('GET', '/api/staff/tasks/')
+        if response is not None and response.ok and not self.task_ids:
+            self.task_ids = [task['id'] for task in response.json()]
+        if self.task_ids:
+            task_id = self.rng.choice(self.task_ids)
+            self.call(
+                'PATCH', f'/api/staff/tasks/{task_id}/update_status/', name='PATCH /api/staff/tasks/<id>/update_status/',
+                json={'status': self.rng.choice(TASK_STATUSES)},
+            )
+
+
+class Admin(VirtualUser):
+    def step(self):
+        self.call('GET', '/api/tasks/')
+        self.call('GET', '/api/users/?user_type=sales&is_active=true')
+        self.call('GET', '/api/attendance/active_users/')
+        self.call('GET', '/api/leads/?fields=id,status,assigned_to,source,created_at', name='GET /api/leads/?fields=dashboard')
+
+
+PERSONAS = {'sales': SalesRep, 'staff': Staff, 'admin': Admin}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def manage(env, *args):
+    subprocess.run([sys.executable, '-W', 'ignore', 'manage.py', *args], cwd=BACKEND_DIR, env=env, check=True)
+
+
+def start_server(args, env):
+    port = free_port()
+    if args.server == 'gunicorn':
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', '-w', str(args.workers),
+                   '--threads', '4', '--log-level', 'warning', 'backend.wsgi']
+    else:
+        command = [sys.executable, '-W', 'ignore', 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{args.server} exited with status {process.returncode}')
+        try:
+            requests.get(base_url + '/api/users/me/', timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{args.server} did not start within 30s')
+
+
+def discover_users(base_url, admin_email, count):
+    """Return ``{persona: [email, ...]}`` using the admin's view of the user directory."""
+    recorder = Recorder()
+    admin = VirtualUser(base_url, recorder, admin_email, random.Random(0))
+    admin.login()
+    emails = {}
+    for persona, user_type in (('sales', 'sales'), ('staff', 'staff'), ('admin', 'admin')):
+        response = admin.session.get(
+            f'{base_url}/api/users/', params={'user_type': user_type, 'is_active': 'true', 'fields': 'email', 'page_size': count},
+            timeout=60,
+        )
+        response.raise_for_status()
+        data = response.json()
+        rows = data['results'] if isinstance(data, dict) else data
+        emails[persona] = [row['email'] for row in rows if row.get('email')]
+    return emails
+
+
+def run(args, base_url):
+    rng = random.Random(args.random_seed)
+    emails = discover_users(base_url, args.admin_email, max(args.concurrency, args.storm) * 2)
+    mix = {}
+    for part in args.mix.split(','):
+        persona, _, weight = part.partition('=')
+        if persona not in PERSONAS:
+            raise SystemExit(f'unknown persona {persona!r} in --mix')
+        if emails.get(persona):
+            mix[persona] = float(weight or 1)
+    if not mix:
+        raise SystemExit('no seeded users found for any persona in --mix')
+
+    personas = rng.choices(list(mix), list(mix.values()), k=args.concurrency)
+    users = [
+        PERSONAS[persona](base_url, None, emails[persona][i % len(emails[persona])], random.Random(rng.random()))
+        for i, persona in enumerate(personas)
+    ]
+
+    # morning login storm: every virtual user plus extra one-shot logins at once
+    storm = Recorder()
+    storm_users = users + [
+        VirtualUser(base_url, None, rng.choice(emails[rng.choice(list(mix))]), random.Random(i))
+        for i in range(args.storm)
+    ]
+    barrier = threading.Barrier(len(storm_users))
+
+    def storm_login(user):
+        user.recorder = storm
+        barrier.wait()
+        user.login()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=storm_login, args=(user,)) for user in storm_users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    storm_elapsed = time.perf_counter() - started
+
+    steady = Recorder()
+    stop_at = time.monotonic() + args.duration
+
+    def loop(user):
+        user.recorder = steady
+        while time.monotonic() < stop_at:
+            user.step()
+            if args.think_ms:
+                time.sleep(user.rng.expovariate(1000 / args.think_ms))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=loop, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    steady_elapsed = time.perf_counter() - started
+
+    endpoints = steady.summary(steady_elapsed)
+    endpoints.update({f'{name} (storm)': stats for name, stats in storm.summary(storm_elapsed).items()})
+    total_requests = sum(stats['count'] for name, stats in endpoints.items() if not name.endswith('(storm)'))
+    return {
+        'meta': {
+            'duration_s': round(steady_elapsed, 2),
+            'concurrency': args.concurrency,
+            'mix': {persona: personas.count(persona) for persona in mix},
+            'storm_logins': len(storm_users),
+            'think_ms': args.think_ms,
+            'server': args.server if not args.url else args.url,
+            'db': os.environ.get('BENCH_DB', 'sqlite'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'total': {'requests': total_requests, 'rps': round(total_requests / steady_elapsed, 2)},
+        'endpoints': endpoints,
+    }
+
+
+def compare(result, baseline, tolerance, slack_ms):
+    """Return a list of regression messages against ``baseline``."""
+    regressions = []
+    for name, stats in result['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        limit = before['p95_ms'] * (1 + tolerance) + slack_ms
+        if stats['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {stats['p95_ms']:.1f}ms > {limit:.1f}ms (baseline {before['p95_ms']:.1f}ms)")
+        if stats['errors'] and not before['errors']:
+            regressions.append(f"{name}: {stats['errors']} errors (baseline had none)")
+    return regressions
+
+
+def print_table(result, baseline=None):
+    print(f"{'endpoint':<52} {'count':>7} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  {'p95 vs baseline':>15}")
+    for name, stats in result['endpoints'].items():
+        delta = ''
+        before = (baseline or {}).get('endpoints', {}).get(name)
+        if before and before['p95_ms']:
+            delta = f"{(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        print(
+            f"{name:<52} {stats['count']:>7} {stats['errors']:>4} {stats['rps']:>8.1f} "
+            f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>6.1f}ms {stats['p99_ms']:>6.1f}ms  {delta:>15}"
+        )
+    print(f"total: {result['total']['requests']} requests, {result['total']['rps']:.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', help='Target an already running server instead of starting one.')
+    parser.add_argument('--server', choices=('runserver', 'gunicorn'), default='runserver')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of steady-state load.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Virtual users.')
+    parser.add_argument('--mix', default='sales=6,staff=2,admin=1')
+    parser.add_argument('--storm', type=int, default=32, help='Extra logins in the opening login storm.')
+    parser.add_argument('--think-ms', type=float, default=0, help='Mean pause between persona iterations.')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--seed', dest='seed', action='store_true', default=None, help='Run seed_scale first.')
+    parser.add_argument('--no-seed', dest='seed', action='store_false')
+    parser.add_argument('--seed-args', default='--users 200 --leads 20000 --tasks 4000 --attendance-days 120 --followups 5000',
+                        help='Arguments passed to seed_scale.')
+    parser.add_argument('--admin-email', default='seed-admin000000@example.com')
+    parser.add_argument('--output', help='Write the JSON result here.')
+    parser.add_argument('--baseline', help='Compare against this earlier JSON result.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative p95 increase (0.2 = 20%%).')
+    parser.add_argument('--slack-ms', type=float, default=2.0, help='Absolute p95 increase always tolerated.')
+    args = parser.parse_args()
+
+    server = None
+    tmpdir = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            if args.seed:
+                raise SystemExit('--seed needs a locally started server (drop --url)')
+        else:
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', PERF_SAMPLE_RATE='0')
+            postgres = os.environ.get('BENCH_DB') == 'postgres'
+            if not postgres:
+                tmpdir = tempfile.mkdtemp(prefix='loadtest-')
+                env.setdefault('BENCH_SQLITE_PATH', os.path.join(tmpdir, 'db.sqlite3'))
+            manage(env, 'migrate', '-v', '0')
+            if args.seed or (args.seed is None and not postgres):
+                manage(env, 'seed_scale', '-v', '0', *args.seed_args.split())
+            server, base_url = start_server(args, env)
+
+        result = run(args, base_url)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        result['regressions'] = compare(result, baseline, args.tolerance, args.slack_ms)
+    print_table(result, baseline)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(result, fh, indent=2)
+    if baseline is not None:
+        for message in result['regressions']:
+            print(f'REGRESSION {message}')
+        if result['regressions']:
+            sys.exit(1)
+        print('no regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Settings for running benchmarks without a PostgreSQL server.
+
+Set ``BENCH_DB=postgres`` to keep the regular ``DB_*`` configuration instead.
+"""
+import os
+
+from backend.settings import *  # noqa: F401,F403
+
+if os.environ.get('BENCH_DB', 'sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCH_SQLITE_PATH', ':memory:'),
+        }
+    }
+    # A second SQLite file standing in for a read replica, e.g. a copy of
+    # BENCH_SQLITE_PATH taken after seeding.
+    REPLICA_DATABASES = []
+    if os.environ.get('BENCH_SQLITE_REPLICA_PATH'):
+        REPLICA_DATABASES = ['replica1']
+        DATABASES['replica1'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['BENCH_SQLITE_REPLICA_PATH'],
+            'TEST': {'MIRROR': 'default'},
+        }
+    DATABASE_ROUTERS = ['api.replicas.ReplicaRouter'] if REPLICA_DATABASES else []
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# the benchmarks read the servers' counters from /metrics
+METRICS_PUBLIC = True
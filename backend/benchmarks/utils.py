@@ -0,0 +1,47 @@
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    """Configure Django with ``benchmarks.settings`` and migrate the database."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def timeit(fn, repeat=200):
+    """Return the mean wall time of ``fn()`` in milliseconds."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+@contextmanager
+def count_queries(using='default'):
+    """Collect the SQL of every query run on ``using`` inside the block.
+
+    Unlike ``CaptureQueriesContext`` this survives the ``reset_queries``
+    call Django makes at the start of each request.
+    """
+    from django.db import connections
+
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    # not connection.execute_wrapper(): it pops the last wrapper on exit, which
+    # is the metrics or perf one if the first request in the block installed it
+    wrappers = connections[using].execute_wrappers
+    wrappers.append(wrapper)
+    try:
+        yield queries
+    finally:
+        wrappers.remove(wrapper)
@@ -0,0 +1,11 @@
+# gunicorn -c gunicorn.conf.py backend.wsgi
+#
+# With PROMETHEUS_MULTIPROC_DIR set, each worker writes its metrics to mmap
+# files in that directory and /metrics sums them (see api.metrics).
+import os
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
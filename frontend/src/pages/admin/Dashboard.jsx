@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import { Users, ClipboardList, CheckCircle2, AlertCircle, LogIn } from 'lucide-react';
-import { getAdminStats, getActiveUsers } from '../../services/api';
+import { getAdminDashboard, getAdminStats } from '../../services/api';
 
 const AdminDashboard = () => {
   const [stats, setStats] = useState(null);
@@ -10,8 +10,7 @@ const AdminDashboard = () => {
 
   useEffect(() => {
     const team = localStorage.getItem('adminTeam') || 'staff';
-    fetchStats(team);
-    fetchActiveUsers();
+    fetchDashboard(team);
 
     const handler = (e) => {
       const newTeam = (e && e.detail && e.detail.team) || localStorage.getItem('adminTeam') || 'staff';
@@ -32,12 +31,16 @@ const AdminDashboard = () => {
     }
   };
 
-  const fetchActiveUsers = async () => {
+  // the stats and the active users in one request
+  const fetchDashboard = async (team) => {
     try {
-      const data = await getActiveUsers();
-      setActiveUsers(data);
+      const data = await getAdminDashboard(team);
+      setStats(data.stats);
+      setActiveUsers(data.activeUsers);
     } catch (error) {
-      console.error('Failed to fetch active users:', error);
+      console.error('Failed to fetch dashboard:', error);
+    } finally {
+      setLoading(false);
     }
   };
 
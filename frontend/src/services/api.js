@@ -65,9 +65,10 @@ export const refreshToken = async (refreshToken) => {
   return response.data;
 };
 
-export const getUsers = async () => {
+// params: user_type, is_active, q (prefix search), ordering, fields, page, page_size
+export const getUsers = async (params = {}) => {
   try {
-    const response = await authApi.get('/users/');
+    const response = await authApi.get('/users/', { params });
     return response.data.results || response.data;
   } catch (error) {
     console.error('Failed to fetch users:', error);
@@ -123,29 +124,53 @@ export const getActiveUsers = async () => {
   }
 };
 
+// BATCH API
+// Several API calls in one round trip: [{ method, path, body }] -> [{ status, body }] in the same order.
+// Paths are full API paths ('/api/tasks/'); each call succeeds or fails on its own.
+export const batchRequests = async (requests) => {
+  const response = await authApi.post('/batch/', { requests });
+  return response.data.responses;
+};
+
+const batchBody = (item, fallback) => (item && item.status < 400 ? item.body : fallback);
+
+const listOf = (data) => {
+  const list = data && data.results ? data.results : data;
+  return Array.isArray(list) ? list : [];
+};
+
+const inTeam = (user, team) => {
+  if (!team) return true;
+  if (team === 'sales') return user.user_type === 'sales';
+  // 'staff' team represents IT
+  return user.user_type === 'staff' || user.is_staff;
+};
+
+const tasksOfTeam = (tasks, users, team) => {
+  const allowed = new Set(users.filter(u => inTeam(u, team)).map(u => u.id));
+  return tasks.filter(t => allowed.has(t.assigned_to));
+};
+
 // ADMIN APIs
 export const getAdminTasks = async (team) => {
-  // If a team is provided, fetch tasks then filter by users belonging to that team
-  const response = await adminApi.get('/tasks/');
-  const allTasks = response.data.results || response.data;
-
-  if (!team) return allTasks;
+  if (!team) {
+    const response = await adminApi.get('/tasks/');
+    return response.data.results || response.data;
+  }
 
-  // fetch users and filter by team
-  try {
-    const users = await getUsers();
-    const list = Array.isArray(users) ? users : [];
-    const filteredUsers = list.filter(u => {
-      if (team === 'sales') return u.user_type === 'sales';
-      return u.user_type === 'staff' || u.is_staff;
-    });
-    const allowed = new Set(filteredUsers.map(u => u.id));
-    const filteredTasks = (Array.isArray(allTasks) ? allTasks : []).filter(t => allowed.has(t.assigned_to));
-    return filteredTasks;
-  } catch (err) {
-    console.error('Failed to filter tasks by team:', err);
-    return allTasks;
+  // the tasks and the users to filter them by team in one round trip
+  const [tasks, users] = await batchRequests([
+    { method: 'GET', path: '/api/tasks/' },
+    { method: 'GET', path: '/api/users/?fields=id,user_type,is_staff' },
+  ]);
+  if (tasks.status >= 400) {
+    throw new Error(`Failed to fetch tasks (HTTP ${tasks.status})`);
+  }
+  if (users.status >= 400) {
+    console.error('Failed to filter tasks by team:', users.body);
+    return listOf(tasks.body);
   }
+  return tasksOfTeam(listOf(tasks.body), listOf(users.body), team);
 };
 
 export const getAdminTaskById = async (id) => {
@@ -188,43 +213,60 @@ export const deleteAdminUser = async (id) => {
   return response.data;
 };
 
-export const getAdminStats = async () => {
-  try {
-    // accept optional team parameter
-    const team = arguments[0];
-    const tasks = await getAdminTasks(team);
-    const users = await getAdminUsers();
-
-    // Filter users client-side based on team selection
-    const filteredUsers = Array.isArray(users)
-      ? users.filter(u => {
-          if (team === 'sales') return u.user_type === 'sales';
-          // 'staff' team represents IT
-          if (team === 'staff') return u.user_type === 'staff' || u.is_staff;
-          return true;
-        })
-      : [];
-
-    const completedTasks = tasks.filter(t => t.status === 'completed').length;
-    const pendingTasks = tasks.filter(t => t.status === 'pending').length;
-    const inProgressTasks = tasks.filter(t => t.status === 'in_progress').length;
+const EMPTY_STATS = {
+  totalUsers: 0,
+  totalTasks: 0,
+  completedTasks: 0,
+  pendingTasks: 0,
+  inProgressTasks: 0,
+};
 
+const EMPTY_ACTIVE_USERS = { sales: [], it: [], total_active: 0 };
+
+const adminStats = (allTasks, users, team) => {
+  const tasks = team ? tasksOfTeam(allTasks, users, team) : allTasks;
+  return {
+    totalUsers: users.filter(u => inTeam(u, team)).length,
+    totalTasks: tasks.length,
+    completedTasks: tasks.filter(t => t.status === 'completed').length,
+    pendingTasks: tasks.filter(t => t.status === 'pending').length,
+    inProgressTasks: tasks.filter(t => t.status === 'in_progress').length,
+  };
+};
+
+// Everything the admin dashboard shows, in one round trip.
+export const getAdminDashboard = async (team) => {
+  try {
+    const [tasks, users, activeUsers] = await batchRequests([
+      { method: 'GET', path: '/api/tasks/' },
+      { method: 'GET', path: '/api/users/' },
+      { method: 'GET', path: '/api/attendance/active_users/' },
+    ]);
     return {
-      totalUsers: filteredUsers.length || 0,
-      totalTasks: tasks.length || 0,
-      completedTasks,
-      pendingTasks,
-      inProgressTasks,
+      stats: tasks.status < 400
+        ? adminStats(listOf(tasks.body), listOf(batchBody(users, [])), team)
+        : EMPTY_STATS,
+      activeUsers: batchBody(activeUsers, EMPTY_ACTIVE_USERS),
     };
+  } catch (error) {
+    console.error('Failed to fetch admin dashboard:', error);
+    return { stats: EMPTY_STATS, activeUsers: EMPTY_ACTIVE_USERS };
+  }
+};
+
+export const getAdminStats = async (team) => {
+  try {
+    const [tasks, users] = await batchRequests([
+      { method: 'GET', path: '/api/tasks/' },
+      { method: 'GET', path: '/api/users/' },
+    ]);
+    if (tasks.status >= 400) {
+      throw new Error(`Failed to fetch tasks (HTTP ${tasks.status})`);
+    }
+    return adminStats(listOf(tasks.body), listOf(batchBody(users, [])), team);
   } catch (error) {
     console.error('Failed to fetch admin stats:', error);
-    return {
-      totalUsers: 0,
-      totalTasks: 0,
-      completedTasks: 0,
-      pendingTasks: 0,
-      inProgressTasks: 0,
-    };
+    return EMPTY_STATS;
   }
 };
 
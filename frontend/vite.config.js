@@ -8,6 +8,8 @@ export default defineConfig({
     outDir: '../backend/static',
     emptyOutDir: true,
     assetsDir: 'assets',
+    // read by the backend (api/static.py) to mark hashed bundles immutable
+    manifest: true,
     rollupOptions: {
       output: {
         entryFileNames: 'assets/js/[name]-[hash].js',